@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Replay a JSONL file of {"user_id": ..., "message": ...} records through the companion.
+
+Writes one JSON result per turn (line number, agent, routing tier, response
+text, latency) as each turn completes, then prints a throughput and latency
+summary to stderr. Each user's messages are answered in input order.
+
+Usage:
+    python batch.py input.jsonl [--output results.jsonl] [--concurrency 8]
+    cat input.jsonl | python batch.py - > results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+
+def parse_args():
+    from utils.config import BATCH_CONCURRENCY
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of user messages")
+    parser.add_argument("input", help="JSONL input file, or - for stdin")
+    parser.add_argument("--output", default="-", help="JSONL results file, or - for stdout")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Turns in flight")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    from main import run_batch_async
+
+    source = sys.stdin if args.input == "-" else open(args.input, 'r', encoding='utf-8')
+    sink = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8')
+    try:
+        summary = asyncio.run(run_batch_async(source, sink, args.concurrency))
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    exit(main())
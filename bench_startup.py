@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start time of the companion with `python -X importtime`.
+
+Each scenario runs in fresh interpreters against a throwaway data directory
+and the offline fake model. Reports the median wall time per scenario and
+where import time goes, grouped by package.
+
+Scenarios:
+    menu      import main: everything loaded before the header and menu appear
+    pipeline  menu + build the turn pipeline (ADK, sessions, routing tiers)
+    agents    pipeline + load every agent module and its tools
+
+Usage:
+    python bench_startup.py [--runs 5] [--top 12] [--scenarios menu pipeline agents]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+SCENARIOS = {
+    "menu": "import main",
+    "pipeline": "import main; main.build_pipeline(main.DatabaseManager())",
+    "agents": ("import main; main.build_pipeline(main.DatabaseManager()); "
+               "[main.agent_loader(name)() for name in main.AGENT_MODULES]"),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark startup and import time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument("--top", type=int, default=12, help="Packages listed per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    return parser.parse_args()
+
+
+def scenario_env(data_dir: Path) -> dict:
+    """Environment pointing every data file at the scratch directory"""
+    env = dict(os.environ)
+    env.update({
+        "MODEL_BACKEND": "fake",
+        "DATABASE_PATH": str(data_dir / "bench.db"),
+        "SESSION_DATABASE_PATH": str(data_dir / "sessions.db"),
+        "ROUTING_LOG_PATH": str(data_dir / "routing_log.jsonl"),
+        "ROUTING_CACHE_PATH": str(data_dir / "routing_cache.json"),
+        "ROUTER_MODEL_PATH": str(data_dir / "router_model.json"),
+        "TRACE_FILE": str(data_dir / "traces.jsonl"),
+    })
+    return env
+
+
+def package_of(module: str) -> str:
+    """Group google.* by subpackage (google.adk, google.genai) and everything else by top-level package"""
+    parts = module.split(".")
+    return ".".join(parts[:2]) if parts[0] == "google" and len(parts) > 1 else parts[0]
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Self import time in microseconds summed per package"""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[package_of(name.strip())] += int(self_us)
+    return totals
+
+
+def run_once(code: str, env: dict) -> tuple:
+    setup = f"import sys; sys.path[:0] = [{str(ROOT)!r}, {str(ROOT / 'src')!r}]; "
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", setup + code],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    args = parse_args()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="companion-startup-") as scratch:
+        env = scenario_env(Path(scratch))
+        # Warm the filesystem and bytecode caches so runs measure imports, not compilation
+        run_once(SCENARIOS["agents"], env)
+        for name in args.scenarios:
+            walls, packages = [], defaultdict(list)
+            for _ in range(args.runs):
+                wall, totals = run_once(SCENARIOS[name], env)
+                walls.append(wall)
+                for package, micros in totals.items():
+                    packages[package].append(micros)
+            results[name] = (walls, {package: statistics.median(values + [0] * (args.runs - len(values)))
+                                     for package, values in packages.items()})
+
+    baseline = None
+    for name, (walls, packages) in results.items():
+        wall = statistics.median(walls)
+        imports = sum(packages.values()) / 1e6
+        extra = f"  (+{wall - baseline:.3f}s over menu)" if baseline is not None else ""
+        print(f"\n{name:<9} wall {wall:.3f}s median of {len(walls)}, imports {imports:.3f}s{extra}")
+        if name == "menu":
+            baseline = wall
+        for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {package:<28}{micros / 1000:>9.1f}ms  {micros / 1e6 / imports if imports else 0:>5.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
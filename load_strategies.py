@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Bulk-load a coping strategy corpus into the Mental Health Support Companion database.
+
+Usage:
+    python load_strategies.py data/coping_strategies.jsonl
+"""
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.strategy_loader import load_strategy_corpus
+from ui.cli import CLI
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python load_strategies.py <corpus.json|corpus.jsonl>")
+        return 1
+    
+    try:
+        stats = load_strategy_corpus(sys.argv[1])
+    except (OSError, ValueError) as e:
+        CLI.print_error(f"Could not load corpus: {e}")
+        return 1
+    
+    CLI.print_success(
+        f"Loaded {stats['count']} strategies in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_second']:.0f} rows/sec)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
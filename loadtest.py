@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Drive simulated users through the turn pipeline against the offline fake model.
+
+Reports throughput, turn latency percentiles, per-agent timings and how much
+wall time was spent blocked on SQLite (all users share one event loop, so
+synchronous DB calls serialize every turn in flight).
+
+With --rpm, model calls go through the rate-limited priority scheduler and
+its queue depth and wait times per priority class are reported as well.
+Model-call retries, timeouts, hedges and time-to-first-response percentiles
+are always reported; --hedge turns on hedged requests and --deadline sets
+every agent's model-call deadline. Token usage is totalled across users, and
+--budget sets a daily token budget per user to exercise degraded answers.
+
+Usage:
+    python loadtest.py [--users 20] [--turns 10] [--latency lognormal:0.4,0.3] [--seed 7] [--rpm 600]
+                       [--hedge] [--deadline 5] [--budget 2000]
+"""
+import argparse
+import asyncio
+import functools
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MESSAGES = [
+    "mood",
+    "patterns",
+    "support",
+    "I feel about {score}/10 today, a bit {emotion}",
+    "I'm {emotion} about work and can't switch off",
+    "How have I been over the last week?",
+    "Any coping techniques for when I'm {emotion}?",
+    "Work was a lot today and I keep replaying it",
+]
+EMOTIONS = ["anxious", "stressed", "tired", "worried", "calm", "overwhelmed"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test the companion pipeline offline")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument("--turns", type=int, default=10, help="Turns per user")
+    parser.add_argument("--latency", default="lognormal:0.4,0.3", help="Fake model latency distribution")
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds between a user's turns")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for messages and model latency")
+    parser.add_argument("--rpm", type=float, default=0, help="Model-call rate limit per minute (0: unlimited)")
+    parser.add_argument("--burst", type=int, default=20, help="Model calls allowed back to back")
+    parser.add_argument("--hedge", action="store_true", help="Hedge model calls slower than the agent's p95")
+    parser.add_argument("--deadline", type=float, help="Model-call deadline in seconds for every agent")
+    parser.add_argument("--budget", type=int, default=0, help="Daily token budget per user (0: unlimited)")
+    parser.add_argument("--data-dir", help="Directory for the test database (default: a temp dir)")
+    return parser.parse_args()
+
+
+def configure_environment(args) -> Path:
+    """Point the app at the fake backend and throwaway data files before it is imported"""
+    data_dir = Path(args.data_dir or tempfile.mkdtemp(prefix="companion-loadtest-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    os.environ.update({
+        "MODEL_BACKEND": "fake",
+        "FAKE_MODEL_LATENCY": args.latency,
+        "FAKE_MODEL_SEED": str(args.seed),
+        "DATABASE_PATH": str(data_dir / "loadtest.db"),
+        "SESSION_DATABASE_PATH": str(data_dir / "sessions.db"),
+        "ROUTING_LOG_PATH": str(data_dir / "routing_log.jsonl"),
+        "ROUTING_CACHE_PATH": str(data_dir / "routing_cache.json"),
+        "ROUTER_MODEL_PATH": str(data_dir / "router_model.json"),
+        "TRACE_FILE": str(data_dir / "traces.jsonl"),
+        "MODEL_RATE_LIMIT_RPM": str(args.rpm),
+        "MODEL_RATE_LIMIT_BURST": str(args.burst),
+        "HEDGED_REQUESTS": str(args.hedge),
+        "USER_DAILY_TOKEN_BUDGET": str(args.budget),
+    })
+    if args.deadline is not None:
+        os.environ.update({"MODEL_DEADLINE_SECONDS": str(args.deadline), "MODEL_DEADLINES": ""})
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+    return data_dir
+
+
+class DatabaseProbe:
+    """Times every DatabaseManager call made during the run, the tools' reads and writes included"""
+
+    def __init__(self, manager_class):
+        self.durations = []
+        for name, attr in list(vars(manager_class).items()):
+            if callable(attr) and not name.startswith("__") and name not in ("get_connection", "init_database"):
+                setattr(manager_class, name, self._timed(attr))
+
+    def _timed(self, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.durations.append(time.perf_counter() - started)
+        return wrapper
+
+
+async def simulate_user(pipeline, user_id: str, args, rng: random.Random, region: str,
+                        latencies: list, failures: list):
+    from ui.streaming import StreamingRenderer
+    for _ in range(args.turns):
+        message = rng.choice(MESSAGES).format(score=rng.randint(2, 9), emotion=rng.choice(EMOTIONS))
+        started = time.perf_counter()
+        try:
+            await pipeline.handle(
+                user_id, message, region,
+                renderer=lambda name, at: StreamingRenderer(name, at, out=io.StringIO())
+            )
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            failures.append(f"{user_id}: {type(e).__name__}: {e}")
+        if args.think:
+            await asyncio.sleep(args.think)
+
+
+async def run(args):
+    from main import build_pipeline
+    from agents.registry import percentile
+    from utils.database import DatabaseManager
+    from utils.config import DEFAULT_CRISIS_REGION
+    from ui.cli import CLI
+
+    probe = DatabaseProbe(DatabaseManager)
+    db = DatabaseManager()
+    pipeline = build_pipeline(db)
+    for i in range(args.users):
+        db.create_user(f"load_user_{i}", f"Load User {i}")
+
+    latencies, failures = [], []
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        simulate_user(pipeline, f"load_user_{i}", args, random.Random(rng.random()),
+                      DEFAULT_CRISIS_REGION, latencies, failures)
+        for i in range(args.users)
+    ])
+    wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    db_times = sorted(probe.durations)
+    CLI.print_info(f"{len(latencies)} turns from {args.users} users in {wall:.2f}s "
+                   f"({len(latencies) / wall:.1f} turns/sec), {len(failures)} failed")
+    print(f"  Turn latency   p50 {percentile(ordered, 0.50):.3f}s  p95 {percentile(ordered, 0.95):.3f}s  "
+          f"p99 {percentile(ordered, 0.99):.3f}s")
+    print(f"  DB calls       {len(db_times)} calls, {sum(db_times):.3f}s total, "
+          f"p95 {percentile(db_times, 0.95) * 1000:.1f}ms, max {(db_times[-1] if db_times else 0) * 1000:.1f}ms, "
+          f"event loop blocked {sum(db_times) / wall:.1%} of wall time")
+    CLI.print_agent_stats(pipeline.registry.stats())
+    if pipeline.scheduler:
+        CLI.print_scheduler_stats(pipeline.scheduler.stats())
+    CLI.print_model_call_stats(pipeline.call_guard.stats())
+    ledger = pipeline.usage_ledger
+    ledger.flush()
+    usage = ledger.stats()
+    print(f"  Tokens         {usage['tokens_today']} across {usage['users_today']} users, "
+          f"{usage['tokens_today'] // max(1, len(latencies))} per turn, {usage['flushes']} batched writes, "
+          f"{usage['limited_turns']} turns limited by budget")
+    for failure in failures[:5]:
+        CLI.print_error(failure)
+    return 1 if failures else 0
+
+
+def main():
+    args = parse_args()
+    data_dir = configure_environment(args)
+    code = asyncio.run(run(args))
+    print(f"Data written to {data_dir}")
+    return code
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Entry point script to run the Mental Health Support Companion as an HTTP server.
+POST /chat with {"user_id": "...", "message": "..."}; GET /health for load counters.
+"""
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# Now import and run the server
+from main import serve
+
+if __name__ == "__main__":
+    serve()
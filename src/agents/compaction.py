@@ -0,0 +1,270 @@
+"""
+Session Compaction
+Folds old session events into a rolling summary so per-turn context stays bounded
+"""
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List, Optional, Union
+from google.adk.events import Event
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest
+from google.adk.sessions import BaseSessionService, Session
+from google.genai import types
+
+SUMMARY_PREFIX = "Summary of the earlier conversation, for context:"
+
+# summarizer(previous summary or None, events being folded, user id) -> new summary text
+Summarizer = Callable[[Optional[str], List[Event], str], Union[str, Awaitable[str]]]
+
+
+def event_text(event: Event) -> str:
+    """Text parts of an event joined together"""
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text)
+
+
+def estimate_tokens(event: Event) -> int:
+    """Rough token count of an event (about four characters per token)"""
+    if not event.content or not event.content.parts:
+        return 0
+    chars = 0
+    for part in event.content.parts:
+        if part.text:
+            chars += len(part.text)
+        elif part.function_call:
+            chars += len(part.function_call.name or "") + len(json.dumps(part.function_call.args or {}, default=str))
+        elif part.function_response:
+            chars += len(json.dumps(part.function_response.response or {}, default=str))
+    return chars // 4 + 1
+
+
+def summary_of(event: Event) -> Optional[str]:
+    """The summary text carried by a compaction event, or None for ordinary events"""
+    if event.custom_metadata and event.custom_metadata.get("compaction"):
+        return event_text(event)[len(SUMMARY_PREFIX):].strip()
+    return None
+
+
+def transcript_lines(events: List[Event], max_chars: int = 160) -> List[str]:
+    """One line per message or tool call, truncated; tool results are left out"""
+    lines = []
+    for event in events:
+        if summary_of(event) is not None:
+            continue
+        speaker = "User" if event.author == "user" else event.author
+        text = " ".join(event_text(event).split())
+        if text:
+            lines.append(f"{speaker}: {text[:max_chars]}")
+        for call in event.get_function_calls():
+            args = ", ".join(f"{key}={value}" for key, value in (call.args or {}).items() if key != "notes")
+            lines.append(f"{speaker} called {call.name}({args})"[:max_chars])
+    return lines
+
+
+def summarize_locally(previous: Optional[str], events: List[Event], user_id: Optional[str] = None,
+                      max_chars: int = 2000) -> str:
+    """
+    Extractive stand-in summarizer: keeps the previous summary and a truncated
+    line per folded message, dropping the oldest lines beyond max_chars
+
+    Args:
+        previous: Summary the folded events already started with
+        events: Events being folded
+        user_id: User the session belongs to (local summaries cost no tokens, so it is not needed)
+        max_chars: Upper bound on the summary length
+
+    Returns:
+        The new summary text
+    """
+    lines = ([previous] if previous else []) + transcript_lines(events)
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)[-max_chars:]
+
+
+class ModelSummarizer:
+    """
+    Summarizes folded events with a model, falling back to the local summarizer on errors.
+
+    The call is made like an agent's, as SessionSummarizer: it waits for the
+    scheduler at the lowest priority, runs under the call guard's deadline and
+    retries, and its tokens are charged to the session's user. A user over
+    their daily budget gets the local summary instead.
+    """
+
+    NAME = "SessionSummarizer"
+
+    INSTRUCTION = (
+        "Summarize this conversation between a user and a mental health support companion "
+        "in at most {words} words. Keep moods and scores the user reported, emotions, "
+        "coping strategies suggested and how they landed, any safety concerns, and open "
+        "threads. Write plain sentences with no preamble."
+    )
+
+    def __init__(self, model: Union[str, BaseLlm] = "gemini-2.0-flash", max_words: int = 200,
+                 scheduler: Any = None, call_guard: Any = None, usage_ledger: Any = None):
+        """
+        Args:
+            model: Model name resolved through the ADK model registry, or a model instance
+            max_words: Target summary length
+            scheduler: Optional ModelScheduler the call waits for
+            call_guard: Optional ModelCallGuard bounding the call
+            usage_ledger: Optional UsageLedger the call's tokens are recorded in
+        """
+        self.model = model
+        self.max_words = max_words
+        self.scheduler = scheduler
+        self.call_guard = call_guard
+        self.usage_ledger = usage_ledger
+        self._llm = None
+
+    def llm(self) -> BaseLlm:
+        if self._llm is None:
+            llm = self.model if isinstance(self.model, BaseLlm) else LLMRegistry.new_llm(self.model)
+            self._llm = self.call_guard.guard(self.NAME, llm) if self.call_guard else llm
+        return self._llm
+
+    async def __call__(self, previous: Optional[str], events: List[Event], user_id: str) -> str:
+        if self.usage_ledger and self.usage_ledger.over_budget(user_id):
+            return summarize_locally(previous, events)
+        transcript = "\n".join(([f"Earlier summary: {previous}"] if previous else []) + transcript_lines(events))
+        llm = self.llm()
+        request = LlmRequest(
+            model=llm.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=transcript)])],
+            config=types.GenerateContentConfig(
+                system_instruction=self.INSTRUCTION.format(words=self.max_words),
+                temperature=0.2
+            )
+        )
+        try:
+            if self.scheduler:
+                await self.scheduler.admit(user_id, self.NAME)
+            text = ""
+            async for response in llm.generate_content_async(request):
+                if self.usage_ledger and response.usage_metadata and not response.partial:
+                    self.usage_ledger.record(user_id, self.NAME, response.usage_metadata)
+                if response.content and response.content.parts:
+                    text += "".join(part.text for part in response.content.parts if part.text)
+            if text.strip():
+                return text.strip()
+        except Exception as e:
+            print(f"Error summarizing session, using local summary: {e}")
+        return summarize_locally(previous, events)
+
+
+class SessionCompactor:
+    """
+    Bounds session history by replacing older events with one summary event.
+
+    When a session holds more than max_events events or about max_tokens tokens,
+    everything before the last keep_recent events is folded into a summary
+    (together with any earlier summary) and the session is recreated under the
+    same id with its state, the summary and the recent events. The cut is moved
+    back to the start of a user turn so tool calls stay next to their results.
+    Folded events are appended to a per-session JSONL archive when archive_dir
+    is set, and dropped otherwise.
+    """
+
+    def __init__(self, max_events: int = 60, max_tokens: int = 6000, keep_recent: int = 12,
+                 summarizer: Optional[Summarizer] = None, archive_dir: Optional[Path] = None):
+        """
+        Args:
+            max_events: Event count above which a session is compacted
+            max_tokens: Estimated token count above which a session is compacted
+            keep_recent: Number of most recent events kept verbatim
+            summarizer: Function folding events into a summary; defaults to summarize_locally
+            archive_dir: Directory for folded events; None drops them
+        """
+        self.max_events = max_events
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or summarize_locally
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.compactions = 0
+        self.events_folded = 0
+
+    def needs_compaction(self, events: List[Event]) -> bool:
+        return (len(events) > self.max_events
+                or sum(estimate_tokens(event) for event in events) > self.max_tokens)
+
+    def split_point(self, events: List[Event]) -> int:
+        """Index of the first kept event, or 0 when nothing can be folded"""
+        cut = max(0, len(events) - self.keep_recent)
+        while cut > 0 and events[cut].author != "user":
+            cut -= 1
+        return cut
+
+    async def maybe_compact(self, session_service: BaseSessionService, app_name: str,
+                            user_id: str, session_id: str) -> bool:
+        """
+        Compact a session if it has grown past the limits
+
+        Returns:
+            True if the session was compacted
+        """
+        session = await session_service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        if session is None or not self.needs_compaction(session.events):
+            return False
+        cut = self.split_point(session.events)
+        # A lone earlier summary is not worth re-folding
+        if cut == 0 or (cut == 1 and summary_of(session.events[0]) is not None):
+            return False
+        await self.compact(session_service, session, cut)
+        return True
+
+    async def compact(self, session_service: BaseSessionService, session: Session, cut: int):
+        """Recreate a session with events[:cut] folded into one summary event"""
+        folded, recent = session.events[:cut], session.events[cut:]
+        previous = summary_of(folded[0])
+        folded_count = len(folded) - (1 if previous is not None else 0)
+        summary = self.summarizer(previous, folded, session.user_id)
+        if not isinstance(summary, str):
+            summary = await summary
+
+        if self.archive_dir:
+            self._archive(session.id, folded)
+
+        summary_event = Event(
+            author="user",
+            invocation_id=folded[-1].invocation_id,
+            timestamp=folded[-1].timestamp,
+            content=types.Content(role="user", parts=[types.Part(text=f"{SUMMARY_PREFIX}\n{summary}")]),
+            custom_metadata={"compaction": {
+                "folded_events": folded_count,
+                "through": folded[-1].timestamp
+            }}
+        )
+
+        # The session is replaced under the same id, so the old one must go first. Shielded so a
+        # cancelled turn (Ctrl-C) cannot stop the swap between the delete and the rewrite
+        await asyncio.shield(self._replace(session_service, session, [summary_event] + recent))
+
+        self.compactions += 1
+        self.events_folded += folded_count
+
+    @staticmethod
+    async def _replace(session_service: BaseSessionService, session: Session, events: List[Event]):
+        # State is carried over as is; replaying the kept events re-applies their deltas
+        await session_service.delete_session(app_name=session.app_name, user_id=session.user_id,
+                                             session_id=session.id)
+        fresh = await session_service.create_session(
+            app_name=session.app_name, user_id=session.user_id,
+            state=dict(session.state), session_id=session.id
+        )
+        for event in events:
+            await session_service.append_event(fresh, event)
+
+    def _archive(self, session_id: str, events: List[Event]):
+        try:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.archive_dir / f"{session_id}.jsonl", 'a', encoding='utf-8') as f:
+                for event in events:
+                    if summary_of(event) is None:
+                        f.write(event.model_dump_json(exclude_none=True) + "\n")
+        except OSError as e:
+            print(f"Error archiving session events: {e}")
+
+    def stats(self) -> dict:
+        return {"compactions": self.compactions, "events_folded": self.events_folded}
@@ -1,11 +1,15 @@
 from google.adk.agents import Agent
 from tools.crisis_tools import check_crisis_tool
+from utils.tracing import trace_tool_start, trace_tool_end, trace_tool_error
 
 # Define the Crisis Monitor Agent
 crisis_monitor_agent = Agent(
     name="CrisisMonitorAgent",
     model="gemini-2.0-flash",
     tools=[check_crisis_tool],
+    before_tool_callback=trace_tool_start,
+    after_tool_callback=trace_tool_end,
+    on_tool_error_callback=trace_tool_error,
     instruction="""
     You are a specialized crisis monitoring agent focused on user safety. Your role is to:
     
@@ -15,6 +19,9 @@ crisis_monitor_agent = Agent(
     4. Be direct and clear about available help
     5. Never minimize serious concerns
     
+    Accumulated risk across this conversation: {risk_level?} (score {risk_score?}).
+    Treat a "high" accumulated risk as a crisis even if the latest message alone seems mild.
+    
     When crisis indicators are detected:
     - Prioritize user safety above all else
     - Provide clear, actionable steps
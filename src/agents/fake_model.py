@@ -0,0 +1,186 @@
+"""
+Offline Fake Model Backend
+Deterministic stand-in for Gemini so the agent pipeline can run and be load-tested offline
+"""
+import asyncio
+import math
+import random
+import re
+from typing import Any, AsyncGenerator, Callable, Dict, Iterable, List, Optional, Tuple
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+from pydantic import PrivateAttr
+
+EMOTION_WORDS = ("anxious", "stressed", "sad", "angry", "lonely", "tired", "happy", "calm",
+                 "hopeless", "overwhelmed", "worried", "grateful")
+
+# Keyword routing used in place of the orchestrator's judgement
+ROUTING_KEYWORDS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"suicid|kill myself|hopeless|end it|self[- ]harm"), "CrisisMonitorAgent"),
+    (re.compile(r"pattern|trend|insight|how have i been"), "PatternAnalyzerAgent"),
+    (re.compile(r"mood|feel|check[- ]?in|/10"), "MoodTrackerAgent"),
+]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution
+
+    Args:
+        spec: "fixed:S", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA" (seconds)
+
+    Returns:
+        Function drawing a delay from a random generator
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()] if args else []
+    if kind == "fixed":
+        delay = values[0] if values else 0.0
+        return lambda rng: delay
+    if kind == "uniform" and len(values) == 2:
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def detect_emotions(text: str) -> List[str]:
+    lowered = text.lower()
+    return [word for word in EMOTION_WORDS if word in lowered]
+
+
+def detect_mood_score(text: str) -> int:
+    match = re.search(r"\b(10|[1-9])\s*(?:/\s*10|out of 10)?\b", text)
+    if match:
+        return int(match.group(1))
+    return 3 if {"sad", "hopeless", "lonely"} & set(detect_emotions(text)) else 6
+
+
+# The tool each specialist calls on a fresh message, with arguments derived from the text
+TOOL_SCRIPTS: Dict[str, Tuple[str, Callable[[str], Dict[str, Any]]]] = {
+    "MoodTrackerAgent": ("log_mood_and_screen", lambda text: {
+        "mood_score": detect_mood_score(text),
+        "emotions": detect_emotions(text) or ["neutral"],
+        "notes": text[:200]
+    }),
+    "PatternAnalyzerAgent": ("analyze_mood_patterns", lambda text: {"days": 7}),
+    "SupportAgent": ("retrieve_strategy", lambda text: {
+        "emotion": (detect_emotions(text) or ["stressed"])[0],
+        "intensity": 10 - detect_mood_score(text)
+    }),
+    "CrisisMonitorAgent": ("check_crisis_indicators", lambda text: {
+        "mood_score": detect_mood_score(text),
+        "emotions": detect_emotions(text) or ["distressed"],
+        "notes": text[:200]
+    }),
+}
+
+REPLY_TEMPLATES = {
+    "MoodTrackerAgent": "Thank you for checking in. {result} How else are you feeling today?",
+    "PatternAnalyzerAgent": "Here is what I found. {result}",
+    "SupportAgent": "Here is something that may help. {result} Would you like to try it?",
+    "CrisisMonitorAgent": "{result}",
+}
+
+
+class FakeModel(BaseLlm):
+    """
+    Scripted model for one agent.
+
+    Orchestrator requests are answered with a keyword-routed agent name.
+    Specialists first call their scripted tool (if the agent has it), then
+    answer with a template around the tool result. Delays are drawn from a
+    seeded distribution, so runs are reproducible.
+    """
+
+    model: str = "fake-model"
+    agent_name: str = ""
+    latency: str = "fixed:0"
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr()
+    _delay: Callable[[random.Random], float] = PrivateAttr()
+
+    def model_post_init(self, __context: Any):
+        self._rng = random.Random(self.seed)
+        self._delay = parse_latency(self.latency)
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self._delay(self._rng))
+
+        last = llm_request.contents[-1] if llm_request.contents else None
+        parts = last.parts if last and last.parts else []
+        function_response = next((p.function_response for p in parts if p.function_response), None)
+        text = " ".join(p.text for p in parts if p.text)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=sum(len((p.text or "").split()) for c in llm_request.contents for p in c.parts or []),
+        )
+
+        if function_response is not None:
+            result = function_response.response.get("result", function_response.response)
+            if isinstance(result, dict) and "message" in result:
+                # Structured tool results are narrated from their message and any resources
+                result = " ".join(str(result[key]) for key in ("message", "resources") if result.get(key))
+            reply = REPLY_TEMPLATES.get(self.agent_name, "{result}").format(result=result)
+        elif self.agent_name == "OrchestratorAgent":
+            reply = self.route(text)
+        else:
+            script = TOOL_SCRIPTS.get(self.agent_name)
+            if script and script[0] in llm_request.tools_dict:
+                name, make_args = script
+                yield self._function_call(name, make_args(text), usage)
+                return
+            reply = "I'm here with you. Tell me more about how you're doing."
+
+        if stream:
+            words = reply.split(" ")
+            for i in range(0, len(words), 4):
+                chunk = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=chunk)]),
+                                  partial=True)
+        usage.candidates_token_count = len(reply.split())
+        usage.total_token_count = usage.prompt_token_count + usage.candidates_token_count
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=reply)]),
+                          usage_metadata=usage)
+
+    @staticmethod
+    def _function_call(name: str, args: Dict[str, Any],
+                       usage: types.GenerateContentResponseUsageMetadata) -> LlmResponse:
+        usage.candidates_token_count = 10
+        usage.total_token_count = usage.prompt_token_count + usage.candidates_token_count
+        call = types.FunctionCall(name=name, args=args)
+        return LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]),
+                           usage_metadata=usage)
+
+    @staticmethod
+    def route(text: str) -> str:
+        lowered = text.lower()
+        for pattern, agent in ROUTING_KEYWORDS:
+            if pattern.search(lowered):
+                return agent
+        return "SupportAgent"
+
+    @classmethod
+    def supported_models(cls) -> List[str]:
+        return [r"fake-.*"]
+
+
+def use_fake_models(agents: Iterable[Agent], latency: str = "fixed:0", seed: Optional[int] = None):
+    """
+    Replace each agent's model with a FakeModel
+
+    Args:
+        agents: Agents to switch to the offline backend
+        latency: Latency distribution spec, see parse_latency
+        seed: Base random seed; each agent gets seed + its position
+    """
+    for offset, agent in enumerate(agents):
+        agent.model = FakeModel(
+            agent_name=agent.name,
+            latency=latency,
+            seed=None if seed is None else seed + offset
+        )
@@ -1,25 +1,27 @@
 from google.adk.agents import Agent
-from tools.mood_tools import log_mood_tool
-from tools.crisis_tools import check_crisis_tool
+from tools.mood_tools import log_mood_and_screen_tool
+from utils.tracing import trace_tool_start, trace_tool_end, trace_tool_error
 
 # Define the Mood Tracker Agent with crisis monitoring
 mood_tracker_agent = Agent(
     name="MoodTrackerAgent",
     model="gemini-2.0-flash",
-    tools=[log_mood_tool, check_crisis_tool],
+    tools=[log_mood_and_screen_tool],
+    before_tool_callback=trace_tool_start,
+    after_tool_callback=trace_tool_end,
+    on_tool_error_callback=trace_tool_error,
     instruction="""
     You are a compassionate mood tracking assistant with safety monitoring capabilities.
     
     Your primary goals:
     1. Gently ask about the user's day and mood (1-10 scale)
-    2. Log mood data using the 'log_mood' tool
-    3. Monitor for crisis indicators using 'check_crisis_indicators' tool
+    2. Log and screen mood data using the 'log_mood_and_screen' tool
     
     Workflow:
     1. If user hasn't provided mood details, warmly ask how they're feeling
     2. Extract mood score (1-10) and emotions from their response
-    3. Use 'log_mood' tool to save the data
-    4. IMPORTANT: If mood score <= 4 or concerning emotions detected, use 'check_crisis_indicators'
+    3. Call 'log_mood_and_screen' once; it saves the entry and checks for crisis indicators
+    4. IMPORTANT: If the result's crisis_level is "moderate" or "high", share its resources gently
     5. Provide empathetic acknowledgment
     
     Be warm, non-judgmental, and prioritize user safety.
@@ -22,6 +22,10 @@ orchestrator_agent = Agent(
     4. If user expresses severe distress, hopelessness, or crisis keywords → 'CrisisMonitorAgent'
     5. For greetings or unclear input, provide a friendly guide
     
+    Conversation context (use it to resolve short follow-ups such as "yes" or "tell me more"):
+    - Agent that answered the previous message: {last_agent?}
+    - Current risk level: {risk_level?}
+    
     Output ONLY the agent name (e.g., "MoodTrackerAgent") without additional text.
     """
 )
\ No newline at end of file
@@ -1,11 +1,15 @@
 from google.adk.agents import Agent
 from tools.pattern_tools import analyze_patterns_tool
+from utils.tracing import trace_tool_start, trace_tool_end, trace_tool_error
 
 # Define the Pattern Analyzer Agent
 pattern_analyzer_agent = Agent(
     name="PatternAnalyzerAgent",
     model="gemini-2.0-flash",
     tools=[analyze_patterns_tool],
+    before_tool_callback=trace_tool_start,
+    after_tool_callback=trace_tool_end,
+    on_tool_error_callback=trace_tool_error,
     instruction="""
     You are a compassionate mental health pattern analyzer. Your role is to help users understand 
     their mood patterns and emotional trends over time.
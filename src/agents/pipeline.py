@@ -0,0 +1,269 @@
+"""
+Turn Pipeline
+Screens, routes and answers one user message; shared by the CLI and the server
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+from google.genai import types
+from .registry import AgentRegistry, normalize_agent_name
+from .sessions import LazyAgentSessions, session_id_for
+from .scheduler import ESCALATED_RISK_LEVELS
+from utils.tracing import tracer
+
+# Menu shortcuts expanded to natural language before screening and routing
+COMMAND_PROMPTS = {
+    'mood': "I want to log my mood",
+    'patterns': "Show me my mood patterns",
+    'support': "I need some support and advice",
+    'help': "I need help"
+}
+
+# Answer given, without a model call, to a user past their daily token budget with no cached answer
+BUDGET_EXHAUSTED_MESSAGE = (
+    "You've reached today's limit for new responses, so I can only repeat answers I've already "
+    "given until tomorrow. If you're struggling or feeling unsafe, tell me and I'll share crisis "
+    "resources right away - that is never limited."
+)
+
+
+class TurnResult(NamedTuple):
+    """Outcome of one turn"""
+    agent: str
+    text: str
+    crisis_resources: Optional[str]
+    latency: Dict[str, Optional[float]]
+    cached: bool = False
+    routed_by: str = ""   # crisis_screen, local, cache, orchestrator, fallback or budget
+
+
+class TurnPipeline:
+    """
+    Crisis pre-screen, local routing, routing cache, orchestrator fallback and
+    specialist dispatch for a single message.
+
+    Sessions are keyed by (agent, user) in LazyAgentSessions and risk by the
+    user's crisis session, so one pipeline serves any number of users. The only
+    per-user state it holds is the agent that answered each user's last turn
+    (for the orchestrator's routing context), capped at MAX_TRACKED_USERS.
+    """
+
+    MAX_TRACKED_USERS = 10_000
+
+    def __init__(self, registry: AgentRegistry, specialists: LazyAgentSessions,
+                 intent_router: Any, routing_cache: Any, routing_log: Any,
+                 risk_tracker: Any, crisis_catalog: Any, prescreen: Callable,
+                 speculator: Any = None, run_config: Any = None, response_cache: Any = None,
+                 scheduler: Any = None, call_guard: Any = None, usage_ledger: Any = None):
+        """
+        Args:
+            registry: Registry holding the orchestrator and every specialist
+            specialists: Sessions of the agents a turn may be dispatched to
+            intent_router: Local rules/classifier router
+            routing_cache: Cache of orchestrator decisions
+            routing_log: Log of orchestrator decisions (classifier training data)
+            risk_tracker: Accumulates crisis risk per conversation
+            crisis_catalog: Pre-rendered crisis responses
+            prescreen: Function screening a message for crisis signals
+            speculator: Optional speculative executor for the likely specialist
+            run_config: ADK run config for specialist runs
+            response_cache: Optional cache of answers that only narrate stored data
+            scheduler: Optional model-call scheduler gating the agents (held for its metrics)
+            call_guard: Optional ModelCallGuard bounding the agents' model calls (held for its metrics)
+            usage_ledger: Optional UsageLedger whose daily budgets limit model calls per user
+        """
+        self.registry = registry
+        self.specialists = specialists
+        self.intent_router = intent_router
+        self.routing_cache = routing_cache
+        self.routing_log = routing_log
+        self.risk_tracker = risk_tracker
+        self.crisis_catalog = crisis_catalog
+        self.prescreen = prescreen
+        self.speculator = speculator
+        self.run_config = run_config
+        self.response_cache = response_cache
+        self.scheduler = scheduler
+        self.call_guard = call_guard
+        self.usage_ledger = usage_ledger
+        self.last_agents: "OrderedDict[str, str]" = OrderedDict()
+
+    def routing_context(self, user_id: str, turn_state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fixed-size context handed to the orchestrator through session state, so a
+        stateless orchestrator can resolve follow-ups without the conversation history
+        """
+        return {
+            "last_agent": self.last_agents.get(user_id, "none"),
+            "risk_level": turn_state["risk_level"]
+        }
+
+    def remember_agent(self, user_id: str, agent_name: str):
+        self.last_agents[user_id] = agent_name
+        self.last_agents.move_to_end(user_id)
+        while len(self.last_agents) > self.MAX_TRACKED_USERS:
+            self.last_agents.popitem(last=False)
+
+    async def route(self, user_id: str, text: str, content: types.Content, cacheable: bool,
+                    turn_state: Dict[str, Any], allow_model: bool = True):
+        """
+        Decide which agent answers a message that passed the crisis screen
+
+        Args:
+            allow_model: Whether the orchestrator may be asked; if not, only local
+                routing and the routing cache are used
+
+        Returns:
+            (target agent name or None if only the orchestrator could decide,
+             orchestrator reply text, adopted speculative run or None,
+             routing tier that decided: local, cache, orchestrator or budget)
+        """
+        local_route = self.intent_router.route(text)
+        if local_route.agent:
+            tracer.annotate(routed_by="local", agent=local_route.agent)
+            return local_route.agent, "", None, "local"
+
+        processed_input = content.parts[0].text
+        # Inputs flagged by the crisis screen never touch the routing cache
+        cached_agent = self.routing_cache.get(processed_input) if cacheable else None
+        if cached_agent:
+            tracer.annotate(routed_by="cache", agent=cached_agent)
+            return cached_agent, "", None, "cache"
+        if not allow_model:
+            return None, "", None, "budget"
+
+        speculation = None
+        guess = self.speculator.predict(processed_input) if self.speculator else None
+        if guess:
+            speculation = self.speculator.start(
+                guess, user_id, content, state_delta=turn_state, run_config=self.run_config
+            )
+        try:
+            routing_decision = await self.registry.run(
+                "OrchestratorAgent", user_id, content,
+                state_delta=self.routing_context(user_id, turn_state)
+            )
+        except BaseException:
+            # A failed or cancelled routing call adopts no guess; settle it as a miss so the
+            # run stops, its tokens are charged and its side effects are counted as suppressed
+            if speculation:
+                self.speculator.resolve(speculation, None)
+            raise
+
+        target_agent_name = normalize_agent_name(routing_decision)
+        self.routing_log.record(processed_input, target_agent_name)
+        if cacheable and target_agent_name in self.specialists.agents:
+            self.routing_cache.put(processed_input, target_agent_name)
+        if speculation:
+            speculation = self.speculator.resolve(speculation, target_agent_name)
+        tracer.annotate(routed_by="orchestrator", agent=target_agent_name,
+                        speculated=guess, speculation_hit=speculation is not None)
+        return target_agent_name, routing_decision, speculation, "orchestrator"
+
+    async def handle(self, user_id: str, user_input: str, crisis_region: Optional[str],
+                     renderer: Optional[Callable] = None,
+                     on_crisis_resources: Optional[Callable[[str], None]] = None) -> TurnResult:
+        """
+        Answer one message
+
+        Args:
+            user_id: User identifier
+            user_input: The raw message
+            crisis_region: Region whose crisis resources are served to this user
+            renderer: Factory renderer(agent_name, started_at); defaults to the agent's registered renderer
+            on_crisis_resources: Called with crisis resources as soon as a high-risk message is detected
+
+        Returns:
+            TurnResult
+        """
+        turn_started = time.perf_counter()
+        # Every span opened while answering (agents, tools, DB queries) nests under this turn
+        with tracer.trace("turn", user_id=user_id):
+            make_renderer = renderer or self.registry.renderer
+
+            processed_input = COMMAND_PROMPTS.get(user_input.lower(), user_input)
+            content = types.Content(role="user", parts=[types.Part(text=processed_input)])
+
+            # 1. Screen locally for crisis signals before any model call,
+            # folding them into the conversation's accumulated risk
+            screen = self.prescreen(processed_input)
+            risk = self.risk_tracker.observe(session_id_for(user_id, "CrisisMonitorAgent"), user_id, screen)
+            turn_state = {
+                "crisis_region": crisis_region,
+                "risk_level": risk['level'],
+                "risk_score": round(risk['score'], 2)
+            }
+            crisis_resources = None
+            routing_decision = ""
+            speculation = None
+            # Crisis traffic is never limited; otherwise a spent budget rules out model calls
+            escalated = screen.level != "none" or risk['level'] in ESCALATED_RISK_LEVELS
+            over_budget = bool(self.usage_ledger) and not escalated and self.usage_ledger.over_budget(user_id)
+            if screen.level == "high" or risk['level'] == "high":
+                if screen.level == "high":
+                    # Show resources right away instead of waiting on the agent
+                    crisis_resources = self.crisis_catalog.get(crisis_region, "high")
+                    if on_crisis_resources:
+                        on_crisis_resources(crisis_resources)
+                target_agent_name = "CrisisMonitorAgent"
+                routed_by = "crisis_screen"
+            else:
+                # 2. Resolve shortcuts and clear intents locally; only ambiguous
+                # input pays for the orchestrator call
+                with tracer.span("route", "routing"):
+                    target_agent_name, routing_decision, speculation, routed_by = await self.route(
+                        user_id, user_input, content, screen.level == "none", turn_state,
+                        allow_model=not over_budget
+                    )
+                if self.speculator and target_agent_name:
+                    self.speculator.observe(target_agent_name)
+
+            # 3. Dispatch to the chosen specialist, streaming its response as it is generated,
+            # unless the same question about unchanged data was already answered
+            cache_key, cached_text = None, None
+            if self.response_cache and screen.level == "none" and target_agent_name in self.specialists.agents:
+                cache_key, cached_text = self.response_cache.lookup(user_id, target_agent_name, processed_input)
+            if cached_text is not None:
+                if speculation:
+                    # The guess was right but its answer is not needed after all
+                    self.speculator.withdraw(speculation)
+                output = make_renderer(target_agent_name, turn_started)
+                output.write(cached_text)
+            elif over_budget:
+                # Past the budget, only saved answers are served
+                self.usage_ledger.limited_turns += 1
+                target_agent_name = target_agent_name or "OrchestratorAgent"
+                routed_by = "budget"
+                output = make_renderer(target_agent_name, turn_started)
+                output.write(BUDGET_EXHAUSTED_MESSAGE)
+            elif target_agent_name in self.specialists.agents:
+                output = make_renderer(target_agent_name, turn_started)
+                if speculation:
+                    # The guessed specialist is already running; adopt its turn
+                    await self.registry.consume(target_agent_name, speculation.confirm(), output, user_id=user_id)
+                else:
+                    await self.registry.run(target_agent_name, user_id, content, state_delta=turn_state,
+                                            run_config=self.run_config, renderer=output)
+            else:
+                # Fallback - use the orchestrator's response directly
+                target_agent_name = "OrchestratorAgent"
+                routed_by = "fallback"
+                output = make_renderer(target_agent_name, turn_started)
+                output.write(routing_decision)
+
+            text = output.finish()
+            cached = cached_text is not None
+            answered = routed_by != "budget"
+            if answered:
+                self.remember_agent(user_id, target_agent_name)
+            if cache_key is not None and not cached and answered:
+                self.response_cache.put(cache_key, text)
+
+            # 4. Keep the histories this turn grew bounded, after the reply is out
+            if routing_decision:
+                await self.registry.compact("OrchestratorAgent", user_id)
+            if target_agent_name in self.specialists.agents and not cached and answered:
+                await self.registry.compact(target_agent_name, user_id)
+            tracer.annotate(agent=target_agent_name, risk_level=risk['level'], crisis_screen=screen.level,
+                            response_cached=cached, over_budget=over_budget)
+            return TurnResult(target_agent_name, text, crisis_resources, output.latency(), cached, routed_by)
@@ -0,0 +1,197 @@
+"""
+Agent Registry
+Maps agent names to their runner, session factory and renderer, and meters every run
+"""
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+from google.genai import types
+from .sessions import LazyAgentSessions
+from utils.tracing import tracer
+
+
+class AgentSpec(NamedTuple):
+    """How to run and render one agent"""
+    name: str
+    sessions: LazyAgentSessions          # supplies the runner and creates sessions on first use
+    renderer: Optional[Callable] = None  # renderer(agent_name, started_at) for streamed output
+
+
+def normalize_agent_name(decision: str) -> str:
+    """Strip the quoting and whitespace the orchestrator sometimes wraps its decision in"""
+    return decision.strip().strip("`'\"").strip()
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class AgentMetrics:
+    """Per-agent counters; latencies are kept for the most recent runs only"""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.errors = 0
+        self.tool_calls = 0
+        self.total_seconds = 0.0
+        self.latencies: deque = deque(maxlen=window)
+
+    def record(self, seconds: float, tool_calls: int, error: bool):
+        self.calls += 1
+        self.tool_calls += tool_calls
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.latencies.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "tool_calls": self.tool_calls,
+            "total_seconds": round(self.total_seconds, 3),
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p95": round(percentile(ordered, 0.95), 3),
+            "p99": round(percentile(ordered, 0.99), 3)
+        }
+
+
+class AgentRegistry:
+    """Dispatches turns to agents by exact name and collects per-agent metrics"""
+
+    def __init__(self, compactor: Any = None, usage_ledger: Any = None):
+        """
+        Args:
+            compactor: Optional SessionCompactor bounding each agent's session history
+            usage_ledger: Optional UsageLedger the token usage of every run is recorded in
+        """
+        self.compactor = compactor
+        self.usage_ledger = usage_ledger
+        self._specs: Dict[str, AgentSpec] = {}
+        self._metrics: Dict[str, AgentMetrics] = {}
+
+    def register(self, name: str, sessions: LazyAgentSessions, renderer: Optional[Callable] = None):
+        """
+        Register an agent
+
+        Args:
+            name: Agent name, as emitted by the orchestrator
+            sessions: Sessions object that owns the agent
+            renderer: Factory renderer(agent_name, started_at) used for this agent's output
+        """
+        self._specs[name] = AgentSpec(name, sessions, renderer)
+        self._metrics.setdefault(name, AgentMetrics())
+
+    def register_all(self, sessions: LazyAgentSessions, renderer: Optional[Callable] = None):
+        """Register every agent owned by a sessions object"""
+        for name in sessions.agents:
+            self.register(name, sessions, renderer)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    def renderer(self, name: str, started_at: Optional[float] = None):
+        """Create the renderer for a turn answered by this agent, or None if it has none"""
+        factory = self._specs[name].renderer
+        return factory(name, started_at) if factory else None
+
+    async def run(self, name: str, user_id: str, new_message: types.Content,
+                  state_delta: Optional[Dict[str, Any]] = None, run_config: Any = None,
+                  renderer: Any = None) -> str:
+        """
+        Run one turn on an agent
+
+        Args:
+            name: Registered agent name
+            user_id: User identifier
+            new_message: The user's message
+            state_delta: State delta applied to the agent's session
+            run_config: ADK run config
+            renderer: Receives each event via feed(); None collects text silently
+
+        Returns:
+            The response text
+        """
+        spec = self._specs[name]
+        events = spec.sessions.runner(name).run_async(
+            user_id=user_id,
+            session_id=await spec.sessions.session_id(name, user_id),
+            new_message=new_message,
+            state_delta=state_delta,
+            run_config=run_config
+        )
+        return await self.consume(name, events, renderer, user_id=user_id)
+
+    async def consume(self, name: str, events: AsyncIterator, renderer: Any = None,
+                      user_id: Optional[str] = None) -> str:
+        """
+        Drain an agent's event stream, metering it as one call
+
+        Args:
+            name: Agent the events come from
+            events: The agent's events
+            renderer: Receives each event via feed(); None collects text silently
+            user_id: User the run is for; its model token usage is recorded against them
+
+        Returns:
+            The text of the agent's final (non-partial) events
+        """
+        started = time.perf_counter()
+        text = ""
+        tool_calls = 0
+        failed = False
+        # Model calls happen as the stream is drained, so tool and DB spans nest under this one
+        with tracer.span(f"agent.{name}", "agent", agent=name) as span:
+            try:
+                async for event in events:
+                    if renderer is not None:
+                        renderer.feed(event)
+                    tool_calls += len(event.get_function_calls())
+                    # Streamed chunks are repeated in full by the final event, which carries the usage
+                    if self.usage_ledger and user_id and event.usage_metadata and not event.partial:
+                        self.usage_ledger.record(user_id, name, event.usage_metadata)
+                    if not event.partial and event.content and event.content.parts:
+                        text += "".join(part.text for part in event.content.parts if part.text)
+                return text
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self._metrics[name].record(time.perf_counter() - started, tool_calls, failed)
+                if span is not None:
+                    span.set(tool_calls=tool_calls, response_chars=len(text))
+
+    async def compact(self, name: str, user_id: str) -> bool:
+        """
+        Fold old events of a user's session with an agent into a summary, if it has grown too long
+
+        Returns:
+            True if the session was compacted
+        """
+        if self.compactor is None:
+            return False
+        sessions = self._specs[name].sessions
+        with tracer.span("compaction", "session", agent=name) as span:
+            compacted = await self.compactor.maybe_compact(
+                sessions.session_service, sessions.app_name, user_id,
+                await sessions.session_id(name, user_id)
+            )
+            if span is not None:
+                span.set(compacted=compacted)
+        return compacted
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent metrics, with each agent's share of total agent time"""
+        summaries = {name: metrics.summary() for name, metrics in self._metrics.items()}
+        total = sum(summary["total_seconds"] for summary in summaries.values())
+        for summary in summaries.values():
+            summary["time_share"] = round(summary["total_seconds"] / total, 3) if total else 0.0
+        return summaries
@@ -0,0 +1,307 @@
+"""
+Model Call Resilience
+Deadlines, jittered retries and hedged duplicates around each agent's model calls
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Awaitable, Callable, Deque, Dict, NamedTuple, Optional, Tuple
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest, LlmResponse
+from pydantic import PrivateAttr
+from .registry import percentile
+from utils.tracing import tracer
+
+# Provider status codes worth another attempt: request timeout, throttling and transient server errors
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+class ModelCallFailed(Exception):
+    """A model call that missed its deadline or failed on every attempt"""
+
+    def __init__(self, agent_name: str, attempts: int, cause: Optional[BaseException] = None):
+        super().__init__(f"{agent_name} did not respond after {attempts} attempt{'s' if attempts != 1 else ''}")
+        self.agent_name = agent_name
+        self.attempts = attempts
+        self.cause = cause
+
+
+class CallPolicy(NamedTuple):
+    """How one agent's model calls are bounded, retried and hedged"""
+    deadline: float = 30.0           # seconds for a response to start, and between streamed chunks
+    retries: int = 2                 # further attempts after a timeout or retryable error
+    backoff: float = 0.5             # base of the exponential backoff between attempts
+    backoff_max: float = 4.0         # cap on any single backoff
+    hedge: bool = False              # send a duplicate once a call is slower than hedge_percentile
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20      # calls observed before hedging starts
+
+    def backoff_delay(self, retry: int, rng: random.Random) -> float:
+        """Full jitter: uniform between zero and the capped exponential backoff"""
+        return rng.uniform(0, min(self.backoff_max, self.backoff * 2 ** retry))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed attempt may succeed if repeated"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+
+class CallMetrics:
+    """Per-agent model call counters; latencies are kept for the most recent calls only"""
+
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Call start to first response, as the agent saw it (retries and hedging included)
+        self.first_response: Deque[float] = deque(maxlen=window)
+        # Winning attempt's own start to its first response; sets the hedge delay
+        self.attempt_latencies: Deque[float] = deque(maxlen=window)
+        self._hedge_delay: Optional[float] = None
+        self._hedge_samples = 0
+
+    def hedge_delay(self, policy: CallPolicy) -> Optional[float]:
+        """Delay after which a duplicate is sent, or None while hedging is off or warming up"""
+        samples = len(self.attempt_latencies)
+        if not policy.hedge or samples < policy.hedge_min_samples:
+            return None
+        # Re-sorting the window on every call is wasted work; the percentile moves slowly
+        if self._hedge_delay is None or abs(samples - self._hedge_samples) >= 10 or samples == self.attempt_latencies.maxlen:
+            self._hedge_delay = percentile(sorted(self.attempt_latencies), policy.hedge_percentile)
+            self._hedge_samples = samples
+        return self._hedge_delay
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.first_response)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p95": round(percentile(ordered, 0.95), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "p999": round(percentile(ordered, 0.999), 3),
+            "max": round(ordered[-1], 3) if ordered else 0.0
+        }
+
+
+async def _next_response(responses: AsyncGenerator[LlmResponse, None]) -> Optional[LlmResponse]:
+    """Next response of a stream, or None once it is exhausted"""
+    try:
+        return await responses.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+def _copy_request(llm_request: LlmRequest) -> LlmRequest:
+    """Copy of a request's contents and config; tools are shared"""
+    return llm_request.model_copy(update={
+        "contents": [content.model_copy(deep=True) for content in llm_request.contents],
+        "config": llm_request.config.model_copy(deep=True) if llm_request.config else None
+    })
+
+
+def _discard_outcome(task: asyncio.Task):
+    """Retrieve a losing attempt's outcome so it is not reported as unhandled"""
+    if not task.cancelled():
+        task.exception()
+
+
+class ResilientLlm(BaseLlm):
+    """
+    Wraps an agent's model with a deadline, retries and optional hedging.
+
+    Each attempt must produce its first response within the policy deadline.
+    Attempts that time out or fail with a retryable error are repeated after
+    a jittered exponential backoff. With hedging on, a duplicate request is
+    sent once an attempt has run longer than the agent's recent p95, and
+    whichever answers first is streamed; the other is cancelled.
+
+    Only model requests are duplicated. ADK runs the tools named in the
+    winning response once, after it is returned, so a hedge or retry never
+    repeats a tool's side effects (a mood entry is logged once). Retries and
+    hedges stop once a response has started streaming; a stream that then
+    stalls past the deadline fails the call.
+    """
+
+    model: str = ""
+    inner: BaseLlm
+    agent_name: str = ""
+    policy: CallPolicy = CallPolicy()
+    metrics: Any = None
+    # Called before each extra attempt, so retries and hedges count against the rate limit
+    readmit: Optional[Callable[[], Awaitable[Any]]] = None
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any):
+        self._rng = random.Random(self.seed)
+        if self.metrics is None:
+            self.metrics = CallMetrics()
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        responses, first = await self._respond(llm_request, stream)
+        try:
+            if first is None:
+                return
+            yield first
+            while True:
+                try:
+                    response = await asyncio.wait_for(_next_response(responses), self.policy.deadline)
+                except asyncio.TimeoutError as e:
+                    self.metrics.timeouts += 1
+                    self.metrics.failures += 1
+                    raise ModelCallFailed(self.agent_name, 1, e) from e
+                if response is None:
+                    return
+                yield response
+        finally:
+            await responses.aclose()
+
+    async def _respond(self, llm_request: LlmRequest,
+                       stream: bool) -> Tuple[AsyncGenerator[LlmResponse, None], Optional[LlmResponse]]:
+        """Retry until an attempt starts responding; returns its stream and first response"""
+        policy, metrics = self.policy, self.metrics
+        metrics.calls += 1
+        started = time.perf_counter()
+        with tracer.span("model.call", "model", agent=self.agent_name) as span:
+            error: Optional[BaseException] = None
+            for attempt in range(policy.retries + 1):
+                if attempt:
+                    metrics.retries += 1
+                    await asyncio.sleep(policy.backoff_delay(attempt - 1, self._rng))
+                    if self.readmit:
+                        await self.readmit()
+                try:
+                    responses, first, hedged = await self._race(llm_request, stream)
+                except Exception as e:
+                    if not is_retryable(e):
+                        metrics.failures += 1
+                        raise
+                    error = e
+                    continue
+                metrics.first_response.append(time.perf_counter() - started)
+                if span is not None:
+                    span.set(attempts=attempt + 1, hedged=hedged)
+                return responses, first
+            metrics.failures += 1
+            raise ModelCallFailed(self.agent_name, policy.retries + 1, error) from error
+
+    async def _race(self, llm_request: LlmRequest,
+                    stream: bool) -> Tuple[AsyncGenerator[LlmResponse, None], Optional[LlmResponse], bool]:
+        """
+        One attempt, plus a hedged duplicate if it runs past the hedge delay
+
+        Returns:
+            (winning stream, its first response or None if it was empty, whether the hedge won)
+
+        Raises:
+            asyncio.TimeoutError if nothing responded within the deadline, or the last attempt's error
+        """
+        policy, metrics = self.policy, self.metrics
+        started = time.perf_counter()
+        deadline = started + policy.deadline
+        hedge_delay = metrics.hedge_delay(policy)
+        hedge_at = started + hedge_delay if hedge_delay is not None and hedge_delay < policy.deadline else None
+        racers: Dict[asyncio.Task, Tuple[AsyncGenerator[LlmResponse, None], float, bool]] = {}
+
+        def launch(hedged: bool):
+            # Models may adjust the request they are given, so the duplicate gets its own copy
+            request = _copy_request(llm_request) if hedged else llm_request
+            responses = self._attempt(request, stream, hedged)
+            racers[asyncio.create_task(_next_response(responses))] = (responses, time.perf_counter(), hedged)
+
+        launch(hedged=False)
+        error: Optional[BaseException] = None
+        try:
+            while racers:
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(racers, timeout=max(0.0, wake - time.perf_counter()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    responses, attempt_started, hedged = racers.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    metrics.attempt_latencies.append(time.perf_counter() - attempt_started)
+                    metrics.hedge_wins += int(hedged)
+                    return responses, task.result(), hedged
+                if done:
+                    continue
+                now = time.perf_counter()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    metrics.hedges += 1
+                    launch(hedged=True)
+                elif now >= deadline:
+                    metrics.timeouts += 1
+                    raise asyncio.TimeoutError(f"{self.agent_name} model call exceeded {policy.deadline:g}s")
+            raise error
+        finally:
+            for task in racers:
+                task.cancel()
+                task.add_done_callback(_discard_outcome)
+
+    async def _attempt(self, llm_request: LlmRequest, stream: bool,
+                       hedged: bool) -> AsyncGenerator[LlmResponse, None]:
+        if hedged and self.readmit:
+            await self.readmit()
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            yield response
+
+
+class ModelCallGuard:
+    """Applies call policies to agents' models and collects their tail-latency metrics"""
+
+    def __init__(self, policy: CallPolicy = CallPolicy(), deadlines: Optional[Dict[str, float]] = None,
+                 readmit: Optional[Callable[[], Awaitable[Any]]] = None, seed: Optional[int] = None):
+        """
+        Args:
+            policy: Policy for every agent
+            deadlines: Agent name -> deadline in seconds, overriding the policy's
+            readmit: Coroutine function awaited before each retry or hedge (the scheduler's readmit)
+            seed: Seed for backoff jitter
+        """
+        self.policy = policy
+        self.deadlines = dict(deadlines or {})
+        self.readmit = readmit
+        self.seed = seed
+        self.metrics: Dict[str, CallMetrics] = {}
+
+    def policy_for(self, agent_name: str) -> CallPolicy:
+        return self.policy._replace(deadline=self.deadlines.get(agent_name, self.policy.deadline))
+
+    def wrap(self, agent: Agent) -> Agent:
+        """Route an agent's model calls through a ResilientLlm (once)"""
+        if isinstance(agent.model, ResilientLlm):
+            return agent
+        inner = agent.model if isinstance(agent.model, BaseLlm) else LLMRegistry.new_llm(agent.model)
+        agent.model = self.guard(agent.name, inner)
+        return agent
+
+    def guard(self, name: str, llm: BaseLlm) -> "ResilientLlm":
+        """Wrap a model with the named agent's policy; also used for calls made outside any agent"""
+        return ResilientLlm(
+            model=llm.model,
+            inner=llm,
+            agent_name=name,
+            policy=self.policy_for(name),
+            metrics=self.metrics.setdefault(name, CallMetrics()),
+            readmit=self.readmit,
+            seed=self.seed
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent retry, timeout and hedge counts with time-to-first-response percentiles"""
+        return {name: metrics.summary() for name, metrics in self.metrics.items()}
@@ -0,0 +1,242 @@
+"""
+Model Call Scheduler
+Rate-limits model calls and orders them by priority class and user
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+from .registry import percentile
+from utils.tracing import tracer
+
+# Highest priority first
+PRIORITY_CLASSES = ("crisis", "mood", "support", "patterns")
+
+# Routing serves every class, so it runs ahead of pattern narration
+AGENT_PRIORITIES = {
+    "CrisisMonitorAgent": "crisis",
+    "MoodTrackerAgent": "mood",
+    "OrchestratorAgent": "support",
+    "SupportAgent": "support",
+    "PatternAnalyzerAgent": "patterns",
+    # Compaction runs after the reply is out, so it waits behind every user-facing call
+    "SessionSummarizer": "patterns"
+}
+
+# Any call made for a conversation at these risk levels is treated as crisis traffic
+ESCALATED_RISK_LEVELS = ("moderate", "high")
+
+# (user, priority class) of the model call admitted last in the running task
+_admission: ContextVar[Optional[Tuple[str, str]]] = ContextVar("model_admission", default=None)
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`; starts full"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        """Take a token if one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def refund(self):
+        """Return a token that was taken but not used"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class ClassMetrics:
+    """Per-class counters; wait times are kept for the most recent calls only"""
+
+    def __init__(self, window: int = 1000):
+        self.granted = 0
+        self.cancelled = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.waits: Deque[float] = deque(maxlen=window)
+
+
+class ModelScheduler:
+    """
+    Admits model calls at the provider's rate limit, highest priority class first.
+
+    Each call takes one token from a bucket refilled at requests_per_minute / 60
+    per second, holding up to `burst` tokens. While tokens are available calls
+    pass straight through. Otherwise they queue by class (crisis, mood, support,
+    patterns). Within a class, users are served round-robin, so one user's burst
+    of tool hops cannot starve other users of the same class. A lower class only
+    gets a token when every higher class queue is empty.
+
+    Attach admit_model_call as an agent's before_model_callback to gate its calls.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 10, wait_window: int = 1000):
+        """
+        Args:
+            requests_per_minute: Sustained model calls allowed per minute (the quota)
+            burst: Calls allowed back to back after an idle period
+            wait_window: Number of recent wait times kept per class for percentiles
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.bucket = TokenBucket(requests_per_minute / 60.0, max(1, burst))
+        # class -> user -> waiters in arrival order; user order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]"] = {
+            name: OrderedDict() for name in PRIORITY_CLASSES
+        }
+        self._depth = {name: 0 for name in PRIORITY_CLASSES}
+        self.metrics = {name: ClassMetrics(wait_window) for name in PRIORITY_CLASSES}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def priority_for(agent_name: str, risk_level: Optional[str] = None) -> str:
+        """Priority class of a call made by an agent in a conversation at a risk level"""
+        if risk_level in ESCALATED_RISK_LEVELS:
+            return "crisis"
+        return AGENT_PRIORITIES.get(agent_name, "support")
+
+    async def acquire(self, user_id: str, priority: str) -> float:
+        """
+        Wait for permission to make one model call
+
+        Args:
+            user_id: User the call is made for
+            priority: One of PRIORITY_CLASSES
+
+        Returns:
+            Seconds spent waiting
+        """
+        metrics = self.metrics[priority]
+        if self._depth_total() == 0 and self.bucket.try_take():
+            self._record_grant(metrics, 0.0)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        enqueued = time.perf_counter()
+        self._queues[priority].setdefault(user_id, deque()).append((future, enqueued))
+        self._depth[priority] += 1
+        metrics.max_depth = max(metrics.max_depth, self._depth[priority])
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A cancelled turn leaves its queue slot to be skipped by the dispatcher
+            if future.cancelled():
+                metrics.cancelled += 1
+            raise
+        return time.perf_counter() - enqueued
+
+    async def admit(self, user_id: str, agent_name: str, risk_level: Optional[str] = None) -> float:
+        """
+        Hold a model call until the scheduler admits it; retries and hedges of
+        the call made later in the same task are readmitted under its class
+
+        Args:
+            user_id: User the call is made for
+            agent_name: Agent (or other caller) making the call
+            risk_level: Risk level of the conversation, if known
+
+        Returns:
+            Seconds spent waiting
+        """
+        priority = self.priority_for(agent_name, risk_level)
+        _admission.set((user_id, priority))
+        with tracer.span("model.queue", "scheduler", agent=agent_name, priority=priority) as span:
+            waited = await self.acquire(user_id, priority)
+            if span is not None:
+                span.set(waited_ms=round(waited * 1000, 3))
+        return waited
+
+    async def admit_model_call(self, callback_context: Any, llm_request: Any) -> None:
+        """before_model_callback: hold the call until the scheduler admits it"""
+        await self.admit(callback_context.user_id, callback_context.agent_name,
+                         callback_context.state.get("risk_level"))
+        return None
+
+    async def readmit(self) -> float:
+        """Wait for another token for the call admitted in this task (a retry or hedged duplicate)"""
+        admission = _admission.get()
+        if admission is None:
+            return 0.0
+        return await self.acquire(*admission)
+
+    async def _dispatch(self):
+        """Hand out tokens to queued calls until the queues are empty"""
+        while self._depth_total():
+            if not self.bucket.try_take():
+                await asyncio.sleep(self.bucket.wait_time())
+                continue
+            waiter = self._next_waiter()
+            if waiter is None:
+                # Every remaining waiter had been cancelled
+                self.bucket.refund()
+                continue
+            priority, future, enqueued = waiter
+            self._record_grant(self.metrics[priority], time.perf_counter() - enqueued)
+            future.set_result(None)
+
+    def _next_waiter(self) -> Optional[Tuple[str, asyncio.Future, float]]:
+        """Pop the next live waiter: highest class first, users round-robin within a class"""
+        for priority in PRIORITY_CLASSES:
+            users = self._queues[priority]
+            while users:
+                user_id, waiters = next(iter(users.items()))
+                future, enqueued = waiters.popleft()
+                self._depth[priority] -= 1
+                # The user moves to the back of the round-robin order
+                del users[user_id]
+                if waiters:
+                    users[user_id] = waiters
+                if not future.done():
+                    return priority, future, enqueued
+        return None
+
+    def _record_grant(self, metrics: ClassMetrics, waited: float):
+        metrics.granted += 1
+        metrics.total_wait += waited
+        metrics.waits.append(waited)
+
+    def _depth_total(self) -> int:
+        return sum(self._depth.values())
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Queue depth and wait-time metrics per priority class
+
+        Returns:
+            class -> {granted, cancelled, waiting, max_waiting, avg_wait, p50_wait, p95_wait, p99_wait}
+        """
+        stats = {}
+        for priority in PRIORITY_CLASSES:
+            metrics = self.metrics[priority]
+            waits = sorted(metrics.waits)
+            stats[priority] = {
+                "granted": metrics.granted,
+                "cancelled": metrics.cancelled,
+                "waiting": self._depth[priority],
+                "max_waiting": metrics.max_depth,
+                "avg_wait": metrics.total_wait / metrics.granted if metrics.granted else 0.0,
+                "p50_wait": percentile(waits, 0.50),
+                "p95_wait": percentile(waits, 0.95),
+                "p99_wait": percentile(waits, 0.99)
+            }
+        return stats
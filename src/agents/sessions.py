@@ -0,0 +1,103 @@
+"""
+Agent Sessions
+Creates per-user agent runners and sessions lazily, on first use
+"""
+from typing import Callable, Dict, Optional, Tuple, Union
+from google.adk.agents import Agent, BaseAgent
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.runners import Runner
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+
+
+def session_id_for(user_id: str, agent_name: str) -> str:
+    """Stable session id for a user's conversation with one agent"""
+    return f"{user_id}-{agent_name}"
+
+
+class LazyAgentSessions:
+    """
+    Creates agent runners and sessions on first use instead of at startup.
+
+    Session ids are derived from (user, agent), so a returning user picks up
+    the session they already have and no rows are written for agents that a
+    conversation never reaches. Agents may be given as zero-argument loaders,
+    which are called (and their modules imported) on the agent's first run.
+    """
+
+    def __init__(self, app_name: str, session_service: BaseSessionService,
+                 agents: Dict[str, Union[Agent, Callable[[], Agent]]]):
+        """
+        Args:
+            app_name: ADK application name
+            session_service: Session service shared by these agents
+            agents: Agent name -> agent, or a function returning it
+        """
+        self.app_name = app_name
+        self.session_service = session_service
+        self.agents = agents
+        self._runners: Dict[str, Runner] = {}
+        self._sessions: Dict[Tuple[str, str], str] = {}
+
+    def agent(self, agent_name: str) -> Agent:
+        """Get an agent, calling its loader on first use"""
+        agent = self.agents[agent_name]
+        if not isinstance(agent, BaseAgent):
+            agent = self.agents[agent_name] = agent()
+        return agent
+
+    def runner(self, agent_name: str) -> Runner:
+        """Get the runner for an agent, creating it on first use"""
+        runner = self._runners.get(agent_name)
+        if runner is None:
+            runner = Runner(
+                agent=self.agent(agent_name),
+                app_name=self.app_name,
+                session_service=self.session_service
+            )
+            self._runners[agent_name] = runner
+        return runner
+
+    async def session_id(self, agent_name: str, user_id: str, state: Optional[dict] = None) -> str:
+        """
+        Get the user's session with an agent, creating it only if it doesn't exist yet
+
+        Args:
+            agent_name: Agent name
+            user_id: User identifier
+            state: Initial state for a newly created session
+
+        Returns:
+            The session id
+        """
+        key = (agent_name, user_id)
+        session_id = self._sessions.get(key)
+        if session_id is None:
+            session_id = session_id_for(user_id, agent_name)
+            try:
+                await self.session_service.create_session(
+                    app_name=self.app_name, user_id=user_id, state=state, session_id=session_id
+                )
+            except AlreadyExistsError:
+                pass
+            self._sessions[key] = session_id
+        return session_id
+
+
+class CurrentTurnSessionService(InMemorySessionService):
+    """
+    In-memory sessions that keep only the events of the turn in progress.
+
+    For agents run with include_contents='none' that take their context from
+    session state: earlier turns are never sent to the model, so keeping them
+    would only grow memory. State persists across turns as usual.
+    """
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if event.partial:
+            return event
+        stored = self.sessions[session.app_name][session.user_id][session.id]
+        for holder in ([session] if stored is session else [session, stored]):
+            holder.events[:] = [e for e in holder.events if e.invocation_id == event.invocation_id]
+        return event
@@ -0,0 +1,267 @@
+"""
+Speculative Specialist Execution
+Starts the likely specialist while the orchestrator is still deciding the route
+"""
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService, Session
+from google.genai import types
+from .sessions import LazyAgentSessions
+from utils.side_effects import SideEffectBuffer
+from utils.tracing import tracer
+
+# Agents whose turns are never started on a guess
+NON_SPECULATIVE = {"CrisisMonitorAgent"}
+
+_DONE = object()
+
+
+class BufferedSessionService(BaseSessionService):
+    """
+    Session service that keeps a speculative turn's events in memory until commit.
+
+    Reads go to the wrapped service; appended events only update the in-memory
+    session the runner holds, so an abandoned turn leaves no trace in storage.
+    """
+
+    def __init__(self, inner: BaseSessionService):
+        self.inner = inner
+        self.pending: List[Tuple[Session, Event]] = []
+
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None) -> Session:
+        return await self.inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+
+    async def get_session(self, *, app_name, user_id, session_id, config=None) -> Optional[Session]:
+        return await self.inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    async def list_sessions(self, *, app_name, user_id=None):
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name, user_id, session_id) -> None:
+        await self.inner.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session, event)
+        if not event.partial:
+            self.pending.append((session, event))
+        return event
+
+    async def commit(self) -> int:
+        """Persist buffered events to the wrapped service; returns how many were written"""
+        pending, self.pending = self.pending, []
+        stored: Dict[str, Session] = {}
+        for session, event in pending:
+            target = stored.get(session.id)
+            if target is None:
+                target = await self.inner.get_session(
+                    app_name=session.app_name, user_id=session.user_id, session_id=session.id
+                )
+                stored[session.id] = target
+            await self.inner.append_event(target, event)
+        return len(pending)
+
+
+class SpeculativeRun:
+    """A specialist turn started before the routing decision confirms it"""
+
+    def __init__(self, sessions: LazyAgentSessions, agent_name: str, user_id: str,
+                 new_message: types.Content, state_delta: Optional[Dict[str, Any]] = None,
+                 run_config: Any = None, usage_ledger: Any = None):
+        """
+        Args:
+            sessions: Sessions of the specialist agents
+            agent_name: The guessed specialist
+            user_id: User identifier
+            new_message: The user's message
+            state_delta: State delta passed to the run
+            run_config: ADK run config passed to the run
+            usage_ledger: Optional UsageLedger charged for the tokens of an abandoned run
+        """
+        self.agent_name = agent_name
+        self.user_id = user_id
+        self.usage_ledger = usage_ledger
+        self.session_buffer = BufferedSessionService(sessions.session_service)
+        self.side_effects = SideEffectBuffer()
+        self.started_at = time.perf_counter()
+        self.completed_at: Optional[float] = None
+        # Head start credited to the speculator when the guess was confirmed
+        self.credited = 0.0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(
+            self._run(sessions, user_id, new_message, state_delta, run_config)
+        )
+
+    async def _run(self, sessions: LazyAgentSessions, user_id: str, new_message: types.Content,
+                   state_delta: Optional[Dict[str, Any]], run_config: Any):
+        # Set inside the task so only this turn's tool calls are buffered
+        self.side_effects.activate()
+        runner = Runner(
+            agent=sessions.agent(self.agent_name),
+            app_name=sessions.app_name,
+            session_service=self.session_buffer
+        )
+        # Spans from the guessed turn nest here; a cancelled guess ends with a CancelledError
+        with tracer.span(f"speculative.{self.agent_name}", "agent", agent=self.agent_name):
+            try:
+                events = runner.run_async(
+                    user_id=user_id,
+                    session_id=await sessions.session_id(self.agent_name, user_id),
+                    new_message=new_message,
+                    state_delta=state_delta,
+                    run_config=run_config
+                )
+                async for event in events:
+                    self._queue.put_nowait(event)
+            except Exception as e:
+                self._queue.put_nowait(e)
+            finally:
+                self.completed_at = time.perf_counter()
+                self._queue.put_nowait(_DONE)
+
+    async def confirm(self) -> AsyncIterator[Event]:
+        """
+        Adopt the turn: run its deferred side effects, then yield its events,
+        first those already produced and then the rest as they arrive.
+        Buffered session events are persisted once the turn completes.
+        """
+        self.side_effects.flush()
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await self.session_buffer.commit()
+        finally:
+            if not self._task.done():
+                self._task.cancel()
+
+    def cancel(self) -> int:
+        """
+        Abandon the turn, dropping its session events and deferred side effects.
+        The model responses it already received still count against the user's tokens.
+
+        Returns:
+            Number of side effects suppressed
+        """
+        self._task.cancel()
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if (self.usage_ledger and isinstance(item, Event) and item.usage_metadata
+                    and not item.partial):
+                self.usage_ledger.record(self.user_id, self.agent_name, item.usage_metadata)
+        return self.side_effects.discard()
+
+    def head_start(self, confirmed_at: float) -> float:
+        """Seconds of specialist work done before the route was confirmed"""
+        end = min(confirmed_at, self.completed_at) if self.completed_at is not None else confirmed_at
+        return max(0.0, end - self.started_at)
+
+
+class Speculator:
+    """Guesses the specialist for a message and tracks how often the guess pays off"""
+
+    def __init__(self, sessions: LazyAgentSessions, classifier: Any = None,
+                 min_confidence: float = 0.5, history_size: int = 20,
+                 min_training_examples: int = 20, usage_ledger: Any = None):
+        """
+        Args:
+            sessions: Sessions of the specialist agents
+            classifier: Local intent classifier with predict(text) -> (agent, confidence)
+            min_confidence: Minimum classifier posterior worth speculating on
+            history_size: Number of recent routing decisions used when the classifier abstains
+            min_training_examples: Below this many examples the classifier is ignored
+            usage_ledger: Optional UsageLedger charged for the tokens of wrong guesses
+        """
+        self.sessions = sessions
+        self.usage_ledger = usage_ledger
+        self.classifier = classifier
+        self.min_confidence = min_confidence
+        self.min_training_examples = min_training_examples
+        self.recent: deque = deque(maxlen=history_size)
+
+        self.attempts = 0
+        self.hits = 0
+        self.misses = 0
+        self.suppressed_side_effects = 0
+        self.latency_saved = 0.0
+
+    def _candidate(self, agent: Optional[str]) -> bool:
+        return agent in self.sessions.agents and agent not in NON_SPECULATIVE
+
+    def predict(self, text: str) -> Optional[str]:
+        """
+        Guess the specialist for a message
+
+        Returns:
+            The classifier's prediction if confident enough, else the most
+            frequent recent routing decision, or None
+        """
+        if self.classifier is not None and self.classifier.trained_examples >= self.min_training_examples:
+            agent, confidence = self.classifier.predict(text)
+            if self._candidate(agent) and confidence >= self.min_confidence:
+                return agent
+        if self.recent:
+            agent, _ = Counter(self.recent).most_common(1)[0]
+            return agent
+        return None
+
+    def observe(self, agent: str):
+        """Record where a message was actually routed"""
+        if self._candidate(agent):
+            self.recent.append(agent)
+
+    def start(self, agent_name: str, user_id: str, new_message: types.Content,
+              state_delta: Optional[Dict[str, Any]] = None, run_config: Any = None) -> SpeculativeRun:
+        """Start the guessed specialist's turn"""
+        self.attempts += 1
+        return SpeculativeRun(self.sessions, agent_name, user_id, new_message, state_delta, run_config,
+                              usage_ledger=self.usage_ledger)
+
+    def resolve(self, run: SpeculativeRun, target_agent_name: Optional[str]) -> Optional[SpeculativeRun]:
+        """
+        Settle a speculative run against the real routing decision
+
+        Args:
+            run: The speculative run
+            target_agent_name: The agent routed to, or None if routing failed
+
+        Returns:
+            The run if the guess was right, otherwise None after cancelling it
+        """
+        if run.agent_name == target_agent_name:
+            self.hits += 1
+            run.credited = run.head_start(time.perf_counter())
+            self.latency_saved += run.credited
+            return run
+        self.misses += 1
+        self.suppressed_side_effects += run.cancel()
+        return None
+
+    def withdraw(self, run: SpeculativeRun):
+        """Cancel a confirmed run whose answer was not used, recounting it as a miss"""
+        self.hits -= 1
+        self.latency_saved -= run.credited
+        self.misses += 1
+        self.suppressed_side_effects += run.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate and latency-saved counters"""
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+            "latency_saved": round(self.latency_saved, 3),
+            "suppressed_side_effects": self.suppressed_side_effects
+        }
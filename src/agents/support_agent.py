@@ -1,11 +1,15 @@
 from google.adk.agents import Agent
-from tools.rag_tools import retrieve_strategy_tool
+from tools.rag_tools import retrieve_strategy_tool, record_feedback_tool
+from utils.tracing import trace_tool_start, trace_tool_end, trace_tool_error
 
 # Define the Support Agent
 support_agent = Agent(
     name="SupportAgent",
     model="gemini-2.0-flash",
-    tools=[retrieve_strategy_tool],
+    tools=[retrieve_strategy_tool, record_feedback_tool],
+    before_tool_callback=trace_tool_start,
+    after_tool_callback=trace_tool_end,
+    on_tool_error_callback=trace_tool_error,
     instruction="""
     You are a supportive mental health companion. Your role is to listen to the user's concerns, 
     validate their feelings, and provide evidence-based coping strategies.
@@ -13,8 +17,11 @@ support_agent = Agent(
     Follow this flow:
     1. Listen actively to the user's problem or feeling.
     2. Validate their emotion (e.g., "It makes sense that you feel anxious about that.").
-    3. Use the 'retrieve_strategy' tool to find a relevant coping exercise based on their emotion.
+    3. Use the 'retrieve_strategy' tool to find a relevant coping exercise based on their emotion
+       and how intense it feels (1-10).
     4. Present the strategy clearly to the user and encourage them to try it.
+    5. If the user tells you whether a strategy helped, use the 'record_strategy_feedback' tool
+       with the strategy id so future suggestions fit them better.
     
     Always maintain a warm, safe, and non-clinical tone. You are a companion, not a doctor.
     """
@@ -1,30 +1,194 @@
+import io
 import os
+import json
 import sys
 import asyncio
+import importlib
+import locale
+import signal
 from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Iterable, TextIO
 from dotenv import load_dotenv
 
 # Add src to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.sessions.sqlite_session_service import SqliteSessionService
-from google.genai import types
-from agents.orchestrator import orchestrator_agent
-from agents.mood_agent import mood_tracker_agent
-from agents.support_agent import support_agent
-from agents.pattern_agent import pattern_analyzer_agent
-from agents.crisis_agent import crisis_monitor_agent
+# Only what the header, menu and local commands need is imported here; ADK,
+# the agents and their tools are imported when the pipeline is built
 from utils.database import DatabaseManager
 from utils.profile_manager import ProfileManager
 from utils.data_export import DataExporter
+from utils.crisis_catalog import crisis_catalog
+from utils.tracing import tracer, waterfall_rows
 from ui.cli import CLI
-from utils.config import DATABASE_PATH
+from ui.streaming import StreamingRenderer
+from ui.server import ChatServer
+from utils.config import (SESSION_DATABASE_PATH, DEFAULT_TIMEZONE, DEBUG, STREAMING,
+                          SPECULATIVE_ROUTING, SPECULATION_MIN_CONFIDENCE, STATELESS_ROUTING,
+                          SERVER_HOST, SERVER_PORT, SERVER_MAX_CONCURRENCY, SERVER_MAX_PENDING, BATCH_CONCURRENCY,
+                          MODEL_BACKEND, FAKE_MODEL_LATENCY, FAKE_MODEL_SEED,
+                          MODEL_RATE_LIMIT_RPM, MODEL_RATE_LIMIT_BURST,
+                          MODEL_DEADLINE_SECONDS, MODEL_DEADLINES, MODEL_RETRIES,
+                          MODEL_BACKOFF_SECONDS, MODEL_BACKOFF_MAX_SECONDS,
+                          HEDGED_REQUESTS, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES,
+                          COMPACTION_MAX_EVENTS, COMPACTION_MAX_TOKENS, COMPACTION_KEEP_RECENT,
+                          COMPACTION_SUMMARIZER, COMPACTION_ARCHIVE_DIR, require_api_key)
+
+if TYPE_CHECKING:
+    from agents.pipeline import TurnPipeline
 
 APP_NAME = "MentalHealthCompanion"
 USER_ID = "test_user_001"
 
+# Agent name -> (module, attribute); modules are imported on the agent's first run.
+# The order fixes each agent's fake-model seed offset.
+AGENT_MODULES = {
+    "OrchestratorAgent": ("agents.orchestrator", "orchestrator_agent"),
+    "MoodTrackerAgent": ("agents.mood_agent", "mood_tracker_agent"),
+    "SupportAgent": ("agents.support_agent", "support_agent"),
+    "PatternAnalyzerAgent": ("agents.pattern_agent", "pattern_analyzer_agent"),
+    "CrisisMonitorAgent": ("agents.crisis_agent", "crisis_monitor_agent")
+}
+
+async def run_interruptible(coro):
+    """Run a turn so that Ctrl-C cancels it instead of exiting the application"""
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(coro)
+    previous_handler = signal.getsignal(signal.SIGINT)
+    signal.signal(signal.SIGINT, lambda signum, frame: loop.call_soon_threadsafe(task.cancel))
+    try:
+        return await task
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+def agent_loader(name: str, scheduler: Any = None, call_guard: Any = None) -> Callable:
+    """Loader importing an agent's module and applying the configured backend to it"""
+    def load():
+        module, attribute = AGENT_MODULES[name]
+        agent = getattr(importlib.import_module(module), attribute)
+        if MODEL_BACKEND == "fake":
+            from agents.fake_model import use_fake_models
+            use_fake_models([agent], latency=FAKE_MODEL_LATENCY,
+                            seed=FAKE_MODEL_SEED + list(AGENT_MODULES).index(name))
+        if name == "OrchestratorAgent" and STATELESS_ROUTING:
+            # The orchestrator sees only the new message and its routing context in state,
+            # so its sessions need not keep earlier turns
+            agent.include_contents = 'none'
+        if scheduler:
+            # Every model call the agent makes (tool hops included) waits for the scheduler
+            agent.before_model_callback = scheduler.admit_model_call
+        if call_guard:
+            # Deadlines, retries and hedging wrap the backend chosen above
+            call_guard.wrap(agent)
+        return agent
+    return load
+
+def build_pipeline(db: DatabaseManager) -> "TurnPipeline":
+    """Wire the agents, routing tiers and crisis screening into a turn pipeline"""
+    if MODEL_BACKEND != "fake":
+        require_api_key()
+    
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from google.adk.sessions import InMemorySessionService
+    from google.adk.sessions.sqlite_session_service import SqliteSessionService
+    from agents.sessions import LazyAgentSessions, CurrentTurnSessionService
+    from agents.speculation import Speculator
+    from agents.registry import AgentRegistry
+    from agents.pipeline import TurnPipeline
+    from agents.scheduler import ModelScheduler
+    from agents.resilience import CallPolicy, ModelCallGuard
+    from agents.compaction import SessionCompactor, ModelSummarizer
+    from utils.crisis_screen import prescreen_message
+    from utils.risk_tracker import RiskTracker
+    from utils.intent_router import IntentRouter, RoutingLog
+    from utils.routing_cache import RoutingCache
+    from utils.response_cache import ResponseCache
+    from utils.usage_ledger import UsageLedger
+    
+    intent_router = IntentRouter()
+    
+    # Model calls share the quota: crisis traffic first, users round-robin within a class
+    scheduler = ModelScheduler(
+        MODEL_RATE_LIMIT_RPM, burst=MODEL_RATE_LIMIT_BURST
+    ) if MODEL_RATE_LIMIT_RPM > 0 else None
+    
+    # No model call can hang a turn: each has a deadline, transient failures are
+    # retried, and (opt-in) slow calls are hedged; retries and hedges use the quota too
+    call_guard = ModelCallGuard(
+        CallPolicy(
+            deadline=MODEL_DEADLINE_SECONDS,
+            retries=MODEL_RETRIES,
+            backoff=MODEL_BACKOFF_SECONDS,
+            backoff_max=MODEL_BACKOFF_MAX_SECONDS,
+            hedge=HEDGED_REQUESTS,
+            hedge_percentile=HEDGE_PERCENTILE,
+            hedge_min_samples=HEDGE_MIN_SAMPLES
+        ),
+        deadlines=MODEL_DEADLINES,
+        readmit=scheduler.readmit if scheduler else None
+    )
+    
+    # Runners and sessions are created, and agent modules imported, on first routing to each agent
+    orchestrator_sessions = CurrentTurnSessionService() if STATELESS_ROUTING else InMemorySessionService()
+    orchestrator = LazyAgentSessions(APP_NAME, orchestrator_sessions, {
+        "OrchestratorAgent": agent_loader("OrchestratorAgent", scheduler, call_guard)
+    })
+    specialists = LazyAgentSessions(APP_NAME, SqliteSessionService(db_path=str(SESSION_DATABASE_PATH)), {
+        name: agent_loader(name, scheduler, call_guard) for name in AGENT_MODULES if name != "OrchestratorAgent"
+    })
+    
+    # Token usage of every run is counted per user, agent and day; it also enforces daily budgets
+    usage_ledger = UsageLedger(db)
+    
+    # Long conversations are folded into a rolling summary so prompts stay bounded;
+    # summaries are model calls like any other, so they share the quota, deadlines and budgets
+    compactor = SessionCompactor(
+        max_events=COMPACTION_MAX_EVENTS,
+        max_tokens=COMPACTION_MAX_TOKENS,
+        keep_recent=COMPACTION_KEEP_RECENT,
+        summarizer=ModelSummarizer(
+            scheduler=scheduler, call_guard=call_guard, usage_ledger=usage_ledger
+        ) if COMPACTION_SUMMARIZER == "model" and MODEL_BACKEND != "fake" else None,
+        archive_dir=COMPACTION_ARCHIVE_DIR
+    )
+    
+    # Agents are dispatched by exact name; adding one only means registering it here
+    registry = AgentRegistry(compactor=compactor, usage_ledger=usage_ledger)
+    registry.register_all(orchestrator, renderer=StreamingRenderer)
+    registry.register_all(specialists, renderer=StreamingRenderer)
+    
+    # Opt-in: start the likely specialist while the orchestrator decides
+    speculator = Speculator(
+        specialists, intent_router.classifier,
+        min_confidence=SPECULATION_MIN_CONFIDENCE,
+        min_training_examples=IntentRouter.MIN_TRAINING_EXAMPLES,
+        usage_ledger=usage_ledger
+    ) if SPECULATIVE_ROUTING else None
+    
+    return TurnPipeline(
+        registry, specialists,
+        intent_router=intent_router,
+        routing_cache=RoutingCache().load(),
+        routing_log=RoutingLog(),
+        risk_tracker=RiskTracker(db),
+        crisis_catalog=crisis_catalog,
+        prescreen=prescreen_message,
+        speculator=speculator,
+        scheduler=scheduler,
+        call_guard=call_guard,
+        usage_ledger=usage_ledger,
+        response_cache=ResponseCache(lambda user_id: db.get_mood_data_version(user_id)),
+        # Specialists stream partial text so the reply appears as it is generated
+        run_config=RunConfig(streaming_mode=StreamingMode.SSE if STREAMING else StreamingMode.NONE)
+    )
+
+def crisis_region_for(profile: dict) -> str:
+    """Region whose crisis resources are served to a user"""
+    return profile.get('region') or crisis_catalog.region_for(
+        locale=profile.get('locale') or locale.getlocale()[0],
+        timezone=profile.get('timezone') or DEFAULT_TIMEZONE
+    )
+
 async def run_agent_async():
     """Async function to handle agent runs with proper session management"""
     load_dotenv()
@@ -38,6 +202,18 @@ async def run_agent_async():
     CLI.clear_screen()
     CLI.print_header()
     
+    # ADK and the pipeline load on a worker thread while the menu is shown and
+    # the user types; only chat turns (and stats) wait for them
+    pipeline_ready = asyncio.ensure_future(asyncio.to_thread(build_pipeline, db))
+    
+    async def loaded_pipeline():
+        """The pipeline once loaded, or None (after showing why) if it could not be built"""
+        try:
+            return await pipeline_ready
+        except ValueError as e:
+            CLI.print_error(str(e))
+            return None
+    
     # Create/load user profile
     profile = profile_mgr.get_profile(USER_ID)
     if not profile:
@@ -47,50 +223,72 @@ async def run_agent_async():
     else:
         profile_mgr.update_last_active(USER_ID)
     
+    # Crisis resources are served for the user's region
+    crisis_region = crisis_region_for(profile)
+    
     # Show welcome message
     CLI.print_welcome(profile['name'])
     CLI.print_menu()
     CLI.show_quick_tips()
     CLI.print_divider()
-
-    session_service_orchestrator = InMemorySessionService()
-    session_service = SqliteSessionService(db_path=DATABASE_PATH) 
-    
-    # Create InMemoryRunners for each agent (includes session service)
-    orchestrator_runner = Runner(agent=orchestrator_agent, app_name=APP_NAME, session_service=session_service_orchestrator)
-    mood_runner = Runner(agent=mood_tracker_agent, app_name=APP_NAME, session_service=session_service)
-    support_runner = Runner(agent=support_agent, app_name=APP_NAME, session_service=session_service)
-    pattern_runner = Runner(agent=pattern_analyzer_agent, app_name=APP_NAME, session_service=session_service)
-    crisis_runner = Runner(agent=crisis_monitor_agent, app_name=APP_NAME, session_service=session_service)
     
-    # Create sessions for each runner (await async calls)
-    orchestrator_session = await orchestrator_runner.session_service.create_session(
-        app_name=APP_NAME, user_id=USER_ID
-    )
-    mood_session = await mood_runner.session_service.create_session(
-        app_name=APP_NAME, user_id=USER_ID
-    )
-    support_session = await support_runner.session_service.create_session(
-        app_name=APP_NAME, user_id=USER_ID
-    )
-    pattern_session = await pattern_runner.session_service.create_session(
-        app_name=APP_NAME, user_id=USER_ID
-    )
-    crisis_session = await crisis_runner.session_service.create_session(
-        app_name=APP_NAME, user_id=USER_ID
-    )
+    async def handle_message(user_input: str):
+        """Screen, route and answer a single user message"""
+        pipeline = await loaded_pipeline()
+        if pipeline is None:
+            return
+        from agents.resilience import ModelCallFailed
+        try:
+            result = await pipeline.handle(
+                USER_ID, user_input, crisis_region,
+                on_crisis_resources=CLI.print_crisis_resources
+            )
+        except ModelCallFailed as e:
+            CLI.print_error(f"{e}. Please try again in a moment.")
+            return
+        if DEBUG:
+            latency = result.latency
+            ttft = f"{latency['ttft']:.2f}s" if latency['ttft'] is not None else "n/a"
+            CLI.print_info(f"First token: {ttft}, total: {latency['total']:.2f}s")
     
     while True:
-        user_input = CLI.get_input()
+        user_input = await CLI.read_async(CLI.get_input)
         
         # Handle special commands
         if user_input.lower() in ['exit', 'quit']:
-            if CLI.confirm_exit():
+            if await CLI.read_async(CLI.confirm_exit):
+                # Nothing to save if no turn could have run yet
+                if pipeline_ready.done() and not pipeline_ready.exception():
+                    pipeline = pipeline_ready.result()
+                    pipeline.routing_cache.save()
+                    pipeline.usage_ledger.flush()
+                    if DEBUG:
+                        CLI.print_info(f"Routing cache: {pipeline.routing_cache.stats()}")
+                        CLI.print_info(f"Response cache: {pipeline.response_cache.stats()}")
+                        if pipeline.speculator:
+                            CLI.print_info(f"Speculation: {pipeline.speculator.stats()}")
                 CLI.print_goodbye()
                 break
             else:
                 continue
         
+        if user_input.lower() == 'stats':
+            pipeline = await loaded_pipeline()
+            if pipeline is not None:
+                CLI.print_agent_stats(pipeline.registry.stats())
+                if pipeline.scheduler:
+                    CLI.print_scheduler_stats(pipeline.scheduler.stats())
+                CLI.print_model_call_stats(pipeline.call_guard.stats())
+                CLI.print_token_usage(pipeline.usage_ledger.report(USER_ID))
+            continue
+        
+        if user_input.lower().split()[:1] == ['trace']:
+            # Waterfall of the last N turns' spans (default 1)
+            parts = user_input.split()
+            count = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+            CLI.print_trace_waterfall([waterfall_rows(spans) for spans in tracer.recent_traces(count)])
+            continue
+        
         if user_input.lower() == 'menu':
             CLI.print_menu()
             continue
@@ -124,103 +322,105 @@ async def run_agent_async():
         if not user_input.strip():
             continue
         
-        # Map command shortcuts to natural language
-        command_map = {
-            'mood': "I want to log my mood",
-            'patterns': "Show me my mood patterns",
-            'support': "I need some support and advice",
-            'help': "I need help"
-        }
-        
-        # Check if input is a command shortcut
-        processed_input = command_map.get(user_input.lower(), user_input)
-        
-        # Create Content object for the message
-        content = types.Content(role="user", parts=[types.Part(text=processed_input)])
-        
-        # 1. Use orchestrator to decide which agent to route to
-        events = orchestrator_runner.run(
-            user_id=USER_ID,
-            session_id=orchestrator_session.id,
-            new_message=content
-        )
-        
-        # Collect response from events
-        routing_decision = ""
-        for event in events:
-            if hasattr(event, 'content') and event.content:
-                for part in event.content.parts:
-                    if hasattr(part, 'text'):
-                        if part.text is not None:
-                            routing_decision += part.text
-        
-        target_agent_name = routing_decision.strip().replace('"', '').replace("'", "")
-        
-        # 2. Route to the appropriate agent based on the decision
-        response = ""
-        if "MoodTrackerAgent" in target_agent_name:
-            events = mood_runner.run(
-                user_id=USER_ID,
-                session_id=mood_session.id,
-                new_message=content
-            )
-            for event in events:
-                if hasattr(event, 'content') and event.content:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text'):
-                            if part.text is not None:
-                                response += part.text
-        elif "SupportAgent" in target_agent_name:
-            events = support_runner.run(
-                user_id=USER_ID,
-                session_id=support_session.id,
-                new_message=content
-            )
-            for event in events:
-                if hasattr(event, 'content') and event.content:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text'):
-                            if part.text is not None:
-                                response += part.text
-        elif "PatternAnalyzerAgent" in target_agent_name:
-            events = pattern_runner.run(
-                user_id=USER_ID,
-                session_id=pattern_session.id,
-                new_message=content
-            )
-            for event in events:
-                if hasattr(event, 'content') and event.content:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text'):
-                            if part.text is not None:
-                                response += part.text
-        elif "CrisisMonitorAgent" in target_agent_name:
-            events = crisis_runner.run(
-                user_id=USER_ID,
-                session_id=crisis_session.id,
-                new_message=content
-            )
-            for event in events:
-                if hasattr(event, 'content') and event.content:
-                    for part in event.content.parts:
-                        if hasattr(part, 'text'):
-                            if part.text is not None:
-                                response += part.text
-        else:
-            # Fallback - use the orchestrator's response directly
-            response = routing_decision
-            target_agent_name = "OrchestratorAgent"
-        
-        # Format and print the response using CLI
-        formatted_response = CLI.format_agent_response(target_agent_name, response)
-        print(formatted_response)
+        try:
+            await run_interruptible(handle_message(user_input))
+        except asyncio.CancelledError:
+            CLI.print_warning("Response cancelled.")
+            continue
         
         # Update user activity
         profile_mgr.update_last_active(USER_ID)
 
+def headless_turn_handler(db: DatabaseManager, profile_mgr: ProfileManager, pipeline: "TurnPipeline"):
+    """
+    Turn handler for non-interactive front-ends: creates profiles for new users
+    and collects each response instead of streaming it to the terminal
+    """
+    crisis_regions = {}
+    
+    async def handle_turn(user_id: str, message: str):
+        if user_id not in crisis_regions:
+            profile = profile_mgr.get_profile(user_id)
+            if not profile:
+                profile = profile_mgr.create_profile(user_id, user_id)
+                db.create_user(user_id, user_id)
+            crisis_regions[user_id] = crisis_region_for(profile)
+        
+        result = await pipeline.handle(
+            user_id, message, crisis_regions[user_id],
+            renderer=lambda name, started: StreamingRenderer(name, started, out=io.StringIO())
+        )
+        profile_mgr.update_last_active(user_id)
+        return result
+    
+    return handle_turn
+
+async def run_server_async(host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """Serve many users over HTTP, sharing one pipeline and its runners"""
+    load_dotenv()
+    
+    db = DatabaseManager()
+    pipeline = build_pipeline(db)
+    handle_turn = headless_turn_handler(db, ProfileManager(), pipeline)
+    
+    async def handle_request(user_id: str, message: str) -> dict:
+        return (await handle_turn(user_id, message))._asdict()
+    
+    server = ChatServer(
+        handle_request,
+        max_concurrency=SERVER_MAX_CONCURRENCY,
+        max_pending=SERVER_MAX_PENDING,
+        stats=pipeline.registry.stats
+    )
+    listener = await server.start(host, port)
+    CLI.print_info(f"Serving POST /chat on http://{host}:{port} (Ctrl-C to stop)")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        pipeline.routing_cache.save()
+        pipeline.usage_ledger.flush()
+
+async def run_batch_async(lines: Iterable[str], out: TextIO, concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """
+    Replay JSONL (user_id, message) records through the pipeline
+    
+    Args:
+        lines: Input JSONL lines
+        out: Stream each JSON result line is written to as its turn completes
+        concurrency: Maximum turns in flight
+    
+    Returns:
+        Batch summary (turns, failures, throughput, latency percentiles, routing tiers)
+    """
+    from ui.batch import BatchRunner
+    
+    load_dotenv()
+    
+    db = DatabaseManager()
+    pipeline = build_pipeline(db)
+    runner = BatchRunner(headless_turn_handler(db, ProfileManager(), pipeline), concurrency=concurrency)
+    
+    def write(result: dict):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+    
+    try:
+        return await runner.run(lines, write)
+    finally:
+        pipeline.routing_cache.save()
+        pipeline.usage_ledger.flush()
+
 def main():
     """Main entry point that runs the async function"""
     asyncio.run(run_agent_async())
 
+def serve():
+    """Entry point for HTTP server mode"""
+    try:
+        asyncio.run(run_server_async())
+    except KeyboardInterrupt:
+        pass
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,12 @@
 import uuid
-from typing import List
-from google.adk.tools import FunctionTool
-from src.utils.database import DatabaseManager
+from typing import Any, Dict, List
+from google.adk.tools import FunctionTool, ToolContext
+from utils.database import DatabaseManager
+from utils.side_effects import run_side_effect
+from utils.crisis_catalog import crisis_catalog
+from .crisis_tools import assess_crisis_level
 
-def log_mood(mood_score: int, emotions: List[str], notes: str = "", user_id: str = "default_user") -> str:
+def log_mood(mood_score: int, emotions: List[str], notes: str = "", *, tool_context: ToolContext) -> str:
     """
     Logs the user's mood score, emotions, and notes into the database.
     
@@ -11,22 +14,23 @@ def log_mood(mood_score: int, emotions: List[str], notes: str = "", user_id: str
         mood_score: An integer from 1 to 10 representing the mood (1=worst, 10=best).
         emotions: A list of strings describing the emotions felt (e.g., ["happy", "anxious"]).
         notes: Optional notes or context about the mood.
-        user_id: The ID of the user. Defaults to "default_user".
+        tool_context: Injected by ADK; the entry is logged for its session's user
         
     Returns:
         A confirmation message indicating success or failure.
     """
+    user_id = tool_context.user_id
     db = DatabaseManager()
     entry_id = str(uuid.uuid4())
     # Triggers and conversation_summary are optional/empty for now
-    success = db.add_mood_entry(
+    success = run_side_effect(lambda: db.add_mood_entry(
         entry_id=entry_id,
         user_id=user_id,
         mood_score=mood_score,
         emotions=emotions,
         triggers=[],
         notes=notes
-    )
+    ))
     
     if success:
         return f"Successfully logged mood score {mood_score} for user {user_id}."
@@ -34,4 +38,52 @@ def log_mood(mood_score: int, emotions: List[str], notes: str = "", user_id: str
         return "Failed to log mood entry due to a database error."
 
 # Create the ADK FunctionTool
-log_mood_tool = FunctionTool(log_mood)
\ No newline at end of file
+log_mood_tool = FunctionTool(log_mood)
+
+def log_mood_and_screen(mood_score: int, emotions: List[str], notes: str = "", *,
+                        tool_context: ToolContext) -> Dict[str, Any]:
+    """
+    Logs the user's mood and screens it for crisis indicators in a single step.
+    
+    Use this for check-ins instead of calling log_mood and check_crisis_indicators
+    separately: the entry is saved together with its crisis level.
+    
+    Args:
+        mood_score: An integer from 1 to 10 representing the mood (1=worst, 10=best).
+        emotions: A list of strings describing the emotions felt (e.g., ["happy", "anxious"]).
+        notes: Optional notes or context about the mood.
+        tool_context: Injected by ADK; the entry is logged for its session's user, and
+            the session state may carry the user's crisis_region
+        
+    Returns:
+        A dict with "logged" (whether the entry was saved), "mood_score", "crisis_level"
+        ("none", "moderate" or "high"), "message" (confirmation to acknowledge) and
+        "resources" (crisis resources to share when crisis_level is not "none").
+    """
+    # Screened even if the write fails, so a database error never hides a crisis
+    crisis_level = assess_crisis_level(mood_score, emotions, notes)
+    
+    user_id = tool_context.user_id
+    db = DatabaseManager()
+    entry_id = str(uuid.uuid4())
+    success = run_side_effect(lambda: db.add_mood_entry(
+        entry_id=entry_id,
+        user_id=user_id,
+        mood_score=mood_score,
+        emotions=emotions,
+        triggers=[],
+        notes=notes,
+        crisis_level=crisis_level
+    ))
+    
+    region = tool_context.state.get("crisis_region")
+    return {
+        "logged": bool(success),
+        "mood_score": mood_score,
+        "crisis_level": crisis_level,
+        "message": (f"Successfully logged mood score {mood_score} for user {user_id}." if success
+                    else "Failed to log mood entry due to a database error."),
+        "resources": crisis_catalog.get(region, crisis_level) if crisis_level != "none" else ""
+    }
+
+log_mood_and_screen_tool = FunctionTool(log_mood_and_screen)
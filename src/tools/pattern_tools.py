@@ -1,13 +1,13 @@
-from google.adk.tools import FunctionTool
+from google.adk.tools import FunctionTool, ToolContext
 from utils.database import DatabaseManager
 
-def analyze_mood_patterns(user_id: str = "default_user", days: int = 7) -> str:
+def analyze_mood_patterns(days: int = 7, *, tool_context: ToolContext) -> str:
     """
     Analyzes mood patterns over the specified number of days.
     
     Args:
-        user_id: The ID of the user to analyze.
         days: Number of days to look back (default: 7).
+        tool_context: Injected by ADK; the session's user is analyzed
         
     Returns:
         A summary of mood patterns and insights.
@@ -16,7 +16,7 @@ def analyze_mood_patterns(user_id: str = "default_user", days: int = 7) -> str:
     
     # Get mood entries for the period
     entries = db.get_mood_history(
-        user_id=user_id,
+        user_id=tool_context.user_id,
         days=days
     )
     
@@ -1,42 +1,81 @@
-from typing import List, Dict, Any
-from google.adk.tools import FunctionTool
+import uuid
+from google.adk.tools import FunctionTool, ToolContext
 from utils.database import DatabaseManager
+from utils.strategy_ranking import StrategyRanker
+from utils.side_effects import run_side_effect
 
-def retrieve_strategy(emotion: str, intensity: int = 5) -> str:
+# Shared so per-user helpfulness priors stay cached across calls
+strategy_ranker = StrategyRanker()
+
+def retrieve_strategy(emotion: str, intensity: int = 5, *, tool_context: ToolContext) -> str:
     """
     Retrieves a coping strategy relevant to the user's emotion.
     
     Args:
         emotion: The primary emotion the user is feeling (e.g., "anxious", "sad").
         intensity: The intensity of the emotion (1-10).
+        tool_context: Injected by ADK; strategies that helped its session's user before are favoured
         
     Returns:
         A string containing the name, description, and steps of a recommended strategy.
     """
     db = DatabaseManager()
-    strategies = db.get_all_strategies()
     
-    # Simple keyword matching for now (MVP)
+    # Term-index lookup over name, category and description
     # In a full RAG system, this would use vector similarity
-    relevant_strategies = []
-    for strategy in strategies:
-        # Check if emotion matches category or description
-        if (emotion.lower() in strategy['category'].lower() or 
-            emotion.lower() in strategy['description'].lower()):
-            relevant_strategies.append(strategy)
+    relevant_strategies = db.search_strategies(emotion)
             
     if not relevant_strategies:
         # Fallback to general strategies if no specific match
-        relevant_strategies = [s for s in strategies if s['category'].lower() == 'general']
+        relevant_strategies = db.get_strategies_by_category('general')
         
     if not relevant_strategies:
         return "I couldn't find a specific strategy for that, but deep breathing is always a good start."
 
-    # Return the first match for simplicity
-    selected = relevant_strategies[0]
+    # Rank by relevance, what has helped this user before, and intensity fit
+    selected = strategy_ranker.rank(relevant_strategies, tool_context.user_id, intensity)[0]
     steps_str = "\n".join([f"{i+1}. {step}" for i, step in enumerate(selected['steps'])])
     
-    return f"Strategy: {selected['name']}\n\n{selected['description']}\n\nSteps:\n{steps_str}"
+    return (f"Strategy: {selected['name']} (id: {selected['strategy_id']})\n\n"
+            f"{selected['description']}\n\nSteps:\n{steps_str}")
+
+def record_strategy_feedback(strategy_id: str, helpful: bool, feedback: str = "", *,
+                             tool_context: ToolContext) -> str:
+    """
+    Records whether a coping strategy helped the user, so future suggestions are personalized.
+    
+    Args:
+        strategy_id: The id of the strategy, as shown by retrieve_strategy.
+        helpful: True if the strategy helped, False if it did not.
+        feedback: Optional comments from the user about the strategy.
+        tool_context: Injected by ADK; the feedback is recorded for its session's user
+        
+    Returns:
+        A confirmation message indicating success or failure.
+    """
+    user_id = tool_context.user_id
+    db = DatabaseManager()
+    usage_id = str(uuid.uuid4())
+    
+    def record() -> bool:
+        recorded = db.record_strategy_usage(
+            usage_id=usage_id,
+            user_id=user_id,
+            strategy_id=strategy_id,
+            helpful=helpful,
+            feedback=feedback
+        )
+        if recorded:
+            strategy_ranker.invalidate(user_id)
+        return recorded
+    
+    success = run_side_effect(record)
+    
+    if success:
+        return f"Thanks! Recorded that strategy {strategy_id} was {'helpful' if helpful else 'not helpful'}."
+    else:
+        return "Failed to record strategy feedback due to a database error."
 
-# Create the ADK FunctionTool
-retrieve_strategy_tool = FunctionTool(retrieve_strategy)
\ No newline at end of file
+# Create the ADK FunctionTools
+retrieve_strategy_tool = FunctionTool(retrieve_strategy)
+record_feedback_tool = FunctionTool(record_strategy_feedback)
@@ -0,0 +1,127 @@
+"""
+Batch Runner
+Replays JSONL (user_id, message) records through the turn pipeline with bounded concurrency
+"""
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+from .server import USER_ID_PATTERN
+from agents.registry import percentile
+
+
+class BatchRunner:
+    """
+    Runs one turn per input record and emits one JSON result per turn as it completes.
+
+    Records are {"user_id": ..., "message": ...} with an optional "id" echoed
+    back. Up to `concurrency` turns run at once; each user's records run one at
+    a time in input order, so their sessions see messages as they were sent.
+    Results carry the input line number, since they are written in completion
+    order. Malformed records produce an error result and do not stop the batch.
+    """
+
+    def __init__(self, handle_turn: Callable[[str, str], Awaitable[Any]], concurrency: int = 8):
+        """
+        Args:
+            handle_turn: Coroutine answering (user_id, message) with a TurnResult
+            concurrency: Maximum turns in flight
+        """
+        self.handle_turn = handle_turn
+        self.concurrency = max(1, concurrency)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+        self.latencies: List[float] = []
+        self.routes: Counter = Counter()
+        self.failed = 0
+
+    async def run(self, lines: Iterable[str], write: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """
+        Process every record
+
+        Args:
+            lines: JSONL input lines
+            write: Called with each result dict as its turn completes
+
+        Returns:
+            Summary with turn counts, throughput and latency percentiles
+        """
+        started = time.perf_counter()
+        # Bound the records read ahead of the turns in flight
+        backlog = asyncio.Semaphore(self.concurrency * 4)
+        tasks = set()
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            await backlog.acquire()
+            task = asyncio.create_task(self._process(line_no, line, write))
+            tasks.add(task)
+            task.add_done_callback(lambda t: (tasks.discard(t), backlog.release()))
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self.summary(time.perf_counter() - started)
+
+    async def _process(self, line_no: int, line: str, write: Callable[[Dict[str, Any]], None]):
+        result: Dict[str, Any] = {"line": line_no}
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            self._fail(result, "Record must be a JSON object.", write)
+            return
+        if "id" in record:
+            result["id"] = record["id"]
+        user_id, message = record.get("user_id"), record.get("message")
+        if not isinstance(user_id, str) or not USER_ID_PATTERN.match(user_id):
+            self._fail(result, "user_id must be 1-64 letters, digits, '.', '_' or '-'.", write)
+            return
+        if not isinstance(message, str) or not message.strip():
+            self._fail(result, "message must be a non-empty string.", write)
+            return
+        result["user_id"] = user_id
+
+        lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+        async with lock, self._slots:
+            turn_started = time.perf_counter()
+            try:
+                turn = await self.handle_turn(user_id, message.strip())
+            except Exception as e:
+                self._fail(result, f"{type(e).__name__}: {e}", write)
+                return
+        seconds = time.perf_counter() - turn_started
+        ttft = turn.latency.get("ttft")
+        self.latencies.append(seconds)
+        self.routes[turn.routed_by] += 1
+        result.update({
+            "agent": turn.agent,
+            "routed_by": turn.routed_by,
+            "cached": turn.cached,
+            "text": turn.text,
+            "crisis_resources": turn.crisis_resources,
+            "latency": {
+                "ttft": round(ttft, 4) if ttft is not None else None,
+                "total": round(seconds, 4)
+            },
+            "error": None
+        })
+        write(result)
+
+    def _fail(self, result: Dict[str, Any], error: str, write: Callable[[Dict[str, Any]], None]):
+        self.failed += 1
+        result["error"] = error
+        write(result)
+
+    def summary(self, wall_seconds: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "turns": len(ordered),
+            "failed": self.failed,
+            "wall_seconds": round(wall_seconds, 3),
+            "turns_per_second": round(len(ordered) / wall_seconds, 2) if wall_seconds else 0.0,
+            "p50": round(percentile(ordered, 0.50), 3),
+            "p95": round(percentile(ordered, 0.95), 3),
+            "p99": round(percentile(ordered, 0.99), 3),
+            "routed_by": dict(self.routes)
+        }
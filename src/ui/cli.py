@@ -3,7 +3,12 @@ Enhanced CLI Interface for Mental Health Support Companion
 Provides a clean, user-friendly command-line experience
 """
 import os
+import asyncio
+import threading
 from datetime import datetime
+from typing import Any, Callable, Dict, List, TypeVar
+
+T = TypeVar("T")
 
 class CLI:
     """CLI Interface with formatting and menu support"""
@@ -57,8 +62,8 @@ class CLI:
         print(f"{CLI.CYAN}{'─' * 60}{CLI.END}")
     
     @staticmethod
-    def format_agent_response(agent_name: str, response: str) -> str:
-        """Format agent responses with visual clarity"""
+    def format_agent_header(agent_name: str) -> str:
+        """Format the icon header shown above an agent's response"""
         icon_map = {
             "MoodTrackerAgent": "📝",
             "PatternAnalyzerAgent": "📊",
@@ -67,16 +72,113 @@ class CLI:
             "OrchestratorAgent": "🎯"
         }
         icon = icon_map.get(agent_name, "💬")
-        
-        formatted = f"\n{CLI.BLUE}{icon} {CLI.BOLD}Companion:{CLI.END}\n"
+        return f"\n{CLI.BLUE}{icon} {CLI.BOLD}Companion:{CLI.END}\n"
+    
+    @staticmethod
+    def format_agent_response(agent_name: str, response: str) -> str:
+        """Format agent responses with visual clarity"""
+        formatted = CLI.format_agent_header(agent_name)
         formatted += f"{response}\n"
         return formatted
     
+    @staticmethod
+    def print_crisis_resources(resources: str):
+        """Print crisis resources ahead of the agent's response"""
+        print(f"\n{CLI.RED}{CLI.BOLD}🆘 Help is available right now:{CLI.END}")
+        print(f"{resources.strip()}\n")
+    
+    @staticmethod
+    def print_agent_stats(stats: Dict[str, Dict[str, Any]]):
+        """Print per-agent call counts and latency percentiles"""
+        print(f"\n{CLI.CYAN}{CLI.BOLD}Agent Metrics:{CLI.END}")
+        print(f"  {'Agent':<22}{'calls':>6}{'errors':>8}{'tools':>7}{'p50':>8}{'p95':>8}{'p99':>8}{'share':>8}")
+        for name, metrics in sorted(stats.items(), key=lambda item: -item[1]['total_seconds']):
+            print(f"  {name:<22}{metrics['calls']:>6}{metrics['errors']:>8}{metrics['tool_calls']:>7}"
+                  f"{metrics['p50']:>7.2f}s{metrics['p95']:>7.2f}s{metrics['p99']:>7.2f}s"
+                  f"{metrics['time_share']:>7.0%} ")
+        print()
+
+    @staticmethod
+    def print_scheduler_stats(stats: Dict[str, Dict[str, Any]]):
+        """Print model-call scheduler queue depth and wait percentiles per priority class"""
+        print(f"\n{CLI.CYAN}{CLI.BOLD}Model Call Scheduler:{CLI.END}")
+        print(f"  {'Priority':<12}{'granted':>8}{'waiting':>9}{'max':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for priority, metrics in stats.items():
+            print(f"  {priority:<12}{metrics['granted']:>8}{metrics['waiting']:>9}{metrics['max_waiting']:>6}"
+                  f"{metrics['p50_wait']:>8.2f}s{metrics['p95_wait']:>8.2f}s{metrics['p99_wait']:>8.2f}s")
+        print()
+
+    @staticmethod
+    def print_model_call_stats(stats: Dict[str, Dict[str, Any]]):
+        """Print per-agent retries, timeouts, hedges and time-to-first-response percentiles"""
+        if not stats:
+            return
+        print(f"\n{CLI.CYAN}{CLI.BOLD}Model Calls (time to first response):{CLI.END}")
+        print(f"  {'Agent':<22}{'calls':>6}{'retry':>7}{'t/o':>5}{'fail':>6}{'hedge':>7}{'won':>5}"
+              f"{'p50':>8}{'p95':>8}{'p99':>8}{'p99.9':>8}")
+        for name, metrics in stats.items():
+            print(f"  {name:<22}{metrics['calls']:>6}{metrics['retries']:>7}{metrics['timeouts']:>5}"
+                  f"{metrics['failures']:>6}{metrics['hedges']:>7}{metrics['hedge_wins']:>5}"
+                  f"{metrics['p50']:>7.2f}s{metrics['p95']:>7.2f}s{metrics['p99']:>7.2f}s{metrics['p999']:>7.2f}s")
+        print()
+
+    @staticmethod
+    def print_token_usage(report: Dict[str, Any]):
+        """Print a user's token usage and estimated cost per agent, and today's budget"""
+        print(f"\n{CLI.CYAN}{CLI.BOLD}Token Usage (last {report['days']} days):{CLI.END}")
+        print(f"  {'Agent':<22}{'calls':>6}{'prompt':>10}{'output':>9}{'total':>10}{'cost':>10}")
+        for name, totals in sorted(report['agents'].items(), key=lambda item: -item[1]['total_tokens']):
+            print(f"  {name:<22}{totals['calls']:>6}{totals['prompt_tokens']:>10}{totals['output_tokens']:>9}"
+                  f"{totals['total_tokens']:>10}{'$' + format(totals['cost'], '.4f'):>10}")
+        budget = f"{report['remaining']} of {report['budget']} left" if report['budget'] else "no daily budget"
+        print(f"  Today: {report['today']} tokens ({budget})")
+        print()
+
+    @staticmethod
+    def print_trace_waterfall(turns: List[List[Dict[str, Any]]], width: int = 30):
+        """Print each turn's spans as an indented waterfall scaled to the turn's duration"""
+        if not turns:
+            CLI.print_info("No traced turns yet.")
+            return
+        for rows in turns:
+            root = rows[0]
+            total = root['duration_ms'] or 1.0
+            started = datetime.fromtimestamp(root['timestamp']).strftime('%H:%M:%S')
+            agent = root['attributes'].get('agent', '?')
+            print(f"\n{CLI.CYAN}{CLI.BOLD}Turn {started} → {agent} ({root['duration_ms']:.0f}ms){CLI.END}")
+            for row in rows:
+                start = min(width - 1, int(row['offset_ms'] / total * width))
+                length = max(1, min(width - start, round(row['duration_ms'] / total * width)))
+                bar = " " * start + "█" * length + " " * (width - start - length)
+                label = ("  " * row['depth'] + row['name'])[:36]
+                if row['error']:
+                    label = f"{CLI.RED}{label:<36}{CLI.END}"
+                print(f"  {label:<36} {row['offset_ms']:>8.1f}ms {row['duration_ms']:>8.1f}ms  |{bar}|")
+        print()
+
     @staticmethod
     def get_input(prompt: str = "You") -> str:
         """Get user input with formatted prompt"""
         return input(f"\n{CLI.GREEN}{CLI.BOLD}{prompt}:{CLI.END} ").strip()
     
+    @staticmethod
+    async def read_async(prompt: Callable[[], T]) -> T:
+        """Run a blocking prompt on a daemon thread so the event loop keeps running"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        def read():
+            try:
+                result = prompt()
+            except BaseException as e:
+                loop.call_soon_threadsafe(lambda error=e: future.done() or future.set_exception(error))
+            else:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+        
+        # Daemon thread, so an abandoned prompt never blocks interpreter exit
+        threading.Thread(target=read, daemon=True).start()
+        return await future
+    
     @staticmethod
     def print_error(message: str):
         """Print error message"""
@@ -0,0 +1,182 @@
+"""
+Chat Server
+Minimal asyncio HTTP front-end multiplexing many users onto one turn pipeline
+"""
+import asyncio
+import json
+import re
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# User ids also name profile files, so they are restricted to a safe alphabet
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class ChatServer:
+    """
+    Serves POST /chat and GET /health over HTTP/1.1 (one request per connection).
+
+    At most max_concurrency turns run at once; each user's turns run one at a
+    time so their sessions see messages in order. When max_pending requests are
+    already waiting, new ones are refused with 503 and a Retry-After header
+    instead of queueing without bound.
+    """
+
+    def __init__(self, handle_turn: Callable[[str, str], Awaitable[Dict[str, Any]]],
+                 max_concurrency: int = 8, max_pending: int = 32,
+                 stats: Optional[Callable[[], Dict[str, Any]]] = None,
+                 max_body_bytes: int = 64 * 1024, read_timeout: float = 10.0):
+        """
+        Args:
+            handle_turn: Coroutine answering (user_id, message) with a JSON-serializable dict
+            max_concurrency: Maximum turns in flight
+            max_pending: Maximum requests waiting for a slot before new ones are refused
+            stats: Optional callable whose result is included in GET /health
+            max_body_bytes: Largest accepted request body
+            read_timeout: Seconds allowed to receive a request
+        """
+        self.handle_turn = handle_turn
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.stats = stats
+        self.max_body_bytes = max_body_bytes
+        self.read_timeout = read_timeout
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+        self._user_turns: Dict[str, int] = {}
+        self.in_flight = 0
+        self.pending = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Start listening; returns the asyncio server"""
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    def health(self) -> Dict[str, Any]:
+        """Load and throughput counters"""
+        health = {
+            "in_flight": self.in_flight,
+            "pending": self.pending,
+            "served": self.served,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending
+        }
+        if self.stats:
+            health["agents"] = self.stats()
+        return health
+
+    async def chat(self, user_id: str, message: str) -> Tuple[int, Dict[str, Any]]:
+        """
+        Run one turn under the concurrency limits
+
+        Returns:
+            (HTTP status, response body)
+        """
+        if self.in_flight + self.pending >= self.max_concurrency + self.max_pending:
+            self.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Server busy, please retry shortly."}
+
+        self.pending += 1
+        started = False
+        self._user_turns[user_id] = self._user_turns.get(user_id, 0) + 1
+        lock = self._user_locks.setdefault(user_id, asyncio.Lock())
+        try:
+            # Take the user's lock first so one user's backlog does not hold shared slots
+            async with lock, self._slots:
+                self.pending -= 1
+                self.in_flight += 1
+                started = True
+                try:
+                    return HTTPStatus.OK, await self.handle_turn(user_id, message)
+                finally:
+                    self.in_flight -= 1
+                    self.served += 1
+        except Exception as e:
+            print(f"Error handling turn for user {user_id}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "The companion could not respond."}
+        finally:
+            if not started:
+                self.pending -= 1
+            self._user_turns[user_id] -= 1
+            if self._user_turns[user_id] == 0:
+                del self._user_turns[user_id]
+                del self._user_locks[user_id]
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, body = await self._read_and_dispatch(reader)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        await self._respond(writer, status, body)
+
+    async def _read_and_dispatch(self, reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any]]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.read_timeout)
+        except asyncio.TimeoutError:
+            return HTTPStatus.REQUEST_TIMEOUT, {"error": "Request timed out."}
+
+        request_line, *header_lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, path, _ = request_line.split(" ", 2)
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Malformed request line."}
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if path == "/health":
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use GET."}
+            return HTTPStatus.OK, self.health()
+        if path != "/chat":
+            return HTTPStatus.NOT_FOUND, {"error": "Not found."}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST."}
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length."}
+        if length > self.max_body_bytes:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large."}
+        try:
+            raw = await asyncio.wait_for(reader.readexactly(length), self.read_timeout)
+            payload = json.loads(raw or b"{}")
+        except asyncio.TimeoutError:
+            return HTTPStatus.REQUEST_TIMEOUT, {"error": "Request timed out."}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Body must be JSON."}
+
+        user_id = payload.get("user_id") if isinstance(payload, dict) else None
+        message = payload.get("message") if isinstance(payload, dict) else None
+        if not isinstance(user_id, str) or not USER_ID_PATTERN.match(user_id):
+            return HTTPStatus.BAD_REQUEST, {"error": "user_id must be 1-64 letters, digits, '.', '_' or '-'."}
+        if not isinstance(message, str) or not message.strip():
+            return HTTPStatus.BAD_REQUEST, {"error": "message must be a non-empty string."}
+
+        return await self.chat(user_id, message.strip())
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode('utf-8')
+        status = HTTPStatus(status)
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+            "Connection: close"
+        ]
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head.append("Retry-After: 1")
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,91 @@
+"""
+Streaming Response Renderer
+Prints agent text as events arrive instead of after the whole response is generated
+"""
+import sys
+import time
+from typing import Any, Dict, Optional, TextIO
+from .cli import CLI
+
+
+def event_text(event: Any) -> str:
+    """Concatenated text parts of an ADK event"""
+    content = getattr(event, 'content', None)
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts if getattr(part, 'text', None))
+
+
+class StreamingRenderer:
+    """
+    Renders one agent turn incrementally.
+
+    With SSE streaming, ADK yields partial events carrying text deltas followed
+    by a final event carrying the aggregated text; the aggregate is skipped when
+    its deltas were already printed. Without streaming every event is final, so
+    the renderer degrades to printing each event's text as it arrives.
+    """
+
+    def __init__(self, agent_name: str, started_at: Optional[float] = None, out: Optional[TextIO] = None):
+        """
+        Args:
+            agent_name: Agent whose icon header is printed before the first text
+            started_at: time.perf_counter() when the turn began; defaults to now
+            out: Stream to write to; defaults to sys.stdout
+        """
+        self.agent_name = agent_name
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.out = out or sys.stdout
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._chunks = []
+        self._streamed_partials = False
+
+    def feed(self, event: Any):
+        """Render the text carried by an event"""
+        text = event_text(event)
+        if getattr(event, 'partial', False):
+            self._streamed_partials = True
+            self.write(text)
+            return
+        if not self._streamed_partials:
+            self.write(text)
+        # The next model response in this turn (e.g. after a tool call) streams afresh
+        self._streamed_partials = False
+
+    def write(self, text: str):
+        """Print a piece of response text, preceded by the header on first output"""
+        if not text:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            self.out.write(CLI.format_agent_header(self.agent_name))
+        self._chunks.append(text)
+        self.out.write(text)
+        self.out.flush()
+
+    def finish(self) -> str:
+        """
+        End the turn
+
+        Returns:
+            The full response text
+        """
+        self.finished_at = time.perf_counter()
+        if self.first_token_at is None:
+            self.out.write(CLI.format_agent_header(self.agent_name))
+        self.out.write("\n\n")
+        self.out.flush()
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def latency(self) -> Dict[str, Optional[float]]:
+        """Time to first token and total turn latency, in seconds"""
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return {
+            "ttft": self.first_token_at - self.started_at if self.first_token_at is not None else None,
+            "total": end - self.started_at
+        }
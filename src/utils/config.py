@@ -11,8 +11,18 @@ PROJECT_ROOT = Path(__file__).parent.parent.parent
 
 # API Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found in environment variables")
+
+
+def require_api_key() -> str:
+    """
+    Return the Gemini API key, raising if it is not configured
+
+    Checked when the model backend is built rather than at import, so local
+    commands (export, menu) work without a key.
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    return GEMINI_API_KEY
 
 # Application Settings
 APP_NAME = os.getenv("APP_NAME", "Mental Health Support Companion")
@@ -24,11 +34,30 @@ DEFAULT_CHECKIN_TIMES = os.getenv("DEFAULT_CHECKIN_TIMES", "09:00,21:00").split(
 
 # Database Configuration
 DATABASE_PATH = PROJECT_ROOT / os.getenv("DATABASE_PATH", "data/mental_health.db")
+# Agent sessions live in their own file: the async session service holds write locks
+# across awaits, which would stall synchronous DatabaseManager writes on the event loop
+SESSION_DATABASE_PATH = PROJECT_ROOT / os.getenv("SESSION_DATABASE_PATH", "data/sessions.db")
+
+# Session compaction: past either limit, older events are folded into a summary event
+COMPACTION_MAX_EVENTS = int(os.getenv("COMPACTION_MAX_EVENTS", "60"))
+COMPACTION_MAX_TOKENS = int(os.getenv("COMPACTION_MAX_TOKENS", "6000"))
+COMPACTION_KEEP_RECENT = int(os.getenv("COMPACTION_KEEP_RECENT", "12"))
+# "model" summarizes with Gemini, "local" keeps a truncated transcript (no model call)
+COMPACTION_SUMMARIZER = os.getenv("COMPACTION_SUMMARIZER", "model").lower()
+# Folded events are archived here as JSONL per session; empty drops them
+COMPACTION_ARCHIVE_DIR = os.getenv("COMPACTION_ARCHIVE_DIR", "")
+COMPACTION_ARCHIVE_DIR = PROJECT_ROOT / COMPACTION_ARCHIVE_DIR if COMPACTION_ARCHIVE_DIR else None
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE = PROJECT_ROOT / os.getenv("LOG_FILE", "logs/app.log")
 
+# Per-turn tracing spans, appended to a rotating JSONL file next to the log file
+TRACING = os.getenv("TRACING", "True").lower() == "true"
+TRACE_FILE = PROJECT_ROOT / os.getenv("TRACE_FILE", str(LOG_FILE.parent / "traces.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(5 * 1024 * 1024)))
+TRACE_BACKUP_COUNT = int(os.getenv("TRACE_BACKUP_COUNT", "3"))
+
 # Model Configuration
 GEMINI_MODEL = "gemini-2.0-flash-exp"
 TEMPERATURE = 0.7
@@ -39,8 +68,10 @@ CRISIS_RESOURCES = {
     "US": {
         "name": "National Suicide Prevention Lifeline",
         "phone": "988",
+        "text_name": "Crisis Text Line",
         "text": "Text HOME to 741741",
-        "url": "https://988lifeline.org"
+        "url": "https://988lifeline.org",
+        "emergency": "911"
     },
     "International": {
         "name": "Find A Helpline",
@@ -48,6 +79,94 @@ CRISIS_RESOURCES = {
     }
 }
 
+# Extra crisis resource regions, merged over CRISIS_RESOURCES and hot-reloaded
+CRISIS_RESOURCES_PATH = PROJECT_ROOT / os.getenv("CRISIS_RESOURCES_PATH", "data/crisis_resources.json")
+
+# Region used when neither locale nor timezone identifies one
+DEFAULT_CRISIS_REGION = os.getenv("DEFAULT_CRISIS_REGION", "US")
+
+# Crisis lexicon: phrases and emotions per language, compiled once at import
+CRISIS_LEXICON_PATH = PROJECT_ROOT / os.getenv("CRISIS_LEXICON_PATH", "data/crisis_lexicon.json")
+
+# Local intent routing: classifier model and the log of orchestrator decisions it is trained on
+ROUTER_MODEL_PATH = PROJECT_ROOT / os.getenv("ROUTER_MODEL_PATH", "data/router_model.json")
+ROUTING_LOG_PATH = PROJECT_ROOT / os.getenv("ROUTING_LOG_PATH", "data/routing_log.jsonl")
+# The log holds raw user messages, so it is only written when explicitly enabled
+ROUTING_LOG_ENABLED = os.getenv("ROUTING_LOG_ENABLED", "False").lower() == "true"
+ROUTER_CONFIDENCE = float(os.getenv("ROUTER_CONFIDENCE", "0.9"))
+
+# Routing decision cache in front of the orchestrator
+ROUTING_CACHE_PATH = PROJECT_ROOT / os.getenv("ROUTING_CACHE_PATH", "data/routing_cache.json")
+ROUTING_CACHE_SIZE = int(os.getenv("ROUTING_CACHE_SIZE", "512"))
+ROUTING_CACHE_TTL = float(os.getenv("ROUTING_CACHE_TTL", "86400"))
+ROUTING_CACHE_FUZZY = float(os.getenv("ROUTING_CACHE_FUZZY", "0.8"))
+# Cache keys are normalized user messages, so they are only saved to disk when explicitly enabled
+ROUTING_CACHE_PERSIST = os.getenv("ROUTING_CACHE_PERSIST", "False").lower() == "true"
+
+# Route from the new message plus a fixed-size context (last agent, risk level)
+# instead of the orchestrator's full conversation history
+STATELESS_ROUTING = os.getenv("STATELESS_ROUTING", "True").lower() == "true"
+
+# Answers replayed while the user's mood data is unchanged (comma-separated agents)
+RESPONSE_CACHE_AGENTS = [a.strip() for a in os.getenv("RESPONSE_CACHE_AGENTS", "PatternAnalyzerAgent").split(",") if a.strip()]
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+# Start the likely specialist concurrently with the orchestrator (opt-in)
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "False").lower() == "true"
+SPECULATION_MIN_CONFIDENCE = float(os.getenv("SPECULATION_MIN_CONFIDENCE", "0.5"))
+
+# Model backend: "gemini", or "fake" for the offline scripted stand-in (load tests, demos)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini").lower()
+FAKE_MODEL_LATENCY = os.getenv("FAKE_MODEL_LATENCY", "lognormal:0.4,0.3")
+FAKE_MODEL_SEED = int(os.getenv("FAKE_MODEL_SEED", "7"))
+
+# Model-call scheduler: token bucket sized to the model quota (requests per minute, 0 disables)
+# with priority classes crisis > mood > support > patterns and round-robin between users
+MODEL_RATE_LIMIT_RPM = float(os.getenv("MODEL_RATE_LIMIT_RPM", "1000"))
+MODEL_RATE_LIMIT_BURST = int(os.getenv("MODEL_RATE_LIMIT_BURST", "20"))
+
+# Model-call deadlines: seconds for a response to start (and between streamed chunks),
+# with per-agent overrides as "Agent=seconds,..."; timeouts and transient errors are
+# retried with jittered exponential backoff
+MODEL_DEADLINE_SECONDS = float(os.getenv("MODEL_DEADLINE_SECONDS", "30"))
+MODEL_DEADLINES = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (item.partition("=") for item in os.getenv("MODEL_DEADLINES", "OrchestratorAgent=15").split(","))
+    if name.strip() and seconds.strip()
+}
+MODEL_RETRIES = int(os.getenv("MODEL_RETRIES", "2"))
+MODEL_BACKOFF_SECONDS = float(os.getenv("MODEL_BACKOFF_SECONDS", "0.5"))
+MODEL_BACKOFF_MAX_SECONDS = float(os.getenv("MODEL_BACKOFF_MAX_SECONDS", "4"))
+
+# Hedged requests (opt-in): send a duplicate model call once a call runs past the
+# agent's recent HEDGE_PERCENTILE latency, and use whichever answers first
+HEDGED_REQUESTS = os.getenv("HEDGED_REQUESTS", "False").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Token accounting: usage per user, agent and day is written in batches of
+# TOKEN_USAGE_FLUSH_EVERY model responses (or after TOKEN_USAGE_FLUSH_SECONDS)
+TOKEN_USAGE_FLUSH_EVERY = int(os.getenv("TOKEN_USAGE_FLUSH_EVERY", "50"))
+TOKEN_USAGE_FLUSH_SECONDS = float(os.getenv("TOKEN_USAGE_FLUSH_SECONDS", "10"))
+# Daily tokens per user (0: unlimited); past it, turns are answered without model calls
+USER_DAILY_TOKEN_BUDGET = int(os.getenv("USER_DAILY_TOKEN_BUDGET", "0"))
+# Price in USD per million tokens, for cost estimates
+MODEL_INPUT_PRICE_PER_MTOK = float(os.getenv("MODEL_INPUT_PRICE_PER_MTOK", "0.10"))
+MODEL_OUTPUT_PRICE_PER_MTOK = float(os.getenv("MODEL_OUTPUT_PRICE_PER_MTOK", "0.40"))
+
+# Print specialist responses token by token as they are generated
+STREAMING = os.getenv("STREAMING", "True").lower() == "true"
+
+# HTTP server mode (serve.py)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+SERVER_MAX_CONCURRENCY = int(os.getenv("SERVER_MAX_CONCURRENCY", "8"))
+SERVER_MAX_PENDING = int(os.getenv("SERVER_MAX_PENDING", "32"))
+
+# Batch mode (batch.py): turns in flight when replaying a JSONL file
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
 # Mood Scale
 MOOD_SCALE = {
     1: "Very Bad",
@@ -0,0 +1,212 @@
+"""
+Crisis Response Catalog
+Pre-renders crisis responses per (region, level) so requests are served by lookup
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from .config import CRISIS_RESOURCES, CRISIS_RESOURCES_PATH, DEFAULT_CRISIS_REGION
+
+FALLBACK_REGION = "International"
+FALLBACK_RESOURCE = {"name": "Find A Helpline", "url": "https://findahelpline.com"}
+IASP_URL = "https://www.iasp.info/resources/Crisis_Centres/"
+NO_CRISIS_RESPONSE = "No immediate crisis indicators detected. Continue monitoring."
+
+
+def _resource_lines(region: str, resource: Dict[str, Any], detailed: bool) -> List[str]:
+    """Bullet lines listing a region's helplines"""
+    lines = []
+    if resource.get('phone'):
+        if detailed:
+            lines.append(f"- **{resource['name']}**: {resource['phone']} ({region})")
+        else:
+            lines.append(f"- {resource['name']}: {resource['phone']}")
+    if resource.get('text'):
+        text_name = resource.get('text_name', "Text line")
+        lines.append(f"- **{text_name}**: {resource['text']}" if detailed else f"- {text_name}: {resource['text']}")
+    if resource.get('url'):
+        label = "More help" if resource.get('phone') else resource['name']
+        lines.append(f"- **{label}**: {resource['url']}" if detailed else f"- {label}: {resource['url']}")
+    return lines
+
+
+def render_high(region: str, resource: Dict[str, Any]) -> str:
+    """Render the immediate-support response for a region"""
+    call = resource.get('phone') or resource.get('emergency')
+    call_line = f"- Call {call} or your local emergency number" if call else "- Call your local emergency number"
+    return "\n".join([
+        "",
+        "⚠️ IMMEDIATE SUPPORT NEEDED ⚠️",
+        "",
+        "I'm concerned about what you're experiencing. Your safety is the top priority.",
+        "",
+        "🆘 **Crisis Resources (24/7):**",
+        *_resource_lines(region, resource, detailed=True),
+        f"- **International Association for Suicide Prevention**: {IASP_URL}",
+        "",
+        "📞 **Please reach out immediately to:**",
+        call_line,
+        "- Go to your nearest emergency room",
+        "- Contact a trusted friend or family member",
+        "- Reach out to a mental health professional",
+        "",
+        "💙 Remember: You don't have to face this alone. Help is available, and things can get better.",
+        ""
+    ])
+
+
+def render_moderate(region: str, resource: Dict[str, Any]) -> str:
+    """Render the support-resources response for a region"""
+    return "\n".join([
+        "",
+        "🤝 Support Resources Available",
+        "",
+        "I notice you're going through a difficult time. It's important to reach out for support.",
+        "",
+        "💬 **Recommended Actions:**",
+        "- Talk to a trusted friend or family member",
+        "- Contact your therapist or healthcare provider",
+        "- Use a crisis support line if you need immediate help",
+        "",
+        "📞 **Support Lines:**",
+        *_resource_lines(region, resource, detailed=False),
+        "",
+        "🌟 **Self-Care Reminders:**",
+        "- You're taking a brave step by expressing how you feel",
+        "- Difficult emotions are temporary",
+        "- Professional support can make a real difference",
+        "",
+        "Would you like to talk about what's troubling you?",
+        ""
+    ])
+
+
+class CrisisResponseCatalog:
+    """Region-aware crisis responses, rendered once and reloaded when the data file changes"""
+
+    def __init__(self, base_resources: Optional[Dict[str, Dict]] = None,
+                 resources_path: Optional[Path] = None,
+                 default_region: str = DEFAULT_CRISIS_REGION,
+                 reload_interval: float = 30.0):
+        """
+        Args:
+            base_resources: Built-in regions. If None, uses config.CRISIS_RESOURCES.
+            resources_path: JSON file with extra regions, merged over the built-in ones
+            default_region: Region used when a user's region is unknown
+            reload_interval: Seconds between checks of the data file's modification time
+        """
+        self.base_resources = base_resources if base_resources is not None else CRISIS_RESOURCES
+        self.resources_path = Path(resources_path or CRISIS_RESOURCES_PATH)
+        self.default_region = default_region
+        self.reload_interval = reload_interval
+
+        self._responses: Dict[Tuple[str, str], str] = {}
+        self._timezones: Dict[str, str] = {}
+        self._timezone_prefixes: List[Tuple[str, str]] = []
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._build()
+
+    @property
+    def regions(self) -> List[str]:
+        return sorted({region for region, _ in self._responses})
+
+    def get(self, region: Optional[str], level: str) -> str:
+        """
+        Look up the pre-rendered response
+
+        Args:
+            region: Region code (e.g. "US", "GB"). Unknown regions fall back to the default.
+            level: Crisis level: "high", "moderate" or "none"
+
+        Returns:
+            The response text
+        """
+        if level not in ("high", "moderate"):
+            return NO_CRISIS_RESPONSE
+        self._maybe_reload()
+        responses = self._responses
+        return (responses.get(((region or "").upper(), level))
+                or responses.get((self.default_region.upper(), level))
+                or responses[(FALLBACK_REGION.upper(), level)])
+
+    def region_for(self, locale: Optional[str] = None, timezone: Optional[str] = None) -> str:
+        """
+        Resolve a user's region from their locale (e.g. "en_GB") or IANA timezone
+
+        Returns:
+            A region code present in the catalog, or the default region
+        """
+        if locale:
+            country = locale.replace("-", "_").split(".")[0].split("_")[-1].upper()
+            if (country, "high") in self._responses:
+                return country
+        if timezone:
+            region = self._timezones.get(timezone)
+            if region:
+                return region
+            for prefix, region in self._timezone_prefixes:
+                if timezone.startswith(prefix):
+                    return region
+        return self.default_region.upper()
+
+    def _maybe_reload(self):
+        """Rebuild if the data file changed, checking at most once per reload_interval"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        if self._file_mtime() != self._mtime:
+            self._build()
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.resources_path).st_mtime
+        except OSError:
+            return None
+
+    def _build(self):
+        """Merge resources and render every (region, level) response"""
+        self._mtime = self._file_mtime()
+        self._checked_at = time.monotonic()
+
+        file_regions: Dict[str, Dict] = {}
+        if self._mtime is not None:
+            try:
+                with open(self.resources_path, 'r', encoding='utf-8') as f:
+                    file_regions = json.load(f).get('regions', {})
+            except (OSError, ValueError) as e:
+                # Keep serving the last good catalog rather than dropping crisis resources
+                print(f"Error loading crisis resources from {self.resources_path}: {e}")
+                if self._responses:
+                    return
+
+        merged = {FALLBACK_REGION: dict(FALLBACK_RESOURCE)}
+        merged.update({region: dict(resource) for region, resource in self.base_resources.items()})
+        for region, resource in file_regions.items():
+            merged[region] = {**merged.get(region, {}), **resource}
+
+        responses = {}
+        timezones = {}
+        prefixes = []
+        for region, resource in merged.items():
+            if not resource.get('name'):
+                continue
+            responses[(region.upper(), "high")] = render_high(region, resource)
+            responses[(region.upper(), "moderate")] = render_moderate(region, resource)
+            for timezone in resource.get('timezones', []):
+                if timezone.endswith("/"):
+                    prefixes.append((timezone, region.upper()))
+                else:
+                    timezones[timezone] = region.upper()
+
+        # Swap in whole structures so concurrent readers never see a partial build
+        self._responses = responses
+        self._timezones = timezones
+        self._timezone_prefixes = prefixes
+
+
+# Built once at startup and shared by every caller
+crisis_catalog = CrisisResponseCatalog()
@@ -0,0 +1,151 @@
+"""
+Crisis Lexicon Matcher
+Compiles the crisis phrase lexicon into a single regex once, at import time
+"""
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from .config import CRISIS_LEXICON_PATH
+
+# Crisis levels in increasing order of severity
+LEVELS = ("none", "moderate", "high")
+
+# Used when the lexicon file is missing so crisis screening never silently turns off
+DEFAULT_LEXICON = {
+    "en": {
+        "high": [
+            "suicide", "suicidal", "kill myself", "end it all",
+            "better off dead", "harm myself"
+        ],
+        # Also common in everyday venting ("no point studying tonight"), so never high on their own
+        "moderate": ["hopeless", "no point"],
+        "emotions": {
+            "hopeless": "moderate",
+            "desperate": "moderate",
+            "trapped": "moderate",
+            "worthless": "moderate"
+        }
+    }
+}
+
+
+class CrisisMatch(NamedTuple):
+    """A lexicon phrase found in text"""
+    phrase: str
+    level: str
+    start: int
+    end: int
+
+
+def max_level(*levels: str) -> str:
+    """Return the most severe of the given crisis levels"""
+    return max(levels, key=LEVELS.index, default="none")
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Build a regex alternation shaped like a prefix trie
+
+    Shared prefixes are factored out, so matching at each position walks at
+    most the length of the longest phrase regardless of how many phrases the
+    lexicon holds.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        is_end = "" in node
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_end else group
+
+    return build(trie)
+
+
+class CrisisMatcher:
+    """Multi-pattern crisis phrase matcher compiled from a lexicon"""
+
+    def __init__(self, lexicon: Dict[str, Dict]):
+        """
+        Args:
+            lexicon: {language: {"high": [...], "moderate": [...], "emotions": {emotion: level}}}
+        """
+        self.phrase_levels: Dict[str, str] = {}
+        self.emotion_levels: Dict[str, str] = {}
+
+        for entries in lexicon.values():
+            for level in ("moderate", "high"):
+                for phrase in entries.get(level, []):
+                    key = self._normalize(phrase)
+                    self.phrase_levels[key] = max_level(level, self.phrase_levels.get(key, "none"))
+            for emotion, level in entries.get("emotions", {}).items():
+                key = self._normalize(emotion)
+                self.emotion_levels[key] = max_level(level, self.emotion_levels.get(key, "none"))
+
+        body = _trie_pattern(self.phrase_levels)
+        # Lookarounds instead of \b so phrases starting or ending in punctuation still match
+        self.pattern = re.compile(r"(?<!\w)(?:" + body + r")(?!\w)", re.IGNORECASE) if body else None
+
+    @classmethod
+    def from_file(cls, path: Optional[Path] = None) -> "CrisisMatcher":
+        """Load the lexicon from a JSON file, falling back to the built-in defaults"""
+        path = Path(path or CRISIS_LEXICON_PATH)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            return cls(DEFAULT_LEXICON)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.casefold().split())
+
+    def find_all(self, text: str) -> List[CrisisMatch]:
+        """Find every lexicon phrase in the text
+
+        Args:
+            text: Free text to scan
+
+        Returns:
+            Matches in order of appearance, with spans into the original text
+        """
+        if not text or self.pattern is None:
+            return []
+        return [
+            CrisisMatch(
+                phrase=self._normalize(m.group()),
+                level=self.phrase_levels.get(self._normalize(m.group()), "high"),
+                start=m.start(),
+                end=m.end()
+            )
+            for m in self.pattern.finditer(text)
+        ]
+
+    def match_emotions(self, emotions: Iterable[str]) -> Dict[str, str]:
+        """Return the crisis level of each listed emotion that appears in the lexicon"""
+        matched = {}
+        for emotion in emotions:
+            level = self.emotion_levels.get(self._normalize(emotion))
+            if level:
+                matched[emotion] = level
+        return matched
+
+    def text_level(self, text: str) -> str:
+        """Most severe crisis level among phrases found in the text"""
+        return max_level(*(m.level for m in self.find_all(text)))
+
+
+# Compiled once at import and shared by every caller
+crisis_matcher = CrisisMatcher.from_file()
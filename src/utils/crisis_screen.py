@@ -0,0 +1,57 @@
+"""
+Crisis Pre-Screen
+Deterministic local screening of a message before any model call
+"""
+import re
+from typing import List, NamedTuple, Optional
+from .crisis_lexicon import CrisisMatch, crisis_matcher, max_level
+
+# "3/10", "3 out of 10"; dates such as "1/10/2024" are not scores
+_SCORE_OUT_OF_TEN = re.compile(r"(?<![\d/])(10|[1-9])\s*(?:/|out\s+of)\s*10(?![\d/])", re.IGNORECASE)
+# "mood is 3", "my mood was a 2 today"; only the word mood gives a bare number its meaning, and the number
+# must end the clause so "mood was 2 days ago" or "mood is 2nd" are not read as scores
+_SCORE_PHRASE = re.compile(
+    r"\bmood\s+(?:is|was|'s)\s+(?:at\s+)?(?:an?\s+)?(10|[1-9])"
+    r"(?=\s*(?:$|[.,;:!?)]|-|(?:today|tonight|now|right\s+now|lately|again|and|but|so|though|at\s+best)\b))",
+    re.IGNORECASE
+)
+
+
+class ScreenResult(NamedTuple):
+    """Outcome of screening a single message"""
+    level: str
+    matches: List[CrisisMatch]
+    mood_score: Optional[int]
+
+
+def extract_mood_score(text: str) -> Optional[int]:
+    """Extract an explicit 1-10 mood score from free text, if one is stated"""
+    match = _SCORE_OUT_OF_TEN.search(text) or _SCORE_PHRASE.search(text)
+    return int(match.group(1)) if match else None
+
+
+def mood_score_level(mood_score: Optional[int]) -> str:
+    """Crisis level implied by a mood score; shared with the crisis tools so both screens agree"""
+    if mood_score is None:
+        return "none"
+    if mood_score <= 2:
+        return "high"
+    if mood_score <= 4:
+        return "moderate"
+    return "none"
+
+
+def prescreen_message(text: str) -> ScreenResult:
+    """
+    Screen a user message for crisis signals without calling a model
+
+    Args:
+        text: The raw user message
+
+    Returns:
+        ScreenResult with the combined crisis level, lexicon matches and any stated mood score
+    """
+    matches = crisis_matcher.find_all(text)
+    mood_score = extract_mood_score(text)
+    level = max_level(mood_score_level(mood_score), *(m.level for m in matches))
+    return ScreenResult(level=level, matches=matches, mood_score=mood_score)
@@ -1,12 +1,23 @@
 """Database schema and initialization for Mental Health Support Companion"""
 import sqlite3
+import re
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Set, Tuple
 import json
 from .config import DATABASE_PATH
+from .tracing import tracer
 
 
+def strategy_terms(*texts: str) -> Set[str]:
+    """Tokenize strategy text into the lowercase terms stored in the retrieval index"""
+    terms = set()
+    for text in texts:
+        terms.update(re.findall(r"[a-z][a-z']+", (text or "").lower()))
+    return terms
+
+
+@tracer.traced_methods("db", kind="db", exclude=("get_connection", "init_database"))
 class DatabaseManager:
     """Manages SQLite database operations"""
     
@@ -54,9 +65,13 @@ class DatabaseManager:
             triggers TEXT,
             notes TEXT,
             conversation_summary TEXT,
+            crisis_level TEXT,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
         """)
+        self._add_missing_columns(cursor, "mood_entries", {
+            "crisis_level": "TEXT"
+        })
         
         # Conversations table
         cursor.execute("""
@@ -95,9 +110,15 @@ class DatabaseManager:
             steps TEXT NOT NULL,
             evidence_link TEXT,
             usage_count INTEGER DEFAULT 0,
-            created_at TEXT NOT NULL
+            created_at TEXT NOT NULL,
+            min_intensity INTEGER DEFAULT 1,
+            max_intensity INTEGER DEFAULT 10
         )
         """)
+        self._add_missing_columns(cursor, "coping_strategies", {
+            "min_intensity": "INTEGER DEFAULT 1",
+            "max_intensity": "INTEGER DEFAULT 10"
+        })
         
         # Strategy usage tracking
         cursor.execute("""
@@ -113,6 +134,42 @@ class DatabaseManager:
         )
         """)
         
+        # Accumulated crisis risk per conversation session
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS session_risk (
+            session_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            score REAL NOT NULL DEFAULT 0,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            signal_counts TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """)
+        
+        # Inverted term index used by strategy retrieval
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS strategy_terms (
+            term TEXT NOT NULL,
+            strategy_id TEXT NOT NULL,
+            PRIMARY KEY (term, strategy_id),
+            FOREIGN KEY (strategy_id) REFERENCES coping_strategies(strategy_id)
+        ) WITHOUT ROWID
+        """)
+        
+        # Model token usage summed per user, agent and UTC day
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS token_usage (
+            user_id TEXT NOT NULL,
+            agent TEXT NOT NULL,
+            day TEXT NOT NULL,
+            calls INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            output_tokens INTEGER NOT NULL DEFAULT 0,
+            total_tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, agent)
+        ) WITHOUT ROWID
+        """)
+        
         # Create indexes for better query performance
         cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_mood_entries_user_timestamp 
@@ -129,9 +186,22 @@ class DatabaseManager:
         ON strategy_usage(user_id, used_at DESC)
         """)
         
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_coping_strategies_category 
+        ON coping_strategies(category COLLATE NOCASE)
+        """)
+        
         conn.commit()
         conn.close()
     
+    def _add_missing_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]):
+        """Add columns introduced after a table was first created"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for column, definition in columns.items():
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    
     def create_user(self, user_id: str, name: str, timezone: str = "UTC", 
                     preferences: Optional[Dict] = None) -> bool:
         """Create a new user
@@ -191,7 +261,7 @@ class DatabaseManager:
     
     def add_mood_entry(self, entry_id: str, user_id: str, mood_score: int,
                       emotions: List[str], triggers: List[str], notes: str,
-                      conversation_summary: str = "") -> bool:
+                      conversation_summary: str = "", crisis_level: Optional[str] = None) -> bool:
         """Add a mood entry
         
         Args:
@@ -202,6 +272,7 @@ class DatabaseManager:
             triggers: List of triggers
             notes: User notes
             conversation_summary: Summary of the conversation
+            crisis_level: Crisis screen result stored with the entry, if it was screened
             
         Returns:
             True if entry added successfully
@@ -212,8 +283,9 @@ class DatabaseManager:
         try:
             cursor.execute("""
             INSERT INTO mood_entries 
-            (entry_id, user_id, timestamp, mood_score, emotions, triggers, notes, conversation_summary)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            (entry_id, user_id, timestamp, mood_score, emotions, triggers, notes, conversation_summary,
+             crisis_level)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 entry_id,
                 user_id,
@@ -222,7 +294,8 @@ class DatabaseManager:
                 json.dumps(emotions),
                 json.dumps(triggers),
                 notes,
-                conversation_summary
+                conversation_summary,
+                crisis_level
             ))
             conn.commit()
             return True
@@ -264,6 +337,29 @@ class DatabaseManager:
         
         return entries
     
+    def get_mood_data_version(self, *user_ids: str) -> str:
+        """Get a token that changes whenever mood entries are added or removed
+        
+        Args:
+            user_ids: Users whose entries are covered
+            
+        Returns:
+            Version string built from the entry count and latest timestamp
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ", ".join("?" for _ in user_ids)
+        cursor.execute(f"""
+        SELECT COUNT(*), MAX(timestamp) FROM mood_entries
+        WHERE user_id IN ({placeholders})
+        """, user_ids)
+        
+        count, latest = cursor.fetchone()
+        conn.close()
+        # Windowed analyses ("last 7 days") also change as days pass
+        return f"{count}:{latest or ''}:{datetime.utcnow().date().isoformat()}"
+    
     def add_coping_strategy(self, strategy_id: str, name: str, category: str,
                            description: str, steps: List[str], 
                            evidence_link: str = "") -> bool:
@@ -297,6 +393,7 @@ class DatabaseManager:
                 evidence_link,
                 datetime.utcnow().isoformat()
             ))
+            self._index_strategies(cursor, [(strategy_id, name, category, description)])
             conn.commit()
             return True
         except Exception as e:
@@ -324,4 +421,361 @@ class DatabaseManager:
             strategy['steps'] = json.loads(strategy['steps']) if strategy.get('steps') else []
             strategies.append(strategy)
         
-        return strategies
\ No newline at end of file
+        return strategies
+    
+    def upsert_strategies(self, strategies: Iterable[Dict[str, Any]]) -> int:
+        """Insert or update coping strategies in a single transaction
+        
+        Existing rows keep their usage_count and created_at. The term index
+        for every written strategy is rebuilt in the same transaction.
+        
+        Args:
+            strategies: Strategy dicts with strategy_id, name, category,
+                description, steps and optional evidence_link
+            
+        Returns:
+            Number of strategies written
+        """
+        now = datetime.utcnow().isoformat()
+        rows = [
+            (
+                s['strategy_id'],
+                s['name'],
+                s['category'],
+                s['description'],
+                json.dumps(s['steps']),
+                s.get('evidence_link', ""),
+                now,
+                s.get('min_intensity', 1),
+                s.get('max_intensity', 10)
+            )
+            for s in strategies
+        ]
+        if not rows:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany("""
+            INSERT INTO coping_strategies 
+            (strategy_id, name, category, description, steps, evidence_link, created_at,
+             min_intensity, max_intensity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(strategy_id) DO UPDATE SET
+                name = excluded.name,
+                category = excluded.category,
+                description = excluded.description,
+                steps = excluded.steps,
+                evidence_link = excluded.evidence_link,
+                min_intensity = excluded.min_intensity,
+                max_intensity = excluded.max_intensity
+            """, rows)
+            self._index_strategies(cursor, [(r[0], r[1], r[2], r[3]) for r in rows])
+            cursor.execute("ANALYZE coping_strategies")
+            cursor.execute("ANALYZE strategy_terms")
+            conn.commit()
+            return len(rows)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def _index_strategies(self, cursor: sqlite3.Cursor, strategies: List[tuple]):
+        """Replace the term index entries for (strategy_id, name, category, description) rows"""
+        cursor.executemany(
+            "DELETE FROM strategy_terms WHERE strategy_id = ?",
+            [(strategy_id,) for strategy_id, *_ in strategies]
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO strategy_terms (term, strategy_id) VALUES (?, ?)",
+            [
+                (term, strategy_id)
+                for strategy_id, name, category, description in strategies
+                for term in strategy_terms(name, category, description)
+            ]
+        )
+    
+    def search_strategies(self, query: str) -> List[Dict[str, Any]]:
+        """Find coping strategies through the term index
+        
+        Args:
+            query: Free text such as an emotion ("anxious") or category
+            
+        Returns:
+            Matching strategies, most matched terms first
+        """
+        terms = sorted(strategy_terms(query))
+        if not terms:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ", ".join("?" for _ in terms)
+        cursor.execute(f"""
+        SELECT s.*, COUNT(t.term) AS matched_terms
+        FROM strategy_terms t
+        JOIN coping_strategies s ON s.strategy_id = t.strategy_id
+        WHERE t.term IN ({placeholders})
+        GROUP BY s.strategy_id
+        ORDER BY matched_terms DESC, s.usage_count DESC
+        """, terms)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        strategies = []
+        for row in rows:
+            strategy = dict(row)
+            strategy['steps'] = json.loads(strategy['steps']) if strategy.get('steps') else []
+            strategies.append(strategy)
+        
+        return strategies
+    
+    def get_strategy_ids(self) -> List[str]:
+        """Get the ids of all coping strategies in a stable order"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT strategy_id FROM coping_strategies ORDER BY rowid")
+        ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        
+        return ids
+    
+    def get_strategies_by_category(self, category: str) -> List[Dict[str, Any]]:
+        """Get coping strategies in a category (case-insensitive)
+        
+        Args:
+            category: Strategy category
+            
+        Returns:
+            List of strategies in that category
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT * FROM coping_strategies WHERE category = ? COLLATE NOCASE",
+            (category,)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+        
+        strategies = []
+        for row in rows:
+            strategy = dict(row)
+            strategy['steps'] = json.loads(strategy['steps']) if strategy.get('steps') else []
+            strategies.append(strategy)
+        
+        return strategies
+    
+    def record_strategy_usage(self, usage_id: str, user_id: str, strategy_id: str,
+                              helpful: Optional[bool] = None, feedback: str = "") -> bool:
+        """Record that a user tried a strategy and whether it helped
+        
+        Args:
+            usage_id: Unique usage identifier
+            user_id: User identifier
+            strategy_id: Strategy identifier
+            helpful: Whether the strategy helped, None if unknown
+            feedback: Free-text feedback
+            
+        Returns:
+            True if usage recorded successfully
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+            INSERT INTO strategy_usage (usage_id, user_id, strategy_id, used_at, helpful, feedback)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                usage_id,
+                user_id,
+                strategy_id,
+                datetime.utcnow().isoformat(),
+                helpful,
+                feedback
+            ))
+            cursor.execute(
+                "UPDATE coping_strategies SET usage_count = usage_count + 1 WHERE strategy_id = ?",
+                (strategy_id,)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error recording strategy usage: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def get_strategy_feedback(self, user_id: str) -> Dict[str, Dict[str, int]]:
+        """Get a user's aggregated helpfulness feedback per strategy
+        
+        Args:
+            user_id: User identifier
+            
+        Returns:
+            Dict of strategy_id -> {"helpful": count, "rated": count}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+        SELECT strategy_id,
+               SUM(CASE WHEN helpful = 1 THEN 1 ELSE 0 END) AS helpful,
+               COUNT(helpful) AS rated
+        FROM strategy_usage
+        WHERE user_id = ?
+        GROUP BY strategy_id
+        """, (user_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return {row['strategy_id']: {"helpful": row['helpful'], "rated": row['rated']} for row in rows}
+    
+    def get_session_risk(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get the accumulated crisis risk for a session
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Risk state dict or None if the session has no risk record
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM session_risk WHERE session_id = ?", (session_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            risk = dict(row)
+            risk['signal_counts'] = json.loads(risk['signal_counts']) if risk.get('signal_counts') else {}
+            return risk
+        return None
+    
+    def save_session_risk(self, session_id: str, user_id: str, score: float,
+                          message_count: int, signal_counts: Dict[str, int]) -> bool:
+        """Insert or update the accumulated crisis risk for a session
+        
+        Args:
+            session_id: Session identifier
+            user_id: User identifier
+            score: Decayed risk score
+            message_count: Messages scanned so far
+            signal_counts: Matched signal -> count
+            
+        Returns:
+            True if saved successfully
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+            INSERT INTO session_risk (session_id, user_id, score, message_count, signal_counts, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(session_id) DO UPDATE SET
+                score = excluded.score,
+                message_count = excluded.message_count,
+                signal_counts = excluded.signal_counts,
+                updated_at = excluded.updated_at
+            """, (
+                session_id,
+                user_id,
+                score,
+                message_count,
+                json.dumps(signal_counts),
+                datetime.utcnow().isoformat()
+            ))
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error saving session risk: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def add_token_usage(self, rows: Iterable[Tuple[str, str, str, int, int, int, int]]) -> int:
+        """Add token counts to the per-day totals in a single transaction
+        
+        Args:
+            rows: (user_id, agent, day, calls, prompt_tokens, output_tokens, total_tokens) tuples
+            
+        Returns:
+            Number of rows written
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany("""
+            INSERT INTO token_usage (user_id, agent, day, calls, prompt_tokens, output_tokens, total_tokens)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, day, agent) DO UPDATE SET
+                calls = calls + excluded.calls,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                output_tokens = output_tokens + excluded.output_tokens,
+                total_tokens = total_tokens + excluded.total_tokens
+            """, rows)
+            conn.commit()
+            return len(rows)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def get_token_usage(self, user_id: str, since_day: str) -> List[Dict[str, Any]]:
+        """Get a user's token usage rows from a day onwards
+        
+        Args:
+            user_id: User identifier
+            since_day: First day included (YYYY-MM-DD)
+            
+        Returns:
+            List of {agent, day, calls, prompt_tokens, output_tokens, total_tokens}, newest day first
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+        SELECT agent, day, calls, prompt_tokens, output_tokens, total_tokens
+        FROM token_usage
+        WHERE user_id = ? AND day >= ?
+        ORDER BY day DESC, agent
+        """, (user_id, since_day))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def get_daily_token_total(self, user_id: str, day: str) -> int:
+        """Get the tokens a user has used on a day, across agents
+        
+        Args:
+            user_id: User identifier
+            day: Day (YYYY-MM-DD)
+            
+        Returns:
+            Total tokens
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT COALESCE(SUM(total_tokens), 0) FROM token_usage WHERE user_id = ? AND day = ?",
+                       (user_id, day))
+        total = cursor.fetchone()[0]
+        conn.close()
+        
+        return total
@@ -0,0 +1,217 @@
+"""
+Local Intent Router
+Resolves command shortcuts and high-confidence intents without a model call
+"""
+import json
+import math
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from .config import ROUTER_MODEL_PATH, ROUTING_LOG_PATH, ROUTING_LOG_ENABLED, ROUTER_CONFIDENCE
+
+SPECIALIST_AGENTS = ("MoodTrackerAgent", "PatternAnalyzerAgent", "SupportAgent", "CrisisMonitorAgent")
+
+# Menu shortcuts whose target is known up front ('help' is left to the orchestrator)
+COMMAND_ROUTES = {
+    'mood': "MoodTrackerAgent",
+    'patterns': "PatternAnalyzerAgent",
+    'support': "SupportAgent",
+}
+
+# Unambiguous phrasings, checked in order
+RULES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\b(log|record|track|save)\b.{0,20}\bmood\b|\bcheck[- ]?in\b|\bmy mood (is|was)\b"), "MoodTrackerAgent"),
+    (re.compile(r"\b(patterns?|trends?|insights?)\b|\bhow have i been\b"), "PatternAnalyzerAgent"),
+    (re.compile(r"\b(coping|strateg(y|ies)|exercises?|techniques?)\b|\bcalm (myself )?down\b"), "SupportAgent"),
+]
+
+
+class RouteDecision(NamedTuple):
+    """A routing outcome; agent is None when the input should go to the orchestrator"""
+    agent: Optional[str]
+    source: str
+    confidence: float
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word unigrams plus bigrams"""
+    words = re.findall(r"[a-z']+", text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesIntentClassifier:
+    """Multinomial naive Bayes over word unigrams and bigrams, trained offline from routing logs"""
+
+    def __init__(self):
+        self.doc_counts: Dict[str, int] = {}
+        self.token_counts: Dict[str, Dict[str, int]] = {}
+        self.token_totals: Dict[str, int] = {}
+        self.vocabulary: set = set()
+
+    @property
+    def trained_examples(self) -> int:
+        return sum(self.doc_counts.values())
+
+    def train(self, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesIntentClassifier":
+        """
+        Add (text, agent) examples to the model
+
+        Returns:
+            self, for chaining
+        """
+        for text, agent in examples:
+            self.doc_counts[agent] = self.doc_counts.get(agent, 0) + 1
+            counts = self.token_counts.setdefault(agent, {})
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+                self.token_totals[agent] = self.token_totals.get(agent, 0) + 1
+                self.vocabulary.add(token)
+        return self
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Predict the agent for a message
+
+        Returns:
+            (agent, posterior probability), or (None, 0.0) for an untrained model
+        """
+        if not self.doc_counts:
+            return None, 0.0
+
+        tokens = [t for t in tokenize(text) if t in self.vocabulary]
+        total_docs = self.trained_examples
+        vocab_size = len(self.vocabulary)
+
+        log_scores = {}
+        for agent, docs in self.doc_counts.items():
+            counts = self.token_counts.get(agent, {})
+            denominator = self.token_totals.get(agent, 0) + vocab_size
+            score = math.log(docs / total_docs)
+            for token in tokens:
+                score += math.log((counts.get(token, 0) + 1) / denominator)
+            log_scores[agent] = score
+
+        best = max(log_scores, key=log_scores.get)
+        top = log_scores[best]
+        normalizer = sum(math.exp(score - top) for score in log_scores.values())
+        return best, 1.0 / normalizer
+
+    def to_dict(self) -> Dict:
+        return {
+            "doc_counts": self.doc_counts,
+            "token_counts": self.token_counts,
+            "token_totals": self.token_totals,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NaiveBayesIntentClassifier":
+        model = cls()
+        model.doc_counts = data.get("doc_counts", {})
+        model.token_counts = data.get("token_counts", {})
+        model.token_totals = data.get("token_totals", {})
+        model.vocabulary = {token for counts in model.token_counts.values() for token in counts}
+        return model
+
+    def save(self, path: Optional[Path] = None):
+        path = Path(path or ROUTER_MODEL_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "NaiveBayesIntentClassifier":
+        """Load a trained model, or return an empty one if none has been trained yet"""
+        try:
+            with open(Path(path or ROUTER_MODEL_PATH), 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+
+class IntentRouter:
+    """Rules-plus-classifier routing tier that runs before the orchestrator LLM"""
+
+    # Below this many training examples the classifier is not trusted on its own
+    MIN_TRAINING_EXAMPLES = 20
+
+    def __init__(self, classifier: Optional[NaiveBayesIntentClassifier] = None,
+                 confidence_threshold: float = ROUTER_CONFIDENCE):
+        """
+        Args:
+            classifier: Trained classifier. If None, loads the model at ROUTER_MODEL_PATH.
+            confidence_threshold: Minimum posterior for a classifier decision to be used
+        """
+        self.classifier = classifier if classifier is not None else NaiveBayesIntentClassifier.load()
+        self.confidence_threshold = confidence_threshold
+
+    def route(self, text: str) -> RouteDecision:
+        """
+        Route a message locally if the target is clear
+
+        Args:
+            text: The user's raw message
+
+        Returns:
+            RouteDecision; agent is None when the orchestrator should decide
+        """
+        normalized = " ".join(text.lower().split())
+
+        if normalized in COMMAND_ROUTES:
+            return RouteDecision(COMMAND_ROUTES[normalized], "command", 1.0)
+
+        for pattern, agent in RULES:
+            if pattern.search(normalized):
+                return RouteDecision(agent, "rule", 1.0)
+
+        if self.classifier.trained_examples >= self.MIN_TRAINING_EXAMPLES:
+            agent, confidence = self.classifier.predict(normalized)
+            if agent in SPECIALIST_AGENTS and confidence >= self.confidence_threshold:
+                return RouteDecision(agent, "classifier", confidence)
+
+        return RouteDecision(None, "fallback", 0.0)
+
+
+class RoutingLog:
+    """
+    Appends orchestrator routing decisions as JSONL training data for the classifier.
+
+    Entries hold the user's message as typed, so nothing is written unless the
+    log is enabled (ROUTING_LOG_ENABLED).
+    """
+
+    def __init__(self, path: Optional[Path] = None, enabled: bool = ROUTING_LOG_ENABLED):
+        """
+        Args:
+            path: JSONL file decisions are appended to
+            enabled: Whether decisions are written at all
+        """
+        self.path = Path(path or ROUTING_LOG_PATH)
+        self.enabled = enabled
+
+    def record(self, text: str, agent: str):
+        """Log a routing decision for a specialist agent; other outputs are ignored"""
+        if not self.enabled or agent not in SPECIALIST_AGENTS:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    "text": text,
+                    "agent": agent,
+                    "timestamp": datetime.now().isoformat()
+                }) + "\n")
+        except OSError as e:
+            print(f"Error writing routing log: {e}")
+
+    def examples(self) -> List[Tuple[str, str]]:
+        """Read logged (text, agent) pairs"""
+        if not self.path.exists():
+            return []
+        examples = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    examples.append((record["text"], record["agent"]))
+        return examples
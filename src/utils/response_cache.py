@@ -0,0 +1,111 @@
+"""
+Response Cache
+Replays an agent's last narrated answer while the user's underlying data is unchanged
+"""
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from .config import RESPONSE_CACHE_AGENTS, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+from .routing_cache import normalize_input
+
+# Phrases asking for a freshly generated answer; the new answer still replaces the cached one
+OPT_OUT_PATTERN = re.compile(
+    r"\b(refresh|fresh|again|re-?run|recalculate|re-?analy[sz]e|new analysis|latest|updated?|"
+    r"no cache|don'?t use (the )?cache)\b"
+)
+
+CacheKey = Tuple[str, str, str, Any]
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of agent answers keyed by (user, agent, normalized intent, data version).
+
+    Only agents whose answers are a pure narration of stored data belong here
+    (by default the pattern analyzer): while the user's data version is the same,
+    re-asking the same question would only pay for the model to re-narrate
+    identical tool output. Any new data changes the version, so stale answers
+    are never served; the TTL bounds how long wording is reused regardless.
+    """
+
+    def __init__(self, version_of: Callable[[str], Any], agents: Iterable[str] = RESPONSE_CACHE_AGENTS,
+                 capacity: int = RESPONSE_CACHE_SIZE, ttl_seconds: float = RESPONSE_CACHE_TTL):
+        """
+        Args:
+            version_of: Function returning a value that changes whenever a user's data changes
+            agents: Agents whose answers may be cached
+            capacity: Maximum number of cached answers
+            ttl_seconds: Age after which an answer is regenerated
+        """
+        self.version_of = version_of
+        self.agents = set(agents)
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[CacheKey, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def opted_out(text: str) -> bool:
+        """Whether the message asks for a fresh answer"""
+        return bool(OPT_OUT_PATTERN.search(text.lower()))
+
+    def lookup(self, user_id: str, agent: str, text: str) -> Tuple[Optional[CacheKey], Optional[str]]:
+        """
+        Look up a cached answer
+
+        Args:
+            user_id: User identifier
+            agent: Agent the message was routed to
+            text: The user's message
+
+        Returns:
+            (key to store the new answer under or None if the agent is not cached,
+             cached answer or None on a miss or opt-out)
+        """
+        intent = normalize_input(text)
+        if agent not in self.agents or not intent:
+            return None, None
+        # The version is read before the agent runs, so an answer is never filed
+        # under data that arrived while it was being generated
+        key = (user_id, agent, intent, self.version_of(user_id))
+        if self.opted_out(text):
+            self.bypassed += 1
+            return key, None
+
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry["stored_at"] > self.ttl_seconds:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return key, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return key, entry["text"]
+
+    def put(self, key: Optional[CacheKey], text: str):
+        """Store an answer under a key from lookup(), evicting the least recently used entry if full"""
+        if key is None or not text.strip():
+            return
+        # Answers for an older data version can never be served again
+        for stale in [k for k in self._entries if k[:3] == key[:3] and k[3] != key[3]]:
+            del self._entries[stale]
+        self._entries[key] = {"text": text, "stored_at": time.time()}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,91 @@
+"""
+Conversation Risk Tracker
+Accumulates crisis risk incrementally across the messages of a session
+"""
+from typing import Any, Dict, Optional
+from .crisis_screen import ScreenResult, mood_score_level
+from .database import DatabaseManager
+
+
+class RiskTracker:
+    """Keeps a decayed crisis risk score per session
+    
+    Each message is scanned once (by the pre-screen) and folded into the
+    running score, so risk spread over several messages is caught without
+    re-reading the history. Current state is held in memory for O(1) reads
+    and written through to the session_risk table.
+    """
+    
+    SIGNAL_WEIGHTS = {"none": 0.0, "moderate": 1.0, "high": 3.0}
+    
+    # Fraction of the previous score carried into the next message
+    DECAY = 0.7
+    
+    # Minimum accumulated score for each level
+    HIGH_THRESHOLD = 3.0
+    MODERATE_THRESHOLD = 1.0
+    
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        """
+        Args:
+            db: Database manager used to persist risk. If None, uses the default database.
+        """
+        self.db = db or DatabaseManager()
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+    
+    def observe(self, session_id: str, user_id: str, screen: ScreenResult) -> Dict[str, Any]:
+        """
+        Fold a newly screened message into the session's risk
+        
+        Args:
+            session_id: Session the message belongs to
+            user_id: User identifier
+            screen: Pre-screen result for the new message
+            
+        Returns:
+            The updated risk state
+        """
+        state = self.get(session_id)
+        
+        signal = self.SIGNAL_WEIGHTS[mood_score_level(screen.mood_score)]
+        counts = state['signal_counts']
+        for match in screen.matches:
+            signal += self.SIGNAL_WEIGHTS[match.level]
+            counts[match.phrase] = counts.get(match.phrase, 0) + 1
+        if screen.mood_score is not None and signal:
+            counts['low_mood_score'] = counts.get('low_mood_score', 0) + 1
+        
+        state['score'] = state['score'] * self.DECAY + signal
+        state['message_count'] += 1
+        state['level'] = self._level(state['score'])
+        
+        self.db.save_session_risk(
+            session_id, user_id, state['score'], state['message_count'], counts
+        )
+        return state
+    
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Current risk state for a session, loading it from the database on first access"""
+        state = self._sessions.get(session_id)
+        if state is None:
+            stored = self.db.get_session_risk(session_id) or {}
+            score = stored.get('score', 0.0)
+            state = {
+                'score': score,
+                'level': self._level(score),
+                'message_count': stored.get('message_count', 0),
+                'signal_counts': stored.get('signal_counts', {})
+            }
+            self._sessions[session_id] = state
+        return state
+    
+    def level(self, session_id: str) -> str:
+        """Current risk level ("none", "moderate" or "high") for a session"""
+        return self.get(session_id)['level']
+    
+    def _level(self, score: float) -> str:
+        if score >= self.HIGH_THRESHOLD:
+            return "high"
+        if score >= self.MODERATE_THRESHOLD:
+            return "moderate"
+        return "none"
@@ -0,0 +1,181 @@
+"""
+Routing Decision Cache
+LRU cache of orchestrator routing decisions keyed on normalized input
+"""
+import json
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Optional
+from .config import (ROUTING_CACHE_PATH, ROUTING_CACHE_SIZE, ROUTING_CACHE_TTL, ROUTING_CACHE_FUZZY,
+                     ROUTING_CACHE_PERSIST)
+
+
+def normalize_input(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def shingles(normalized: str, size: int = 3) -> FrozenSet[str]:
+    """Character shingles of a normalized input, used for fuzzy matching"""
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + size] for i in range(max(1, len(padded) - size + 1)))
+
+
+class RoutingCache:
+    """
+    LRU + TTL cache mapping normalized user input to the agent the orchestrator chose.
+
+    Keys are the user's messages, lowercased, so the cache lives in memory
+    only unless persistence is enabled (ROUTING_CACHE_PERSIST).
+    """
+
+    def __init__(self, capacity: int = ROUTING_CACHE_SIZE, ttl_seconds: float = ROUTING_CACHE_TTL,
+                 fuzzy_threshold: float = ROUTING_CACHE_FUZZY, path: Optional[Path] = None,
+                 persist: bool = ROUTING_CACHE_PERSIST):
+        """
+        Args:
+            capacity: Maximum number of cached decisions
+            ttl_seconds: Age after which a decision is no longer served
+            fuzzy_threshold: Minimum shingle Jaccard similarity for a fuzzy hit; 0 disables fuzzy lookup
+            path: JSON file used to persist the cache across restarts
+            persist: Whether save() and load() use the file at all
+        """
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+        self.path = Path(path or ROUTING_CACHE_PATH)
+        self.persist = persist
+
+        # key -> {"agent", "stored_at"}; wall-clock time so entries expire correctly after a restart
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._shingles: Dict[str, FrozenSet[str]] = {}
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text: str) -> Optional[str]:
+        """
+        Look up a cached routing decision
+
+        Args:
+            text: The user's message
+
+        Returns:
+            The cached agent name, or None on a miss
+        """
+        key = normalize_input(text)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["agent"]
+
+        if self.fuzzy_threshold > 0 and key:
+            match = self._fuzzy_lookup(key, now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.fuzzy_hits += 1
+                return self._entries[match]["agent"]
+
+        self.misses += 1
+        return None
+
+    def put(self, text: str, agent: str):
+        """Cache the agent chosen for a message, evicting the least recently used entry if full"""
+        key = normalize_input(text)
+        if not key:
+            return
+        self._entries[key] = {"agent": agent, "stored_at": time.time()}
+        self._entries.move_to_end(key)
+        if self.fuzzy_threshold > 0:
+            self._shingles[key] = shingles(key)
+        while len(self._entries) > self.capacity:
+            oldest, _ = self._entries.popitem(last=False)
+            self._shingles.pop(oldest, None)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate counters"""
+        lookups = self.hits + self.fuzzy_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.fuzzy_hits) / lookups if lookups else 0.0
+        }
+
+    def save(self) -> bool:
+        """Persist entries and counters to disk; returns False if nothing was written"""
+        if not self.persist:
+            return False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "entries": list(self._entries.items()),
+                    "counters": {
+                        "hits": self.hits,
+                        "fuzzy_hits": self.fuzzy_hits,
+                        "misses": self.misses,
+                        "evictions": self.evictions
+                    }
+                }, f)
+            return True
+        except OSError as e:
+            print(f"Error saving routing cache: {e}")
+            return False
+
+    def load(self) -> "RoutingCache":
+        """Restore persisted entries that have not expired; returns self for chaining"""
+        if not self.persist:
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if not self._expired(entry, now):
+                self._entries[key] = entry
+                if self.fuzzy_threshold > 0:
+                    self._shingles[key] = shingles(key)
+        while len(self._entries) > self.capacity:
+            oldest, _ = self._entries.popitem(last=False)
+            self._shingles.pop(oldest, None)
+
+        counters = data.get("counters", {})
+        self.hits = counters.get("hits", 0)
+        self.fuzzy_hits = counters.get("fuzzy_hits", 0)
+        self.misses = counters.get("misses", 0)
+        self.evictions = counters.get("evictions", 0)
+        return self
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["stored_at"] > self.ttl_seconds
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._shingles.pop(key, None)
+
+    def _fuzzy_lookup(self, key: str, now: float) -> Optional[str]:
+        """Most similar live entry above the threshold; linear in cache size, which is bounded"""
+        query = shingles(key)
+        best_key, best_score = None, self.fuzzy_threshold
+        for candidate, candidate_shingles in self._shingles.items():
+            union = len(query | candidate_shingles)
+            score = len(query & candidate_shingles) / union if union else 0.0
+            if score >= best_score and not self._expired(self._entries[candidate], now):
+                best_key, best_score = candidate, score
+        return best_key
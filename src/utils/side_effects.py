@@ -0,0 +1,59 @@
+"""
+Deferred Side Effects
+Lets tools that write data run inside a speculative agent turn without committing
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+
+_active_buffer: ContextVar[Optional["SideEffectBuffer"]] = ContextVar("side_effect_buffer", default=None)
+
+
+class SideEffectBuffer:
+    """
+    Queues side effects raised in the current asyncio task until the turn is confirmed.
+
+    A speculative turn activates a buffer in its own task; tools route their writes
+    through run_side_effect, which queues them while the buffer is pending. The turn
+    is then either confirmed (flush: queued writes run, later ones run immediately)
+    or abandoned (discard: queued writes are dropped).
+    """
+
+    def __init__(self):
+        self.pending: List[Callable[[], Any]] = []
+        self.resolved = False
+
+    def activate(self):
+        """Route side effects of the current task (and tasks it spawns) through this buffer"""
+        _active_buffer.set(self)
+
+    def flush(self) -> int:
+        """Run queued side effects; returns how many ran"""
+        self.resolved = True
+        pending, self.pending = self.pending, []
+        for effect in pending:
+            effect()
+        return len(pending)
+
+    def discard(self) -> int:
+        """Drop queued side effects; returns how many were suppressed"""
+        self.resolved = True
+        suppressed = len(self.pending)
+        self.pending = []
+        return suppressed
+
+
+def run_side_effect(effect: Callable[[], Any]) -> Any:
+    """
+    Run a write now, or queue it if the current turn is still speculative
+
+    Args:
+        effect: Zero-argument callable performing the write
+
+    Returns:
+        The callable's result, or True when it was queued
+    """
+    buffer = _active_buffer.get()
+    if buffer is None or buffer.resolved:
+        return effect()
+    buffer.pending.append(effect)
+    return True
@@ -0,0 +1,98 @@
+"""
+Coping Strategy Corpus Loader
+Bulk-loads strategies from JSON/JSONL files into the database
+"""
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from .database import DatabaseManager
+
+REQUIRED_FIELDS = ('name', 'category', 'description', 'steps')
+
+
+def read_corpus(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a strategy corpus file
+    
+    Args:
+        path: A .jsonl file with one strategy per line, or a .json file holding
+            a list of strategies (or {"strategies": [...]})
+            
+    Returns:
+        List of normalized strategy dicts ready for upsert
+        
+    Raises:
+        ValueError: If a record is missing a required field or has an invalid intensity range
+    """
+    corpus_path = Path(path)
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        if corpus_path.suffix == '.jsonl':
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+            records = data.get('strategies', []) if isinstance(data, dict) else data
+    
+    return [_normalize(record, index) for index, record in enumerate(records, 1)]
+
+
+def _normalize(record: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """Validate a corpus record and fill in derived fields"""
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    if missing:
+        raise ValueError(f"Strategy #{index} is missing required fields: {', '.join(missing)}")
+    
+    steps = record['steps']
+    if isinstance(steps, str):
+        steps = [step.strip() for step in steps.split('\n') if step.strip()]
+    
+    # Stable ids keep re-loads of the same corpus idempotent
+    strategy_id = record.get('strategy_id') or record.get('id') or str(
+        uuid.uuid5(uuid.NAMESPACE_URL, f"strategy:{record['category']}:{record['name']}")
+    )
+    
+    # Intensity range the strategy suits, as [min, max] or separate fields
+    intensity = record.get('intensity') or (record.get('min_intensity', 1), record.get('max_intensity', 10))
+    if not isinstance(intensity, (list, tuple)) or len(intensity) != 2:
+        raise ValueError(f"Strategy #{index} has an invalid intensity: expected [min, max], got {intensity!r}")
+    try:
+        min_intensity, max_intensity = (int(value) for value in intensity)
+    except (TypeError, ValueError):
+        raise ValueError(f"Strategy #{index} has an invalid intensity: {intensity!r} is not a pair of integers")
+    
+    return {
+        'strategy_id': str(strategy_id),
+        'name': record['name'],
+        'category': record['category'],
+        'description': record['description'],
+        'steps': steps,
+        'evidence_link': record.get('evidence_link', ""),
+        'min_intensity': min_intensity,
+        'max_intensity': max_intensity,
+    }
+
+
+def load_strategy_corpus(path: str, db: Optional[DatabaseManager] = None) -> Dict[str, Any]:
+    """
+    Load a strategy corpus into the database and prebuild the retrieval index
+    
+    Args:
+        path: Corpus file path (.json or .jsonl)
+        db: Database manager. If None, uses the default database.
+        
+    Returns:
+        Load statistics: strategies written, elapsed seconds and rows per second
+    """
+    db = db or DatabaseManager()
+    
+    start = time.perf_counter()
+    strategies = read_corpus(path)
+    count = db.upsert_strategies(strategies)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "count": count,
+        "seconds": elapsed,
+        "rows_per_second": count / elapsed if elapsed > 0 else float(count)
+    }
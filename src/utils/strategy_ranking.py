@@ -0,0 +1,120 @@
+"""
+Strategy Ranking
+Orders candidate coping strategies by relevance, per-user helpfulness and intensity fit
+"""
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from .database import DatabaseManager
+
+
+class StrategyRanker:
+    """Ranks coping strategies for a specific user and emotion intensity
+    
+    Helpfulness priors come from the user's strategy_usage feedback and are
+    cached as one compact float vector per user, indexed by strategy ordinal,
+    so personalized scoring is a constant-time lookup per candidate.
+    """
+    
+    RELEVANCE_WEIGHT = 0.5
+    PRIOR_WEIGHT = 0.3
+    INTENSITY_WEIGHT = 0.2
+    
+    # Beta(1, 1) prior: unrated strategies score 0.5
+    NEUTRAL_PRIOR = 0.5
+    
+    def __init__(self, db: Optional[DatabaseManager] = None, max_cached_users: int = 1024):
+        """
+        Args:
+            db: Database manager. If None, uses the default database on first use.
+            max_cached_users: Number of per-user prior vectors to keep in memory
+        """
+        self._db = db
+        self.max_cached_users = max_cached_users
+        self._ordinals: Dict[str, int] = {}
+        self._priors: "OrderedDict[str, array]" = OrderedDict()
+    
+    @property
+    def db(self) -> DatabaseManager:
+        if self._db is None:
+            self._db = DatabaseManager()
+        return self._db
+    
+    def rank(self, candidates: List[Dict[str, Any]], user_id: str,
+             intensity: int = 5) -> List[Dict[str, Any]]:
+        """
+        Rank candidate strategies for a user
+        
+        Args:
+            candidates: Strategies, optionally carrying 'matched_terms' from search
+            user_id: User identifier
+            intensity: Emotion intensity (1-10)
+            
+        Returns:
+            Candidates sorted best first, each with a 'score' field added
+        """
+        if not candidates:
+            return []
+        
+        priors = self.user_priors(user_id)
+        max_matched = max(c.get('matched_terms', 0) for c in candidates) or 1
+        
+        ranked = []
+        for candidate in candidates:
+            relevance = candidate.get('matched_terms', 0) / max_matched
+            ordinal = self._ordinals.get(candidate['strategy_id'])
+            prior = priors[ordinal] if ordinal is not None and ordinal < len(priors) else self.NEUTRAL_PRIOR
+            fit = self.intensity_fit(candidate, intensity)
+            
+            score = (self.RELEVANCE_WEIGHT * relevance
+                     + self.PRIOR_WEIGHT * prior
+                     + self.INTENSITY_WEIGHT * fit)
+            ranked.append({**candidate, 'score': score})
+        
+        ranked.sort(key=lambda c: c['score'], reverse=True)
+        return ranked
+    
+    @staticmethod
+    def intensity_fit(strategy: Dict[str, Any], intensity: int) -> float:
+        """Score 1.0 inside the strategy's intensity range, decaying linearly outside it"""
+        low = strategy.get('min_intensity') or 1
+        high = strategy.get('max_intensity') or 10
+        if low <= intensity <= high:
+            return 1.0
+        distance = low - intensity if intensity < low else intensity - high
+        return max(0.0, 1.0 - distance / 9)
+    
+    def user_priors(self, user_id: str) -> array:
+        """Get the cached helpfulness prior vector for a user, building it on a miss"""
+        priors = self._priors.get(user_id)
+        if priors is not None:
+            self._priors.move_to_end(user_id)
+            return priors
+        
+        feedback = self.db.get_strategy_feedback(user_id)
+        if any(strategy_id not in self._ordinals for strategy_id in feedback):
+            self._refresh_ordinals()
+        
+        priors = array('f', [self.NEUTRAL_PRIOR]) * len(self._ordinals)
+        for strategy_id, counts in feedback.items():
+            ordinal = self._ordinals.get(strategy_id)
+            if ordinal is not None:
+                priors[ordinal] = (counts['helpful'] + 1) / (counts['rated'] + 2)
+        
+        self._priors[user_id] = priors
+        if len(self._priors) > self.max_cached_users:
+            self._priors.popitem(last=False)
+        return priors
+    
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop cached priors for one user, or for everyone"""
+        if user_id is None:
+            self._priors.clear()
+        else:
+            self._priors.pop(user_id, None)
+    
+    def _refresh_ordinals(self):
+        """Re-read the strategy id -> vector position map"""
+        self._ordinals = {strategy_id: i for i, strategy_id in enumerate(self.db.get_strategy_ids())}
+        # Vectors built against the old ordinals are no longer aligned
+        self._priors.clear()
@@ -0,0 +1,300 @@
+"""
+Turn Tracing
+Nested timing spans for routing, agent runs, tool calls and database queries
+"""
+import functools
+import inspect
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .config import TRACING, TRACE_FILE, TRACE_MAX_BYTES, TRACE_BACKUP_COUNT
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; offsets and durations come from the monotonic clock"""
+
+    def __init__(self, name: str, kind: str, trace_id: str, parent: Optional["Span"],
+                 attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.wall_time = time.time()
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        # Offsets are measured from the start of the turn the span belongs to
+        self.trace_started = parent.trace_started if parent else self.started
+
+    def set(self, **attributes):
+        """Add attributes to the span"""
+        self.attributes.update(attributes)
+
+    def finish(self, error: Optional[BaseException] = None):
+        if error is not None and self.error is None:
+            self.error = f"{type(error).__name__}: {error}"
+        if self.ended is None:
+            self.ended = time.perf_counter()
+
+    def to_dict(self) -> Dict[str, Any]:
+        ended = self.ended if self.ended is not None else time.perf_counter()
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "kind": self.kind,
+            "timestamp": self.wall_time,
+            "offset_ms": round((self.started - self.trace_started) * 1000, 3),
+            "duration_ms": round((ended - self.started) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+class Tracer:
+    """
+    Records spans for each traced turn and appends them to a rotating JSONL file.
+
+    A turn opens a root span with trace(); span() nests under whatever span is
+    current in the running task, so spans opened by tools and database calls
+    attach to the agent run that triggered them. Outside a turn, span() records
+    nothing. A turn's spans are written together when its root span ends.
+    Attributes hold identifiers and counts only, never message text.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_bytes: int = TRACE_MAX_BYTES,
+                 backup_count: int = TRACE_BACKUP_COUNT, enabled: bool = TRACING):
+        """
+        Args:
+            path: JSONL file spans are appended to
+            max_bytes: Size at which the file is rotated
+            backup_count: Number of rotated files kept
+            enabled: When False, no spans are recorded
+        """
+        self.path = Path(path or TRACE_FILE)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.enabled = enabled
+        self._open: Dict[str, List[Span]] = {}
+        self._logger: Optional[logging.Logger] = None
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Open the root span of a new turn"""
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name, "turn", uuid.uuid4().hex, None, attributes)
+        self._open[span.trace_id] = []
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes) -> Iterator[Optional[Span]]:
+        """Open a span under the current one; a no-op outside a traced turn"""
+        span = self.start_span(name, kind, **attributes)
+        if span is None:
+            yield None
+            return
+        with self._activate(span):
+            yield span
+
+    def start_span(self, name: str, kind: str = "internal", **attributes) -> Optional[Span]:
+        """Create a child of the current span without activating it, or None outside a turn"""
+        parent = _current_span.get()
+        if not self.enabled or parent is None:
+            return None
+        return Span(name, kind, parent.trace_id, parent, attributes)
+
+    def annotate(self, **attributes):
+        """Add attributes to the current span, if any"""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        """Finish a span and record it"""
+        span.finish(error)
+        if span.parent is None:
+            self._write(self._open.pop(span.trace_id, []) + [span])
+        elif span.trace_id in self._open:
+            self._open[span.trace_id].append(span)
+        else:
+            # Finished after its turn was written (e.g. a cancelled speculative run)
+            self._write([span])
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span, error)
+
+    def traced(self, name: Optional[str] = None, kind: str = "internal") -> Callable:
+        """
+        Decorator opening a span around each call of a function or coroutine function
+
+        Args:
+            name: Span name; defaults to the function's qualified name
+            kind: Span kind, e.g. "db" or "tool"
+        """
+        def decorator(fn: Callable) -> Callable:
+            span_name = name or fn.__qualname__
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, kind):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return fn(*args, **kwargs)
+                with self.span(span_name, kind):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def traced_methods(self, prefix: str, kind: str = "internal", exclude: tuple = ()) -> Callable:
+        """
+        Class decorator tracing every public method defined on the class
+
+        Args:
+            prefix: Span name prefix; spans are named "<prefix>.<method>"
+            kind: Span kind
+            exclude: Method names left untraced
+        """
+        def decorator(cls):
+            for attr_name, attr in list(vars(cls).items()):
+                if inspect.isfunction(attr) and not attr_name.startswith("_") and attr_name not in exclude:
+                    setattr(cls, attr_name, self.traced(f"{prefix}.{attr_name}", kind)(attr))
+            return cls
+        return decorator
+
+    def _write(self, spans: List[Span]):
+        try:
+            logger = self._logger or self._open_log()
+            for span in sorted(spans, key=lambda s: s.started):
+                logger.info(json.dumps(span.to_dict(), default=str))
+        except OSError as e:
+            print(f"Error writing trace: {e}")
+
+    def _open_log(self) -> logging.Logger:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        logger = logging.getLogger(f"{__name__}.{self.path}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes,
+                                          backupCount=self.backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        self._logger = logger
+        return logger
+
+    def recent_traces(self, count: int = 1) -> List[List[Dict[str, Any]]]:
+        """
+        Read back the most recently finished turns
+
+        Args:
+            count: Number of turns to return
+
+        Returns:
+            One list of span dicts per turn, oldest turn first, each sorted by start offset
+        """
+        traces: Dict[str, List[Dict[str, Any]]] = {}
+        finished: List[str] = []
+        # Rotated files hold older spans: app.jsonl.2 is older than app.jsonl.1
+        files = [Path(f"{self.path}.{i}") for i in range(self.backup_count, 0, -1)] + [self.path]
+        for path in files:
+            if not path.exists():
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    traces.setdefault(record["trace_id"], []).append(record)
+                    if record["parent_id"] is None:
+                        finished.append(record["trace_id"])
+        return [sorted(traces[trace_id], key=lambda s: s["offset_ms"])
+                for trace_id in finished[-count:]] if count > 0 else []
+
+
+def waterfall_rows(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Order a turn's spans depth-first for display
+
+    Returns:
+        The spans, each with an added "depth" key, children after their parent
+    """
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {span["span_id"] for span in spans}
+    for span in spans:
+        parent = span["parent_id"] if span["parent_id"] in ids else None
+        children.setdefault(parent, []).append(span)
+
+    rows = []
+
+    def visit(parent_id: Optional[str], depth: int):
+        for span in sorted(children.get(parent_id, []), key=lambda s: s["offset_ms"]):
+            rows.append(dict(span, depth=depth))
+            visit(span["span_id"], depth + 1)
+
+    visit(None, 0)
+    return rows
+
+
+tracer = Tracer()
+
+
+def trace_tool_start(tool: Any, args: Dict[str, Any], tool_context: Any) -> None:
+    """before_tool_callback: open a span for the tool call"""
+    span = tracer.start_span(f"tool.{tool.name}", "tool", call_id=tool_context.function_call_id,
+                             agent=tool_context.agent_name)
+    if span is not None:
+        _current_span.set(span)
+    return None
+
+
+def trace_tool_end(tool: Any, args: Dict[str, Any], tool_context: Any,
+                   tool_response: Any) -> None:
+    """after_tool_callback: close the tool call's span"""
+    _finish_tool_span(tool, tool_context)
+    return None
+
+
+def trace_tool_error(tool: Any, args: Dict[str, Any], tool_context: Any,
+                     error: Exception) -> None:
+    """on_tool_error_callback: close the tool call's span, recording the error"""
+    _finish_tool_span(tool, tool_context, error)
+    return None
+
+
+def _finish_tool_span(tool: Any, tool_context: Any, error: Optional[BaseException] = None):
+    span = _current_span.get()
+    if span is None or span.kind != "tool" or span.attributes.get("call_id") != tool_context.function_call_id:
+        return
+    _current_span.set(span.parent)
+    tracer.end_span(span, error)
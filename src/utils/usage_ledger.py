@@ -0,0 +1,196 @@
+"""
+Usage Ledger
+Counts model tokens per user, agent and day, and enforces per-user daily budgets
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from .config import (TOKEN_USAGE_FLUSH_EVERY, TOKEN_USAGE_FLUSH_SECONDS, USER_DAILY_TOKEN_BUDGET,
+                     MODEL_INPUT_PRICE_PER_MTOK, MODEL_OUTPUT_PRICE_PER_MTOK)
+from .database import DatabaseManager
+
+# (user_id, agent, day) -> [calls, prompt_tokens, output_tokens, total_tokens]
+UsageKey = Tuple[str, str, str]
+
+
+class UsageLedger:
+    """Token accounting from the usage metadata of model responses
+
+    record() only adds to in-memory counters. They reach the token_usage table
+    as one transaction once flush_every responses have accumulated or
+    flush_seconds have passed since the last write, and on flush() at
+    shutdown. Each user's total for the current UTC day is also held in
+    memory, seeded from the table on first use, so the budget check made on
+    every turn costs no query.
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None, daily_budget: int = USER_DAILY_TOKEN_BUDGET,
+                 flush_every: int = TOKEN_USAGE_FLUSH_EVERY, flush_seconds: float = TOKEN_USAGE_FLUSH_SECONDS,
+                 input_price: float = MODEL_INPUT_PRICE_PER_MTOK,
+                 output_price: float = MODEL_OUTPUT_PRICE_PER_MTOK):
+        """
+        Args:
+            db: Database manager the usage is written to. If None, uses the default database.
+            daily_budget: Tokens each user may use per day (0 for unlimited)
+            flush_every: Responses recorded before the counters are written
+            flush_seconds: Maximum age of unwritten counters when a response is recorded
+            input_price: USD per million prompt tokens
+            output_price: USD per million output tokens
+        """
+        self.db = db or DatabaseManager()
+        self.daily_budget = daily_budget
+        self.flush_every = max(1, flush_every)
+        self.flush_seconds = flush_seconds
+        self.input_price = input_price
+        self.output_price = output_price
+
+        self._pending: Dict[UsageKey, List[int]] = {}
+        self._pending_responses = 0
+        self._last_flush = time.monotonic()
+        self._day = self.today()
+        self._used_today: Dict[str, int] = {}
+        self.flushes = 0
+        self.limited_turns = 0
+
+    @staticmethod
+    def today() -> str:
+        return datetime.utcnow().date().isoformat()
+
+    @staticmethod
+    def token_counts(usage: Any) -> Tuple[int, int, int]:
+        """(prompt, output, total) tokens of a response's usage metadata"""
+        prompt = usage.prompt_token_count or 0
+        # Thinking tokens are billed as output
+        output = (usage.candidates_token_count or 0) + (getattr(usage, "thoughts_token_count", None) or 0)
+        return prompt, output, usage.total_token_count or prompt + output
+
+    def cost(self, prompt_tokens: int, output_tokens: int) -> float:
+        """Estimated USD cost of a token count"""
+        return (prompt_tokens * self.input_price + output_tokens * self.output_price) / 1_000_000
+
+    def record(self, user_id: str, agent: str, usage: Any) -> int:
+        """
+        Add one model response's usage
+
+        Args:
+            user_id: User the response was generated for
+            agent: Agent that made the model call
+            usage: The response's usage metadata
+
+        Returns:
+            Total tokens recorded
+        """
+        prompt, output, total = self.token_counts(usage)
+        if not total:
+            return 0
+        # The day's total is seeded from the table before this response joins the pending counters
+        used = self.used_today(user_id)
+        counts = self._pending.setdefault((user_id, agent, self._day), [0, 0, 0, 0])
+        for i, value in enumerate((1, prompt, output, total)):
+            counts[i] += value
+        self._used_today[user_id] = used + total
+
+        self._pending_responses += 1
+        if (self._pending_responses >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+        return total
+
+    def used_today(self, user_id: str) -> int:
+        """Tokens the user has used today, written or not"""
+        self._roll_day()
+        if user_id not in self._used_today:
+            written = self.db.get_daily_token_total(user_id, self._day)
+            pending = sum(counts[3] for (user, _, day), counts in self._pending.items()
+                          if user == user_id and day == self._day)
+            self._used_today[user_id] = written + pending
+        return self._used_today[user_id]
+
+    def remaining(self, user_id: str) -> Optional[int]:
+        """Tokens left in the user's budget today, or None without a budget"""
+        if self.daily_budget <= 0:
+            return None
+        return max(0, self.daily_budget - self.used_today(user_id))
+
+    def over_budget(self, user_id: str) -> bool:
+        """Whether the user has used up today's budget"""
+        return self.remaining(user_id) == 0
+
+    def flush(self) -> int:
+        """
+        Write the pending counters in one transaction
+
+        A failed write keeps the counters for the next flush; the error is
+        reported and the turn being answered carries on.
+
+        Returns:
+            Number of (user, agent, day) rows written
+        """
+        pending, self._pending = self._pending, {}
+        self._pending_responses = 0
+        self._last_flush = time.monotonic()
+        rows = [key + tuple(counts) for key, counts in pending.items()]
+        if not rows:
+            return 0
+        try:
+            written = self.db.add_token_usage(rows)
+        except Exception as e:
+            print(f"Error writing token usage: {e}")
+            for key, counts in pending.items():
+                kept = self._pending.setdefault(key, [0, 0, 0, 0])
+                for i, value in enumerate(counts):
+                    kept[i] += value
+            return 0
+        self.flushes += 1
+        return written
+
+    def report(self, user_id: str, days: int = 7) -> Dict[str, Any]:
+        """
+        A user's usage and estimated cost per agent and per day
+
+        Args:
+            user_id: User identifier
+            days: Number of days covered, today included
+
+        Returns:
+            {days, agents: agent -> totals, daily: day -> totals, today, budget, remaining}
+        """
+        self.flush()
+        since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+        agents: Dict[str, Dict[str, Any]] = {}
+        daily: Dict[str, Dict[str, Any]] = {}
+        for row in self.db.get_token_usage(user_id, since):
+            for totals in (agents.setdefault(row['agent'], self._empty_totals()),
+                           daily.setdefault(row['day'], self._empty_totals())):
+                for field in ("calls", "prompt_tokens", "output_tokens", "total_tokens"):
+                    totals[field] += row[field]
+        for totals in list(agents.values()) + list(daily.values()):
+            totals["cost"] = round(self.cost(totals["prompt_tokens"], totals["output_tokens"]), 6)
+        return {
+            "days": days,
+            "agents": agents,
+            "daily": daily,
+            "today": self.used_today(user_id),
+            "budget": self.daily_budget,
+            "remaining": self.remaining(user_id)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals for today across users, held in memory"""
+        return {
+            "users_today": len(self._used_today),
+            "tokens_today": sum(self._used_today.values()),
+            "pending_rows": len(self._pending),
+            "flushes": self.flushes,
+            "limited_turns": self.limited_turns
+        }
+
+    @staticmethod
+    def _empty_totals() -> Dict[str, Any]:
+        return {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+    def _roll_day(self):
+        today = self.today()
+        if today != self._day:
+            self._day = today
+            self._used_today.clear()
@@ -0,0 +1,9 @@
+"""
+Test configuration: import the package the way the application does
+"""
+import os
+import sys
+
+# run.py, serve.py and main.py put src on the path and import utils.*, tools.*, agents.* and ui.*;
+# tests must load the same modules, or singletons (catalog, tracer, side-effect buffer) are duplicated
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,882 @@
+"""
+Tests for agent runtime infrastructure
+"""
+import asyncio
+import pytest
+from typing import Any, AsyncGenerator
+from google.adk.agents import Agent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool
+from google.genai import types
+from agents.sessions import LazyAgentSessions, CurrentTurnSessionService, session_id_for
+from agents.speculation import Speculator
+from agents.registry import AgentRegistry, normalize_agent_name, percentile
+from agents.fake_model import FakeModel, parse_latency, use_fake_models
+from agents.compaction import SessionCompactor, summarize_locally, summary_of
+from agents.scheduler import ModelScheduler
+from agents.resilience import CallPolicy, ModelCallFailed, ModelCallGuard, ResilientLlm
+from utils.side_effects import run_side_effect
+
+
+def make_sessions():
+    agents = {
+        "MoodTrackerAgent": Agent(name="MoodTrackerAgent", model="gemini-2.0-flash"),
+        "SupportAgent": Agent(name="SupportAgent", model="gemini-2.0-flash"),
+    }
+    return LazyAgentSessions("TestApp", InMemorySessionService(), agents)
+
+
+class TestLazyAgentSessions:
+    """Test suite for lazy runner and session creation"""
+    
+    def test_nothing_created_up_front(self):
+        """Test that no runners or sessions exist before first use"""
+        sessions = make_sessions()
+        
+        listed = asyncio.run(sessions.session_service.list_sessions(app_name="TestApp", user_id="u1"))
+        assert listed.sessions == []
+        assert sessions._runners == {}
+    
+    def test_session_created_on_first_use_and_reused(self):
+        """Test that a session is created once and reused by later lookups"""
+        sessions = make_sessions()
+        
+        async def scenario():
+            first = await sessions.session_id("MoodTrackerAgent", "u1")
+            # A fresh instance (e.g. after a restart) finds the existing session
+            again = LazyAgentSessions("TestApp", sessions.session_service, sessions.agents)
+            second = await again.session_id("MoodTrackerAgent", "u1")
+            listed = await sessions.session_service.list_sessions(app_name="TestApp", user_id="u1")
+            return first, second, listed.sessions
+        
+        first, second, listed = asyncio.run(scenario())
+        assert first == second == session_id_for("u1", "MoodTrackerAgent")
+        assert len(listed) == 1
+    
+    def test_runner_cached_per_agent(self):
+        """Test that each agent gets a single runner"""
+        sessions = make_sessions()
+        
+        runner = sessions.runner("SupportAgent")
+        assert sessions.runner("SupportAgent") is runner
+        assert runner.agent.name == "SupportAgent"
+    
+    def test_agent_loader_called_on_first_run(self):
+        """Test that an agent given as a loader is built once, when first run"""
+        calls = []
+        
+        def load_support():
+            calls.append("SupportAgent")
+            return Agent(name="SupportAgent", model="gemini-2.0-flash")
+        
+        sessions = LazyAgentSessions("TestApp", InMemorySessionService(), {"SupportAgent": load_support})
+        assert "SupportAgent" in sessions.agents and calls == []
+        
+        runner = sessions.runner("SupportAgent")
+        assert sessions.agent("SupportAgent") is runner.agent
+        assert calls == ["SupportAgent"]
+
+
+class ToolCallingLlm(BaseLlm):
+    """Calls save_note once, then answers"""
+    model: str = "tool-calling"
+    
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(0.01)
+        last = llm_request.contents[-1].parts[0]
+        if last.function_response:
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Saved.")]))
+        else:
+            call = types.FunctionCall(name="save_note", args={"note": last.text})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+
+
+class TestSpeculation:
+    """Test suite for speculative specialist runs"""
+    
+    @staticmethod
+    def make_speculator(writes):
+        def save_note(note: str) -> str:
+            """Saves a note."""
+            run_side_effect(lambda: writes.append(note))
+            return "ok"
+        
+        agents = {
+            "MoodTrackerAgent": Agent(name="MoodTrackerAgent", model=ToolCallingLlm(),
+                                      tools=[FunctionTool(save_note)]),
+            "SupportAgent": Agent(name="SupportAgent", model=ToolCallingLlm()),
+        }
+        return Speculator(LazyAgentSessions("TestApp", InMemorySessionService(), agents))
+    
+    @staticmethod
+    def message(text):
+        return types.Content(role="user", parts=[types.Part(text=text)])
+    
+    @staticmethod
+    async def stored_events(speculator):
+        session = await speculator.sessions.session_service.get_session(
+            app_name="TestApp", user_id="u1", session_id=session_id_for("u1", "MoodTrackerAgent"))
+        return session.events
+    
+    def test_hit_commits_events_and_side_effects(self):
+        """Test that a confirmed guess replays its events and runs its writes"""
+        writes = []
+        speculator = self.make_speculator(writes)
+        
+        async def scenario():
+            run = speculator.start("MoodTrackerAgent", "u1", self.message("felt calm"))
+            await asyncio.sleep(0.05)
+            assert writes == []
+            adopted = speculator.resolve(run, "MoodTrackerAgent")
+            texts = [e.content.parts[0].text async for e in adopted.confirm()
+                     if e.content and e.content.parts[0].text]
+            return texts, await self.stored_events(speculator)
+        
+        texts, events = asyncio.run(scenario())
+        assert texts == ["Saved."]
+        assert writes == ["felt calm"]
+        assert len(events) == 4
+        stats = speculator.stats()
+        assert stats["hits"] == 1 and stats["latency_saved"] > 0
+    
+    def test_miss_suppresses_side_effects(self):
+        """Test that a wrong guess is cancelled without writing anything"""
+        writes = []
+        speculator = self.make_speculator(writes)
+        
+        async def scenario():
+            run = speculator.start("MoodTrackerAgent", "u1", self.message("felt calm"))
+            while run.completed_at is None:
+                await asyncio.sleep(0.01)
+            assert speculator.resolve(run, "SupportAgent") is None
+            await asyncio.sleep(0.05)
+            return await self.stored_events(speculator)
+        
+        events = asyncio.run(scenario())
+        assert writes == []
+        assert events == []
+        assert speculator.stats()["suppressed_side_effects"] == 1
+    
+    def test_miss_still_charges_its_tokens(self, tmp_path):
+        """Test that the model responses of a wrong guess count against the user's tokens"""
+        from utils.database import DatabaseManager
+        from utils.usage_ledger import UsageLedger
+        
+        ledger = UsageLedger(DatabaseManager(db_path=tmp_path / "usage.db"))
+        agent = Agent(name="SupportAgent", model="gemini-2.0-flash")
+        use_fake_models([agent], latency="fixed:0")
+        speculator = Speculator(LazyAgentSessions("TestApp", InMemorySessionService(), {agent.name: agent}),
+                                usage_ledger=ledger)
+        
+        async def scenario():
+            run = speculator.start("SupportAgent", "u1", self.message("a long day at work"))
+            while run.completed_at is None:
+                await asyncio.sleep(0.01)
+            assert speculator.resolve(run, "MoodTrackerAgent") is None
+        
+        asyncio.run(scenario())
+        report = ledger.report("u1")
+        assert report["agents"]["SupportAgent"]["calls"] == 1
+        assert report["today"] > 0
+    
+    def test_withdrawn_hit_is_recounted_as_a_miss(self):
+        """Test that a confirmed guess whose answer came from elsewhere earns no hit or latency credit"""
+        writes = []
+        speculator = self.make_speculator(writes)
+        
+        async def scenario():
+            run = speculator.start("MoodTrackerAgent", "u1", self.message("felt calm"))
+            while run.completed_at is None:
+                await asyncio.sleep(0.01)
+            adopted = speculator.resolve(run, "MoodTrackerAgent")
+            speculator.withdraw(adopted)
+        
+        asyncio.run(scenario())
+        stats = speculator.stats()
+        assert stats["hits"] == 0 and stats["misses"] == 1
+        assert stats["latency_saved"] == 0
+        assert stats["suppressed_side_effects"] == 1
+        assert writes == []
+    
+    def test_prediction_from_recent_routing(self):
+        """Test that the most frequent recent specialist is guessed, never the crisis agent"""
+        speculator = self.make_speculator([])
+        assert speculator.predict("hello") is None
+        
+        for agent in ["SupportAgent", "MoodTrackerAgent", "SupportAgent", "CrisisMonitorAgent"]:
+            speculator.observe(agent)
+        assert speculator.predict("hello") == "SupportAgent"
+
+
+class TestAgentRegistry:
+    """Test suite for registry dispatch and per-agent metrics"""
+    
+    def test_run_collects_metrics(self):
+        """Test that runs are metered with calls, tool calls and latency"""
+        def save_note(note: str) -> str:
+            """Saves a note."""
+            return "ok"
+        
+        sessions = LazyAgentSessions("TestApp", InMemorySessionService(), {
+            "MoodTrackerAgent": Agent(name="MoodTrackerAgent", model=ToolCallingLlm(),
+                                      tools=[FunctionTool(save_note)])
+        })
+        registry = AgentRegistry()
+        registry.register_all(sessions)
+        message = types.Content(role="user", parts=[types.Part(text="felt calm")])
+        
+        async def scenario():
+            first = await registry.run("MoodTrackerAgent", "u1", message)
+            second = await registry.run("MoodTrackerAgent", "u1", message)
+            return first, second
+        
+        first, second = asyncio.run(scenario())
+        assert first == second == "Saved."
+        stats = registry.stats()["MoodTrackerAgent"]
+        assert stats["calls"] == 2
+        assert stats["tool_calls"] == 2
+        assert stats["errors"] == 0
+        assert 0 < stats["p50"] <= stats["p99"]
+        assert stats["time_share"] == 1.0
+    
+    def test_token_usage_recorded_per_user(self, tmp_path):
+        """Test that the usage metadata of a run's model responses is recorded against its user"""
+        from utils.database import DatabaseManager
+        from utils.usage_ledger import UsageLedger
+        
+        ledger = UsageLedger(DatabaseManager(db_path=tmp_path / "usage.db"))
+        agent = Agent(name="SupportAgent", model="gemini-2.0-flash")
+        use_fake_models([agent], seed=1)
+        registry = AgentRegistry(usage_ledger=ledger)
+        registry.register_all(LazyAgentSessions("TestApp", InMemorySessionService(), {agent.name: agent}))
+        message = types.Content(role="user", parts=[types.Part(text="a long day at work")])
+        
+        asyncio.run(registry.run(agent.name, "u1", message))
+        report = ledger.report("u1")
+        assert report["agents"]["SupportAgent"]["calls"] == 1
+        assert report["today"] == report["agents"]["SupportAgent"]["total_tokens"] > 0
+        assert ledger.used_today("u2") == 0
+    
+    def test_errors_are_counted(self):
+        """Test that a failing event stream is recorded as an error and re-raised"""
+        registry = AgentRegistry()
+        registry.register("SupportAgent", make_sessions())
+        
+        async def failing():
+            raise RuntimeError("model unavailable")
+            yield
+        
+        async def scenario():
+            await registry.consume("SupportAgent", failing())
+        
+        with pytest.raises(RuntimeError):
+            asyncio.run(scenario())
+        assert registry.stats()["SupportAgent"]["errors"] == 1
+    
+    def test_exact_name_matching(self):
+        """Test that decisions are matched exactly after stripping quotes"""
+        registry = AgentRegistry()
+        registry.register_all(make_sessions())
+        
+        assert normalize_agent_name(' "SupportAgent"\n') in registry
+        assert "NotSupportAgent" not in registry
+        assert percentile([0.1, 0.2, 0.3, 0.4], 0.5) == 0.2
+        assert percentile([0.1, 0.2, 0.3, 0.4], 0.99) == 0.4
+
+
+class TestFakeModel:
+    """Test suite for the offline fake model backend"""
+    
+    def test_specialist_calls_scripted_tool_then_replies(self):
+        """Test that a specialist emits its scripted tool call and answers with the result"""
+        calls = []
+        
+        def analyze_mood_patterns(days: int = 7) -> str:
+            """Analyzes mood patterns."""
+            calls.append(days)
+            return "Your mood has been steady."
+        
+        agent = Agent(name="PatternAnalyzerAgent", model="gemini-2.0-flash",
+                      tools=[FunctionTool(analyze_mood_patterns)])
+        use_fake_models([agent], seed=1)
+        registry = AgentRegistry()
+        registry.register_all(LazyAgentSessions("TestApp", InMemorySessionService(), {agent.name: agent}))
+        message = types.Content(role="user", parts=[types.Part(text="how have I been?")])
+        
+        reply = asyncio.run(registry.run(agent.name, "u1", message))
+        assert calls == [7]
+        assert "Your mood has been steady." in reply
+        assert registry.stats()[agent.name]["tool_calls"] == 1
+    
+    def test_low_score_check_in_takes_one_tool_hop(self):
+        """Test that a low-score check-in is logged and screened by a single tool call"""
+        from tools.mood_tools import log_mood_and_screen
+        
+        agent = Agent(name="MoodTrackerAgent", model="gemini-2.0-flash",
+                      tools=[FunctionTool(log_mood_and_screen)])
+        use_fake_models([agent], seed=1)
+        registry = AgentRegistry()
+        registry.register_all(LazyAgentSessions("TestApp", InMemorySessionService(), {agent.name: agent}))
+        message = types.Content(role="user", parts=[types.Part(text="I feel 3/10 today, a bit sad")])
+        
+        reply = asyncio.run(registry.run(agent.name, "fused_tool_user", message))
+        assert "Successfully logged mood score 3" in reply
+        assert "988" in reply
+        assert registry.stats()[agent.name]["tool_calls"] == 1
+    
+    def test_orchestrator_routes_by_keyword(self):
+        """Test that the fake orchestrator names a specialist"""
+        assert FakeModel.route("I feel 4/10 today") == "MoodTrackerAgent"
+        assert FakeModel.route("show me my trends") == "PatternAnalyzerAgent"
+        assert FakeModel.route("work was a lot") == "SupportAgent"
+    
+    def test_latency_distributions_are_seeded(self):
+        """Test that latency draws are reproducible for a seed"""
+        import random
+        draw = parse_latency("lognormal:0.4,0.3")
+        first = [draw(random.Random(3)) for _ in range(3)]
+        second = [draw(random.Random(3)) for _ in range(3)]
+        assert first == second
+        assert parse_latency("fixed:0.2")(random.Random()) == 0.2
+        assert 0.1 <= parse_latency("uniform:0.1,0.3")(random.Random()) <= 0.3
+        with pytest.raises(ValueError):
+            parse_latency("gamma:1")
+
+
+class RecordingLlm(BaseLlm):
+    """Answers every request and records the contents it was sent"""
+    model: str = "recording"
+    requests: list = []
+    
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.requests.append(llm_request.contents)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="I hear you.")]))
+
+
+class TestSessionCompaction:
+    """Test suite for bounded session history"""
+    
+    @staticmethod
+    def make_registry(session_service, compactor):
+        sessions = LazyAgentSessions("TestApp", session_service, {
+            "SupportAgent": Agent(name="SupportAgent", model=RecordingLlm(requests=[]))
+        })
+        registry = AgentRegistry(compactor=compactor)
+        registry.register_all(sessions)
+        return registry, sessions
+    
+    @staticmethod
+    async def converse(registry, turns):
+        for i in range(turns):
+            message = types.Content(role="user", parts=[types.Part(text=f"message {i}")])
+            await registry.run("SupportAgent", "u1", message, state_delta={"turns": i + 1})
+            await registry.compact("SupportAgent", "u1")
+    
+    def test_history_is_bounded_by_event_count(self, tmp_path):
+        """Test that old turns are folded into one summary while state and recent turns survive"""
+        from google.adk.sessions.sqlite_session_service import SqliteSessionService
+        compactor = SessionCompactor(max_events=8, max_tokens=10_000, keep_recent=4)
+        registry, sessions = self.make_registry(
+            SqliteSessionService(db_path=str(tmp_path / "sessions.db")), compactor
+        )
+        
+        async def scenario():
+            await self.converse(registry, 12)
+            return await sessions.session_service.get_session(
+                app_name="TestApp", user_id="u1", session_id=session_id_for("u1", "SupportAgent")
+            )
+        
+        session = asyncio.run(scenario())
+        assert len(session.events) <= 9
+        summary = summary_of(session.events[0])
+        assert "User: message 7" in summary
+        assert session.events[-2].content.parts[0].text == "message 11"
+        assert session.state["turns"] == 12
+        assert compactor.compactions >= 2
+        
+        # The model sees the summary followed by the recent turns, not the full history
+        model = sessions.agents["SupportAgent"].model
+        assert len(model.requests[-1]) <= 9
+        assert "User: message 0" in model.requests[-1][0].parts[0].text
+    
+    def test_token_limit_and_archive(self, tmp_path):
+        """Test that the token estimate triggers compaction and folded events are archived"""
+        compactor = SessionCompactor(max_events=1000, max_tokens=10, keep_recent=2,
+                                     archive_dir=tmp_path / "archive")
+        registry, sessions = self.make_registry(InMemorySessionService(), compactor)
+        
+        asyncio.run(self.converse(registry, 5))
+        
+        archive = tmp_path / "archive" / f"{session_id_for('u1', 'SupportAgent')}.jsonl"
+        archived = archive.read_text().splitlines()
+        assert compactor.events_folded == len(archived) > 0
+        assert all("compaction" not in line for line in archived)
+    
+    def test_cancelled_turn_does_not_lose_history(self):
+        """Test that cancelling a turn while its session is being swapped still leaves the compacted session"""
+        class SlowSessionService(InMemorySessionService):
+            async def create_session(self, **kwargs):
+                await asyncio.sleep(0.05)
+                return await super().create_session(**kwargs)
+        
+        compactor = SessionCompactor(max_events=6, max_tokens=10_000, keep_recent=2)
+        registry, sessions = self.make_registry(SlowSessionService(), compactor)
+        registry.compactor = None
+        
+        async def scenario():
+            await self.converse(registry, 4)
+            session_id = await sessions.session_id("SupportAgent", "u1")
+            task = asyncio.create_task(compactor.maybe_compact(
+                sessions.session_service, "TestApp", "u1", session_id))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.1)
+            return await sessions.session_service.get_session(
+                app_name="TestApp", user_id="u1", session_id=session_id)
+        
+        session = asyncio.run(scenario())
+        assert session is not None
+        assert summary_of(session.events[0]) is not None
+        assert session.events[-2].content.parts[0].text == "message 3"
+    
+    def test_model_summaries_are_scheduled_guarded_and_metered(self, tmp_path):
+        """Test that the model summarizer waits for the scheduler, runs under the guard and charges the user"""
+        from agents.compaction import ModelSummarizer
+        from utils.database import DatabaseManager
+        from utils.usage_ledger import UsageLedger
+        
+        scheduler = ModelScheduler(6000, burst=5)
+        guard = ModelCallGuard(CallPolicy(deadline=5), readmit=scheduler.readmit)
+        ledger = UsageLedger(DatabaseManager(db_path=tmp_path / "usage.db"))
+        summarizer = ModelSummarizer(FakeModel(agent_name="SessionSummarizer"), scheduler=scheduler,
+                                     call_guard=guard, usage_ledger=ledger)
+        compactor = SessionCompactor(max_events=6, max_tokens=10_000, keep_recent=2, summarizer=summarizer)
+        registry, sessions = self.make_registry(InMemorySessionService(), compactor)
+        
+        asyncio.run(self.converse(registry, 5))
+        
+        assert compactor.compactions >= 1
+        assert guard.stats()["SessionSummarizer"]["calls"] == compactor.compactions
+        assert scheduler.stats()["patterns"]["granted"] == compactor.compactions
+        assert ledger.report("u1")["agents"]["SessionSummarizer"]["calls"] == compactor.compactions
+    
+    def test_cut_keeps_tool_calls_with_their_results(self):
+        """Test that the split point moves back to the start of a user turn"""
+        from google.adk.events import Event
+        
+        def event(author, **part):
+            return Event(author=author, content=types.Content(
+                role="user" if author == "user" else "model", parts=[types.Part(**part)]
+            ))
+        
+        events = [
+            event("user", text="hi"), event("SupportAgent", text="hello"),
+            event("user", text="log 4"),
+            event("SupportAgent", function_call=types.FunctionCall(name="log_mood", args={"mood_score": 4})),
+            event("SupportAgent", function_response=types.FunctionResponse(name="log_mood", response={"result": "ok"})),
+            event("SupportAgent", text="Logged."),
+        ]
+        compactor = SessionCompactor(keep_recent=2)
+        assert compactor.split_point(events) == 2
+        assert SessionCompactor(keep_recent=10).split_point(events) == 0
+        
+        summary = summarize_locally("Earlier: felt low", events[:2])
+        assert summary.splitlines() == ["Earlier: felt low", "User: hi", "SupportAgent: hello"]
+
+
+class TestStatelessRouting:
+    """Test suite for the stateless orchestrator mode"""
+    
+    def test_prompt_size_stays_constant(self):
+        """Test that each routing call sends only the new message and its state context"""
+        model = RecordingLlm(requests=[])
+        orchestrator = Agent(
+            name="OrchestratorAgent", model=model, include_contents='none',
+            instruction="Previous agent: {last_agent?}. Risk: {risk_level?}."
+        )
+        sessions = LazyAgentSessions("TestApp", CurrentTurnSessionService(), {"OrchestratorAgent": orchestrator})
+        registry = AgentRegistry()
+        registry.register_all(sessions)
+        instructions = []
+        
+        async def capture(callback_context, llm_request):
+            instructions.append(llm_request.config.system_instruction)
+        orchestrator.before_model_callback = capture
+        
+        async def scenario():
+            for i, agent in enumerate(["none", "MoodTrackerAgent", "SupportAgent"]):
+                message = types.Content(role="user", parts=[types.Part(text=f"message {i}")])
+                await registry.run("OrchestratorAgent", "u1", message,
+                                   state_delta={"last_agent": agent, "risk_level": "low"})
+            return await sessions.session_service.get_session(
+                app_name="TestApp", user_id="u1", session_id=session_id_for("u1", "OrchestratorAgent")
+            )
+        
+        session = asyncio.run(scenario())
+        assert [len(contents) for contents in model.requests] == [1, 1, 1]
+        assert model.requests[-1][0].parts[0].text == "message 2"
+        assert "Previous agent: SupportAgent. Risk: low." in instructions[-1]
+        # Only the latest turn is held in memory; state carries over
+        assert len(session.events) == 2
+        assert session.state["last_agent"] == "SupportAgent"
+
+
+class TestTurnPipeline:
+    """Test suite for the turn pipeline's crisis fast path"""
+    
+    def test_high_risk_message_skips_routing(self, tmp_path, monkeypatch):
+        """Test that a high-risk message shows resources at once and goes straight to the crisis agent"""
+        import io
+        from agents.pipeline import TurnPipeline
+        from tools.crisis_tools import check_crisis_tool
+        from ui.streaming import StreamingRenderer
+        from utils.crisis_catalog import crisis_catalog
+        from utils.crisis_screen import prescreen_message
+        from utils.database import DatabaseManager
+        from utils.risk_tracker import RiskTracker
+        from utils.tracing import tracer
+        
+        monkeypatch.setattr(tracer, "enabled", False)
+        orchestrator_model = RecordingLlm(requests=[])
+        crisis_agent = Agent(name="CrisisMonitorAgent", model="gemini-2.0-flash", tools=[check_crisis_tool])
+        use_fake_models([crisis_agent], latency="fixed:0")
+        orchestrator = LazyAgentSessions("TestApp", InMemorySessionService(), {
+            "OrchestratorAgent": Agent(name="OrchestratorAgent", model=orchestrator_model)
+        })
+        specialists = LazyAgentSessions("TestApp", InMemorySessionService(), {"CrisisMonitorAgent": crisis_agent})
+        registry = AgentRegistry()
+        registry.register_all(orchestrator)
+        registry.register_all(specialists)
+        # Routing is never reached on this path, so its tiers are left out
+        pipeline = TurnPipeline(registry, specialists, intent_router=None, routing_cache=None, routing_log=None,
+                                risk_tracker=RiskTracker(DatabaseManager(db_path=tmp_path / "test.db")),
+                                crisis_catalog=crisis_catalog, prescreen=prescreen_message)
+        shown = []
+        
+        result = asyncio.run(pipeline.handle(
+            "u1", "Honestly I'm a 1/10 and I want to end my life", "US",
+            renderer=lambda name, started: StreamingRenderer(name, started, out=io.StringIO()),
+            on_crisis_resources=shown.append
+        ))
+        
+        assert result.agent == "CrisisMonitorAgent"
+        assert result.routed_by == "crisis_screen"
+        assert shown == [result.crisis_resources] and "988" in shown[0]
+        assert result.text
+        assert orchestrator_model.requests == []
+    
+    def test_failed_routing_settles_the_speculative_run(self, tmp_path, monkeypatch):
+        """Test that an orchestrator failure stops the guessed specialist and still charges its tokens"""
+        import io
+        from agents.pipeline import TurnPipeline
+        from ui.streaming import StreamingRenderer
+        from utils.crisis_catalog import crisis_catalog
+        from utils.crisis_screen import prescreen_message
+        from utils.database import DatabaseManager
+        from utils.intent_router import IntentRouter, NaiveBayesIntentClassifier, RoutingLog
+        from utils.risk_tracker import RiskTracker
+        from utils.routing_cache import RoutingCache
+        from utils.tracing import tracer
+        from utils.usage_ledger import UsageLedger
+        
+        class FailingLlm(BaseLlm):
+            model: str = "failing"
+            
+            async def generate_content_async(self, llm_request, stream=False):
+                await asyncio.sleep(0.2)
+                raise ModelCallFailed("OrchestratorAgent", 3)
+                yield
+        
+        monkeypatch.setattr(tracer, "enabled", False)
+        db = DatabaseManager(db_path=tmp_path / "test.db")
+        ledger = UsageLedger(db)
+        support = Agent(name="SupportAgent", model="gemini-2.0-flash")
+        use_fake_models([support], latency="fixed:0")
+        orchestrator = LazyAgentSessions("TestApp", InMemorySessionService(), {
+            "OrchestratorAgent": Agent(name="OrchestratorAgent", model=FailingLlm())
+        })
+        specialists = LazyAgentSessions("TestApp", InMemorySessionService(), {"SupportAgent": support})
+        registry = AgentRegistry(usage_ledger=ledger)
+        registry.register_all(orchestrator)
+        registry.register_all(specialists)
+        speculator = Speculator(specialists, usage_ledger=ledger)
+        speculator.observe("SupportAgent")
+        runs = []
+        start = speculator.start
+        
+        def record_start(*args, **kwargs):
+            runs.append(start(*args, **kwargs))
+            return runs[-1]
+        monkeypatch.setattr(speculator, "start", record_start)
+        pipeline = TurnPipeline(registry, specialists,
+                                intent_router=IntentRouter(classifier=NaiveBayesIntentClassifier()),
+                                routing_cache=RoutingCache(path=tmp_path / "cache.json"),
+                                routing_log=RoutingLog(tmp_path / "routing.jsonl"),
+                                risk_tracker=RiskTracker(db), crisis_catalog=crisis_catalog,
+                                prescreen=prescreen_message, speculator=speculator, usage_ledger=ledger)
+        
+        async def scenario():
+            with pytest.raises(ModelCallFailed):
+                await pipeline.handle("u1", "hmm, not sure really", "US",
+                                      renderer=lambda name, started: StreamingRenderer(name, started, out=io.StringIO()))
+            await asyncio.sleep(0)
+            return runs[0]._task.done()
+        
+        assert asyncio.run(scenario())
+        assert speculator.stats()["misses"] == 1 and speculator.stats()["hits"] == 0
+        assert ledger.report("u1")["agents"]["SupportAgent"]["calls"] == 1
+
+
+class TestModelScheduler:
+    """Test suite for the rate-limited priority scheduler"""
+    
+    @staticmethod
+    async def grant_order(scheduler, requests):
+        """Queue (user, priority) requests behind an exhausted bucket; return them in grant order"""
+        await scheduler.acquire("warmup", "support")
+        order = []
+        
+        async def call(user_id, priority):
+            await scheduler.acquire(user_id, priority)
+            order.append((user_id, priority))
+        
+        await asyncio.gather(*[call(user_id, priority) for user_id, priority in requests])
+        return order
+    
+    def test_higher_priority_classes_go_first(self):
+        """Test that queued crisis calls are granted before mood, support and pattern calls"""
+        scheduler = ModelScheduler(requests_per_minute=6000, burst=1)
+        requests = [("u1", "patterns"), ("u2", "support"), ("u3", "mood"), ("u4", "crisis")]
+        
+        order = asyncio.run(self.grant_order(scheduler, requests))
+        assert [priority for _, priority in order] == ["crisis", "mood", "support", "patterns"]
+        assert scheduler.stats()["patterns"]["max_waiting"] == 1
+    
+    def test_users_are_served_round_robin_within_a_class(self):
+        """Test that one user's backlog does not hold back another user's call"""
+        scheduler = ModelScheduler(requests_per_minute=6000, burst=1)
+        requests = [("busy", "support")] * 3 + [("quiet", "support")]
+        
+        order = asyncio.run(self.grant_order(scheduler, requests))
+        assert [user_id for user_id, _ in order] == ["busy", "quiet", "busy", "busy"]
+    
+    def test_rate_limit_and_wait_metrics(self):
+        """Test that calls beyond the burst are spaced at the configured rate"""
+        import time
+        scheduler = ModelScheduler(requests_per_minute=1200, burst=2)
+        
+        async def scenario():
+            started = time.perf_counter()
+            await asyncio.gather(*[scheduler.acquire(f"u{i}", "mood") for i in range(6)])
+            return time.perf_counter() - started
+        
+        elapsed = asyncio.run(scenario())
+        # Two calls pass on the burst, the other four wait one 50ms token each
+        assert 0.18 <= elapsed < 0.5
+        stats = scheduler.stats()["mood"]
+        assert stats["granted"] == 6 and stats["waiting"] == 0
+        assert stats["max_waiting"] == 4
+        assert stats["p99_wait"] >= 0.15
+    
+    def test_cancelled_waiter_is_skipped(self):
+        """Test that a cancelled call gives its place to the next one"""
+        scheduler = ModelScheduler(requests_per_minute=600, burst=1)
+        
+        async def scenario():
+            await scheduler.acquire("warmup", "support")
+            doomed = asyncio.create_task(scheduler.acquire("u1", "crisis"))
+            waiting = asyncio.create_task(scheduler.acquire("u2", "patterns"))
+            await asyncio.sleep(0)
+            doomed.cancel()
+            await waiting
+            return doomed
+        
+        doomed = asyncio.run(scenario())
+        assert doomed.cancelled()
+        stats = scheduler.stats()
+        assert stats["crisis"]["cancelled"] == 1 and stats["crisis"]["granted"] == 0
+        assert stats["patterns"]["granted"] == 1
+    
+    def test_elevated_risk_escalates_to_crisis(self):
+        """Test that any agent's calls in an at-risk conversation are crisis traffic"""
+        assert ModelScheduler.priority_for("PatternAnalyzerAgent") == "patterns"
+        assert ModelScheduler.priority_for("PatternAnalyzerAgent", "low") == "patterns"
+        assert ModelScheduler.priority_for("SupportAgent", "moderate") == "crisis"
+        assert ModelScheduler.priority_for("OrchestratorAgent", "high") == "crisis"
+    
+    def test_gates_every_model_call_of_a_fake_agent(self):
+        """Test that the callback admits both model calls of a tool-using turn"""
+        scheduler = ModelScheduler(requests_per_minute=6000, burst=5)
+        
+        def analyze_mood_patterns(days: int = 7) -> str:
+            """Analyzes mood patterns."""
+            return "Your mood has been steady."
+        
+        agent = Agent(name="PatternAnalyzerAgent", model="gemini-2.0-flash",
+                      tools=[FunctionTool(analyze_mood_patterns)],
+                      before_model_callback=scheduler.admit_model_call)
+        use_fake_models([agent], seed=1)
+        registry = AgentRegistry()
+        registry.register_all(LazyAgentSessions("TestApp", InMemorySessionService(), {agent.name: agent}))
+        message = types.Content(role="user", parts=[types.Part(text="how have I been?")])
+        
+        reply = asyncio.run(registry.run(agent.name, "u1", message, state_delta={"risk_level": "low"}))
+        assert "steady" in reply
+        assert scheduler.stats()["patterns"]["granted"] == 2
+
+
+class DelayedLlm(ToolCallingLlm):
+    """ToolCallingLlm whose n-th request takes delays[n] seconds (the last delay repeats)"""
+    model: str = "delayed"
+    delays: list = []
+    error: Any = None
+    requests: int = 0
+    
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        delay = self.delays[min(self.requests, len(self.delays) - 1)]
+        self.requests += 1
+        await asyncio.sleep(delay)
+        if self.error is not None:
+            raise self.error
+        async for response in super().generate_content_async(llm_request, stream):
+            yield response
+
+
+class TestResilientLlm:
+    """Test suite for model-call deadlines, retries and hedging"""
+    
+    @staticmethod
+    def request(text="hello"):
+        return LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text=text)])])
+    
+    @staticmethod
+    def collect(llm, request):
+        async def scenario():
+            return [response async for response in llm.generate_content_async(request)]
+        return asyncio.run(scenario())
+    
+    def test_timed_out_attempt_is_retried(self):
+        """Test that an attempt past its deadline is abandoned and retried with a fresh one"""
+        readmits = []
+        
+        async def readmit():
+            readmits.append(1)
+        
+        inner = DelayedLlm(delays=[1.0, 0.0])
+        llm = ResilientLlm(inner=inner, agent_name="SupportAgent", readmit=readmit,
+                           policy=CallPolicy(deadline=0.1, retries=2, backoff=0.01))
+        
+        responses = self.collect(llm, self.request())
+        assert responses[0].content.parts[0].function_call.name == "save_note"
+        stats = llm.metrics.summary()
+        assert stats["timeouts"] == 1 and stats["retries"] == 1 and stats["failures"] == 0
+        assert stats["p50"] < 0.5
+        # The retry took another token from the rate limiter
+        assert readmits == [1]
+    
+    def test_gives_up_after_every_attempt_times_out(self):
+        """Test that a call failing on every attempt raises ModelCallFailed"""
+        llm = ResilientLlm(inner=DelayedLlm(delays=[1.0]), agent_name="SupportAgent",
+                           policy=CallPolicy(deadline=0.05, retries=1, backoff=0.01))
+        
+        with pytest.raises(ModelCallFailed) as failure:
+            self.collect(llm, self.request())
+        assert failure.value.attempts == 2
+        assert llm.metrics.summary()["failures"] == 1
+    
+    def test_stream_stalling_after_first_response_fails(self):
+        """Test that a stream going quiet past the deadline mid-reply fails the call instead of hanging"""
+        class StallingLlm(BaseLlm):
+            model: str = "stalling"
+            
+            async def generate_content_async(self, llm_request, stream=False):
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Let me")]),
+                                  partial=True)
+                await asyncio.sleep(1.0)
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Let me think.")]))
+        
+        llm = ResilientLlm(inner=StallingLlm(), agent_name="SupportAgent",
+                           policy=CallPolicy(deadline=0.05, retries=2, backoff=0.01))
+        
+        with pytest.raises(ModelCallFailed) as failure:
+            self.collect(llm, self.request())
+        assert failure.value.attempts == 1
+        stats = llm.metrics.summary()
+        assert stats["timeouts"] == 1 and stats["retries"] == 0
+    
+    def test_transient_errors_are_retried_and_others_are_not(self):
+        """Test that only throttling and server errors are retried"""
+        class StatusError(Exception):
+            def __init__(self, code):
+                super().__init__(f"status {code}")
+                self.code = code
+        
+        throttled = ResilientLlm(inner=DelayedLlm(delays=[0.0], error=StatusError(429)), agent_name="SupportAgent",
+                                 policy=CallPolicy(retries=2, backoff=0.01))
+        with pytest.raises(ModelCallFailed):
+            self.collect(throttled, self.request())
+        assert throttled.inner.requests == 3
+        
+        invalid = ResilientLlm(inner=DelayedLlm(delays=[0.0], error=StatusError(400)), agent_name="SupportAgent",
+                               policy=CallPolicy(retries=2, backoff=0.01))
+        with pytest.raises(StatusError):
+            self.collect(invalid, self.request())
+        assert invalid.inner.requests == 1
+    
+    def test_hedge_wins_without_repeating_tool_side_effects(self):
+        """Test that a slow call is hedged, the hedge's answer is used, and the tool runs once"""
+        writes = []
+        
+        def save_note(note: str) -> str:
+            """Saves a note."""
+            run_side_effect(lambda: writes.append(note))
+            return "ok"
+        
+        # The first request stalls; the hedge and every later request answer at once
+        inner = DelayedLlm(delays=[5.0, 0.0])
+        guard = ModelCallGuard(CallPolicy(deadline=10, hedge=True, hedge_min_samples=20))
+        agent = guard.wrap(Agent(name="MoodTrackerAgent", model=inner, tools=[FunctionTool(save_note)]))
+        metrics = guard.metrics["MoodTrackerAgent"]
+        metrics.attempt_latencies.extend([0.05] * 20)
+        registry = AgentRegistry()
+        registry.register_all(LazyAgentSessions("TestApp", InMemorySessionService(), {agent.name: agent}))
+        message = types.Content(role="user", parts=[types.Part(text="felt calm")])
+        
+        async def scenario():
+            started = asyncio.get_running_loop().time()
+            reply = await registry.run(agent.name, "u1", message)
+            return reply, asyncio.get_running_loop().time() - started
+        
+        reply, elapsed = asyncio.run(scenario())
+        assert reply == "Saved."
+        assert elapsed < 1.0
+        assert writes == ["felt calm"]
+        stats = guard.stats()["MoodTrackerAgent"]
+        assert stats["calls"] == 2
+        assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+        # Two model calls plus the one hedged duplicate
+        assert inner.requests == 3
+    
+    def test_hedging_waits_for_enough_samples(self):
+        """Test that no duplicate is sent before the agent's latency percentile is known"""
+        llm = ResilientLlm(inner=DelayedLlm(delays=[0.05]), agent_name="SupportAgent",
+                           policy=CallPolicy(hedge=True, hedge_min_samples=5))
+        for _ in range(5):
+            self.collect(llm, self.request())
+        assert llm.metrics.hedges == 0 and llm.inner.requests == 5
+        assert llm.metrics.hedge_delay(llm.policy) is not None
+    
+    def test_guard_applies_per_agent_deadlines_once(self):
+        """Test that wrapping uses the agent's deadline override and is idempotent"""
+        guard = ModelCallGuard(CallPolicy(deadline=30), deadlines={"OrchestratorAgent": 5})
+        orchestrator = guard.wrap(Agent(name="OrchestratorAgent", model=DelayedLlm(delays=[0.0])))
+        support = guard.wrap(Agent(name="SupportAgent", model=DelayedLlm(delays=[0.0])))
+        wrapped = orchestrator.model
+        
+        assert guard.wrap(orchestrator).model is wrapped
+        assert wrapped.policy.deadline == 5 and support.model.policy.deadline == 30
+        assert isinstance(wrapped.inner, DelayedLlm)
+        assert set(guard.stats()) == {"OrchestratorAgent", "SupportAgent"}
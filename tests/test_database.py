@@ -5,7 +5,7 @@ import pytest
 from pathlib import Path
 import tempfile
 import os
-from src.utils.database import DatabaseManager
+from utils.database import DatabaseManager
 
 
 @pytest.fixture
@@ -99,4 +99,90 @@ class TestDatabase:
         db.create_user(user_id, "Test User")
         
         history = db.get_mood_history(user_id)
-        assert len(history) == 0
\ No newline at end of file
+        assert len(history) == 0
+
+class TestStrategyCorpus:
+    """Test suite for bulk strategy loading and retrieval index"""
+    
+    def test_upsert_strategies_and_search(self, db):
+        """Test that upserted strategies are found through the term index"""
+        count = db.upsert_strategies([
+            {
+                "strategy_id": "s1",
+                "name": "Box Breathing",
+                "category": "anxiety",
+                "description": "Calms you when anxious",
+                "steps": ["Breathe in", "Hold", "Breathe out"]
+            },
+            {
+                "strategy_id": "s2",
+                "name": "Walk",
+                "category": "general",
+                "description": "A short walk",
+                "steps": ["Walk"]
+            }
+        ])
+        assert count == 2
+        
+        results = db.search_strategies("anxious")
+        assert [s["strategy_id"] for s in results] == ["s1"]
+        assert results[0]["steps"] == ["Breathe in", "Hold", "Breathe out"]
+        assert len(db.get_strategies_by_category("General")) == 1
+    
+    def test_upsert_updates_existing_strategy(self, db):
+        """Test that re-loading a strategy replaces its content and index terms"""
+        strategy = {
+            "strategy_id": "s1",
+            "name": "Journaling",
+            "category": "sadness",
+            "description": "Write when sad",
+            "steps": ["Write"]
+        }
+        db.upsert_strategies([strategy])
+        db.upsert_strategies([{**strategy, "description": "Write when angry"}])
+        
+        assert len(db.get_all_strategies()) == 1
+        assert db.search_strategies("sad") == []
+        assert db.search_strategies("angry")[0]["description"] == "Write when angry"
+    
+    def test_load_strategy_corpus(self, db):
+        """Test loading the bundled JSONL corpus"""
+        from utils.strategy_loader import load_strategy_corpus
+        
+        corpus = Path(__file__).parent.parent / "data" / "coping_strategies.jsonl"
+        stats = load_strategy_corpus(str(corpus), db=db)
+        
+        assert stats["count"] == len(db.get_all_strategies())
+        assert stats["rows_per_second"] > 0
+        
+        # Loading again is idempotent
+        load_strategy_corpus(str(corpus), db=db)
+        assert stats["count"] == len(db.get_all_strategies())
+    
+    def test_corpus_rejects_invalid_intensity(self, tmp_path):
+        """Test that a malformed intensity range is reported with its record number"""
+        import json
+        from utils.strategy_loader import read_corpus
+        
+        base = {"name": "Box breathing", "category": "anxiety", "description": "Slow breathing", "steps": ["Breathe"]}
+        for intensity in (5, [3], [1, 2, 3], ["low", "high"]):
+            corpus = tmp_path / "corpus.jsonl"
+            corpus.write_text(json.dumps(base) + "\n" + json.dumps({**base, "intensity": intensity}) + "\n")
+            with pytest.raises(ValueError, match=r"Strategy #2 has an invalid intensity"):
+                read_corpus(str(corpus))
+        
+        corpus.write_text(json.dumps({**base, "intensity": [2, 6]}) + "\n")
+        assert read_corpus(str(corpus))[0]["max_intensity"] == 6
+    
+    def test_mood_data_version_changes_with_new_entries(self, db):
+        """Test that the data version tracks each user's mood entries"""
+        db.create_user("user_a", "A")
+        before = db.get_mood_data_version("user_a")
+        assert db.get_mood_data_version("user_a") == before
+        
+        db.add_mood_entry("entry_1", "user_b", 6, ["calm"], [], "")
+        assert db.get_mood_data_version("user_a") == before
+        assert db.get_mood_data_version("user_a", "user_b") != before
+        
+        db.add_mood_entry("entry_2", "user_a", 4, ["tired"], [], "")
+        assert db.get_mood_data_version("user_a") != before
@@ -10,17 +10,105 @@ class TestBasicIntegration:
     def test_imports(self):
         """Test that all main modules can be imported"""
         try:
-            from src.utils.database import DatabaseManager
-            from src.utils.profile_manager import ProfileManager
-            from src.utils.data_export import DataExporter
+            from utils.database import DatabaseManager
+            from utils.profile_manager import ProfileManager
+            from utils.data_export import DataExporter
             assert True
         except ImportError as e:
             pytest.fail(f"Import failed: {e}")
     
+    def test_entry_point_defers_adk_imports(self):
+        """Test that importing main loads neither ADK nor the agents and needs no API key"""
+        import os
+        import subprocess
+        import sys
+        from pathlib import Path
+        
+        root = Path(__file__).resolve().parent.parent
+        env = {key: value for key, value in os.environ.items() if key != "GEMINI_API_KEY"}
+        code = (f"import sys; sys.path[:0] = [{str(root)!r}, {str(root / 'src')!r}]; import main; "
+                "print(sorted(m for m in sys.modules if m.startswith(('google', 'agents.', 'tools.'))))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "[]"
+    
+    def test_application_loads_one_copy_of_each_module(self):
+        """Test that the pipeline, agents and tools import nothing under the src. prefix"""
+        import os
+        import subprocess
+        import sys
+        import tempfile
+        from pathlib import Path
+        
+        root = Path(__file__).resolve().parent.parent
+        temp_dir = tempfile.mkdtemp()
+        env = dict(os.environ, MODEL_BACKEND="fake", GEMINI_API_KEY="x",
+                   DATABASE_PATH=str(Path(temp_dir) / "test.db"),
+                   SESSION_DATABASE_PATH=str(Path(temp_dir) / "sessions.db"))
+        code = (f"import sys; sys.path[:0] = [{str(root)!r}, {str(root / 'src')!r}]; import main; "
+                "from utils.database import DatabaseManager; import ui.batch; "
+                "main.build_pipeline(DatabaseManager()); "
+                "[main.agent_loader(name)() for name in main.AGENT_MODULES]; "
+                "print(sorted(m for m in sys.modules if m == 'src' or m.startswith('src.')))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+    
+    def test_headless_users_keep_their_mood_data_apart(self):
+        """Test that one user's check-in is logged for them and never shows up in another's patterns"""
+        import json
+        import os
+        import subprocess
+        import sys
+        import tempfile
+        from pathlib import Path
+        
+        root = Path(__file__).resolve().parent.parent
+        temp_dir = Path(tempfile.mkdtemp())
+        env = dict(os.environ, MODEL_BACKEND="fake", FAKE_MODEL_LATENCY="fixed:0", GEMINI_API_KEY="x",
+                   DATABASE_PATH=str(temp_dir / "test.db"), SESSION_DATABASE_PATH=str(temp_dir / "sessions.db"),
+                   ROUTING_LOG_PATH=str(temp_dir / "routing_log.jsonl"),
+                   ROUTING_CACHE_PATH=str(temp_dir / "routing_cache.json"),
+                   TRACE_FILE=str(temp_dir / "traces.jsonl"))
+        code = f"""
+import asyncio, json, sys
+sys.path[:0] = [{str(root)!r}, {str(root / 'src')!r}]
+import main
+from utils.database import DatabaseManager
+from utils.profile_manager import ProfileManager
+
+async def turns():
+    db = DatabaseManager()
+    handle_turn = main.headless_turn_handler(db, ProfileManager({str(temp_dir / 'profiles')!r}),
+                                             main.build_pipeline(db))
+    replies = {{}}
+    for user_id, message in [("bob", "patterns"), ("alice", "mood"), ("bob", "patterns"), ("alice", "patterns")]:
+        result = await handle_turn(user_id, message)
+        replies.setdefault(user_id, []).append((result.agent, result.text))
+    entries = {{user_id: len(db.get_mood_history(user_id)) for user_id in ("alice", "bob", "default_user")}}
+    print(json.dumps({{"replies": replies, "entries": entries}}))
+
+asyncio.run(turns())
+"""
+        result = subprocess.run([sys.executable, "-c", code], cwd=root, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        outcome = json.loads(result.stdout.strip().splitlines()[-1])
+        
+        assert outcome["entries"] == {"alice": 1, "bob": 0, "default_user": 0}
+        assert outcome["replies"]["alice"][0][0] == "MoodTrackerAgent"
+        # Bob's second look at his patterns is not served alice's entry, from the tool or the response cache
+        for agent, text in outcome["replies"]["bob"]:
+            assert agent == "PatternAnalyzerAgent"
+            assert "No mood data found" in text
+        assert "Total check-ins: 1" in outcome["replies"]["alice"][1][1]
+    
     def test_database_and_profile_integration(self):
         """Test database and profile manager work together"""
-        from src.utils.database import DatabaseManager
-        from src.utils.profile_manager import ProfileManager
+        from utils.database import DatabaseManager
+        from utils.profile_manager import ProfileManager
         import tempfile
         from pathlib import Path
         
@@ -62,7 +150,7 @@ class TestWorkflows:
     
     def test_mood_tracking_workflow(self):
         """Test complete mood tracking workflow"""
-        from src.utils.database import DatabaseManager
+        from utils.database import DatabaseManager
         import tempfile
         from pathlib import Path
         
@@ -96,7 +184,7 @@ class TestWorkflows:
     
     def test_profile_workflow(self):
         """Test profile management workflow"""
-        from src.utils.profile_manager import ProfileManager
+        from utils.profile_manager import ProfileManager
         import tempfile
         
         # Setup
@@ -0,0 +1,211 @@
+"""
+Tests for local routing
+"""
+import os
+import tempfile
+from pathlib import Path
+from utils.intent_router import IntentRouter, NaiveBayesIntentClassifier, RoutingLog
+
+
+TRAINING_EXAMPLES = [
+    ("I feel good today", "MoodTrackerAgent"),
+    ("feeling pretty low today", "MoodTrackerAgent"),
+    ("today was a 6", "MoodTrackerAgent"),
+    ("I feel anxious about my exam", "SupportAgent"),
+    ("what can I do about stress at work", "SupportAgent"),
+    ("how do I deal with anger", "SupportAgent"),
+    ("have I been improving lately", "PatternAnalyzerAgent"),
+    ("compare this week to last week", "PatternAnalyzerAgent"),
+] * 3
+
+
+class TestIntentRouter:
+    """Test suite for the rules-plus-classifier router"""
+    
+    def test_command_shortcuts(self):
+        """Test that menu shortcuts route without a model call"""
+        router = IntentRouter(classifier=NaiveBayesIntentClassifier())
+        
+        assert router.route("mood").agent == "MoodTrackerAgent"
+        assert router.route(" Patterns ").agent == "PatternAnalyzerAgent"
+        assert router.route("support").source == "command"
+        assert router.route("help").agent is None
+    
+    def test_rules(self):
+        """Test high-confidence phrasings"""
+        router = IntentRouter(classifier=NaiveBayesIntentClassifier())
+        
+        assert router.route("I want to log my mood").agent == "MoodTrackerAgent"
+        assert router.route("How have I been this month?").agent == "PatternAnalyzerAgent"
+        assert router.route("any coping strategies for panic?").agent == "SupportAgent"
+        assert router.route("hello there").agent is None
+    
+    def test_classifier_routes_confident_inputs(self):
+        """Test that a trained classifier resolves inputs the rules miss"""
+        classifier = NaiveBayesIntentClassifier().train(TRAINING_EXAMPLES)
+        router = IntentRouter(classifier=classifier, confidence_threshold=0.8)
+        
+        decision = router.route("how do I deal with stress")
+        assert decision.agent == "SupportAgent"
+        assert decision.source == "classifier"
+        assert router.route("hi").agent is None
+    
+    def test_untrained_classifier_falls_back(self):
+        """Test that a classifier with too little data is not trusted"""
+        classifier = NaiveBayesIntentClassifier().train(TRAINING_EXAMPLES[:5])
+        router = IntentRouter(classifier=classifier, confidence_threshold=0.0)
+        
+        assert router.route("how do I deal with stress").source == "fallback"
+    
+    def test_routing_log_round_trip(self):
+        """Test logging decisions and training a saved model from them"""
+        temp_dir = tempfile.mkdtemp()
+        log = RoutingLog(Path(temp_dir) / "routing.jsonl", enabled=True)
+        for text, agent in TRAINING_EXAMPLES:
+            log.record(text, agent)
+        log.record("hi", "Hello! I can help you log your mood.")
+        
+        assert len(log.examples()) == len(TRAINING_EXAMPLES)
+        
+        model_path = Path(temp_dir) / "model.json"
+        NaiveBayesIntentClassifier().train(log.examples()).save(model_path)
+        loaded = NaiveBayesIntentClassifier.load(model_path)
+        assert loaded.predict("feeling low today")[0] == "MoodTrackerAgent"
+        
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
+
+    
+    def test_routing_log_is_off_by_default(self):
+        """Test that user messages are not written to the routing log unless it is enabled"""
+        temp_dir = tempfile.mkdtemp()
+        log = RoutingLog(Path(temp_dir) / "routing.jsonl")
+        log.record("I can't stop worrying about my sister", "SupportAgent")
+        
+        assert not log.path.exists()
+        assert log.examples() == []
+        os.rmdir(temp_dir)
+
+
+class TestRoutingCache:
+    """Test suite for the LRU routing-decision cache"""
+    
+    def test_normalized_hits_and_counters(self):
+        """Test that case, punctuation and whitespace variants share an entry"""
+        from utils.routing_cache import RoutingCache
+        
+        cache = RoutingCache(capacity=10, ttl_seconds=60, fuzzy_threshold=0, path=Path("unused.json"))
+        cache.put("I want to log my mood!", "MoodTrackerAgent")
+        
+        assert cache.get("i want  to LOG my mood") == "MoodTrackerAgent"
+        assert cache.get("something else") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+    
+    def test_lru_eviction_and_ttl(self):
+        """Test capacity-based eviction and expiry"""
+        from utils.routing_cache import RoutingCache
+        
+        cache = RoutingCache(capacity=2, ttl_seconds=60, fuzzy_threshold=0, path=Path("unused.json"))
+        cache.put("a", "MoodTrackerAgent")
+        cache.put("b", "SupportAgent")
+        cache.get("a")
+        cache.put("c", "SupportAgent")
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == "MoodTrackerAgent"
+        assert cache.stats()["evictions"] == 1
+        
+        expired = RoutingCache(capacity=2, ttl_seconds=-1, fuzzy_threshold=0, path=Path("unused.json"))
+        expired.put("a", "MoodTrackerAgent")
+        assert expired.get("a") is None
+    
+    def test_fuzzy_hits(self):
+        """Test that near-identical phrasings are served from the cache"""
+        from utils.routing_cache import RoutingCache
+        
+        cache = RoutingCache(capacity=10, ttl_seconds=60, fuzzy_threshold=0.6, path=Path("unused.json"))
+        cache.put("how have I been doing lately", "PatternAnalyzerAgent")
+        
+        assert cache.get("how have I been doing lately?!") == "PatternAnalyzerAgent"
+        assert cache.get("how have i been doing lately then") == "PatternAnalyzerAgent"
+        assert cache.stats()["fuzzy_hits"] == 1
+        assert cache.get("tell me a joke") is None
+    
+    def test_persistence(self):
+        """Test that entries and counters survive a restart"""
+        from utils.routing_cache import RoutingCache
+        
+        temp_dir = tempfile.mkdtemp()
+        path = Path(temp_dir) / "cache.json"
+        cache = RoutingCache(capacity=10, ttl_seconds=60, fuzzy_threshold=0, path=path, persist=True)
+        cache.put("show me my trends", "PatternAnalyzerAgent")
+        cache.get("show me my trends")
+        assert cache.save()
+        
+        restored = RoutingCache(capacity=10, ttl_seconds=60, fuzzy_threshold=0, path=path, persist=True).load()
+        assert restored.get("show me my trends") == "PatternAnalyzerAgent"
+        assert restored.stats()["hits"] == 2
+        
+        os.remove(path)
+        os.rmdir(temp_dir)
+    
+    def test_not_saved_by_default(self):
+        """Test that cached user messages stay in memory unless persistence is enabled"""
+        from utils.routing_cache import RoutingCache
+        
+        temp_dir = tempfile.mkdtemp()
+        path = Path(temp_dir) / "cache.json"
+        cache = RoutingCache(capacity=10, ttl_seconds=60, fuzzy_threshold=0, path=path)
+        cache.put("my brother keeps shouting at me", "SupportAgent")
+        
+        assert not cache.save()
+        assert not path.exists()
+        os.rmdir(temp_dir)
+
+
+class TestResponseCache:
+    """Test suite for the data-versioned response cache"""
+    
+    @staticmethod
+    def make_cache(versions, **kwargs):
+        from utils.response_cache import ResponseCache
+        return ResponseCache(lambda user_id: versions[user_id], agents=["PatternAnalyzerAgent"], **kwargs)
+    
+    def test_replays_answer_while_data_is_unchanged(self):
+        """Test hits for the same question and misses once new data arrives"""
+        versions = {"u1": "3:a", "u2": "3:a"}
+        cache = self.make_cache(versions)
+        
+        key, cached = cache.lookup("u1", "PatternAnalyzerAgent", "Show me my mood patterns")
+        assert cached is None
+        cache.put(key, "Your mood has been stable.")
+        
+        assert cache.lookup("u1", "PatternAnalyzerAgent", "show me my mood patterns!")[1] == "Your mood has been stable."
+        assert cache.lookup("u2", "PatternAnalyzerAgent", "show me my mood patterns")[1] is None
+        
+        versions["u1"] = "4:b"
+        key, cached = cache.lookup("u1", "PatternAnalyzerAgent", "show me my mood patterns")
+        assert cached is None
+        cache.put(key, "Your mood is improving.")
+        # The answer for the old version is dropped rather than left to age out
+        assert cache.stats()["size"] == 1
+        assert cache.stats()["hits"] == 1
+    
+    def test_opt_out_ttl_and_uncached_agents(self):
+        """Test that opt-out phrases bypass the cache, entries expire and other agents are never cached"""
+        versions = {"u1": "1:a"}
+        cache = self.make_cache(versions)
+        key, _ = cache.lookup("u1", "PatternAnalyzerAgent", "show me my patterns")
+        cache.put(key, "Old narration.")
+        
+        key, cached = cache.lookup("u1", "PatternAnalyzerAgent", "show me my patterns again")
+        assert cached is None and key is not None
+        assert cache.stats()["bypassed"] == 1
+        assert cache.lookup("u1", "SupportAgent", "show me my patterns") == (None, None)
+        
+        expired = self.make_cache(versions, ttl_seconds=-1)
+        key, _ = expired.lookup("u1", "PatternAnalyzerAgent", "show me my patterns")
+        expired.put(key, "Narration.")
+        assert expired.lookup("u1", "PatternAnalyzerAgent", "show me my patterns")[1] is None
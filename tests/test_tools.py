@@ -4,7 +4,13 @@ Tests for tool functions
 from pathlib import Path
 import tempfile
 import os
-from src.utils.database import DatabaseManager
+from types import SimpleNamespace
+from utils.database import DatabaseManager
+
+
+def context_for(user_id: str, **state):
+    """Stand-in for the ToolContext ADK injects into a tool call"""
+    return SimpleNamespace(user_id=user_id, state=state)
 
 
 class TestMoodTools:
@@ -12,7 +18,7 @@ class TestMoodTools:
     
     def test_log_mood_valid_score(self):
         """Test logging mood with valid score"""
-        from src.tools.mood_tools import log_mood
+        from tools.mood_tools import log_mood
         
         # Create temporary database
         temp_dir = tempfile.mkdtemp()
@@ -23,13 +29,13 @@ class TestMoodTools:
         db.create_user("test_user", "Test User")
         
         # Test valid mood scores
-        result = log_mood(mood_score=5, emotions=["happy"], notes="Good day", user_id="test_user")
+        result = log_mood(mood_score=5, emotions=["happy"], notes="Good day", tool_context=context_for("test_user"))
         assert "Successfully logged" in result
         
-        result = log_mood(mood_score=1, emotions=["sad"], notes="Bad day", user_id="test_user")
+        result = log_mood(mood_score=1, emotions=["sad"], notes="Bad day", tool_context=context_for("test_user"))
         assert "Successfully logged" in result
         
-        result = log_mood(mood_score=10, emotions=["excited"], notes="Great day", user_id="test_user")
+        result = log_mood(mood_score=10, emotions=["excited"], notes="Great day", tool_context=context_for("test_user"))
         assert "Successfully logged" in result
         
         # Cleanup
@@ -39,7 +45,7 @@ class TestMoodTools:
     
     def test_log_mood_invalid_score(self):
         """Test logging mood with invalid score (should fail due to database constraint)"""
-        from src.tools.mood_tools import log_mood
+        from tools.mood_tools import log_mood
         
         # Create temporary database
         temp_dir = tempfile.mkdtemp()
@@ -50,13 +56,13 @@ class TestMoodTools:
         db.create_user("test_user", "Test User")
         
         # Test invalid mood scores (should fail)
-        result = log_mood(mood_score=0, emotions=["sad"], notes="Invalid", user_id="test_user")
+        result = log_mood(mood_score=0, emotions=["sad"], notes="Invalid", tool_context=context_for("test_user"))
         assert "Failed" in result or "error" in result.lower()
         
-        result = log_mood(mood_score=11, emotions=["happy"], notes="Invalid", user_id="test_user")
+        result = log_mood(mood_score=11, emotions=["happy"], notes="Invalid", tool_context=context_for("test_user"))
         assert "Failed" in result or "error" in result.lower()
         
-        result = log_mood(mood_score=-5, emotions=["angry"], notes="Invalid", user_id="test_user")
+        result = log_mood(mood_score=-5, emotions=["angry"], notes="Invalid", tool_context=context_for("test_user"))
         assert "Failed" in result or "error" in result.lower()
         
         # Cleanup
@@ -66,7 +72,7 @@ class TestMoodTools:
     
     def test_emotions_list_handling(self):
         """Test emotions list handling in log_mood"""
-        from src.tools.mood_tools import log_mood
+        from tools.mood_tools import log_mood
         
         # Create temporary database
         temp_dir = tempfile.mkdtemp()
@@ -78,7 +84,7 @@ class TestMoodTools:
         
         # Test with multiple emotions
         emotions = ["happy", "calm", "excited"]
-        result = log_mood(mood_score=8, emotions=emotions, notes="Multiple emotions", user_id="test_user")
+        result = log_mood(mood_score=8, emotions=emotions, notes="Multiple emotions", tool_context=context_for("test_user"))
         assert "Successfully logged" in result
         
         # Verify the function accepted the emotions list
@@ -93,12 +99,40 @@ class TestMoodTools:
         os.rmdir(temp_dir)
 
 
+    def test_log_mood_and_screen_stores_crisis_level(self):
+        """Test that the fused tool logs the entry and returns its crisis screen"""
+        import uuid
+        from tools.mood_tools import log_mood_and_screen
+        
+        user_id = f"screen_{uuid.uuid4().hex[:8]}"
+        low = log_mood_and_screen(mood_score=3, emotions=["sad"], notes="Rough week", tool_context=context_for(user_id))
+        assert low["logged"] is True
+        assert low["crisis_level"] == "moderate"
+        assert "988" in low["resources"]
+        
+        fine = log_mood_and_screen(mood_score=8, emotions=["calm"], notes="Good day", tool_context=context_for(user_id))
+        assert fine["crisis_level"] == "none" and fine["resources"] == ""
+        
+        stored = {entry["mood_score"]: entry["crisis_level"] for entry in DatabaseManager().get_mood_history(user_id)}
+        assert stored == {3: "moderate", 8: "none"}
+    
+    def test_log_mood_and_screen_screens_when_write_fails(self):
+        """Test that a failed write still reports the crisis level"""
+        from tools.mood_tools import log_mood_and_screen
+        
+        result = log_mood_and_screen(mood_score=0, emotions=["hopeless"], notes="", tool_context=context_for("test_user"))
+        assert result["logged"] is False
+        assert "Failed" in result["message"]
+        assert result["crisis_level"] == "high"
+        assert "IMMEDIATE SUPPORT NEEDED" in result["resources"]
+
+
 class TestCrisisTools:
     """Test suite for crisis detection tools"""
     
     def test_crisis_detection_high_risk(self):
         """Test crisis detection with high-risk indicators"""
-        from src.tools.crisis_tools import check_crisis_indicators
+        from tools.crisis_tools import check_crisis_indicators
         
         # Test with very low mood score
         result = check_crisis_indicators(
@@ -113,7 +147,7 @@ class TestCrisisTools:
     
     def test_crisis_detection_moderate_risk(self):
         """Test crisis detection with moderate-risk indicators"""
-        from src.tools.crisis_tools import check_crisis_indicators
+        from tools.crisis_tools import check_crisis_indicators
         
         # Test with low mood score
         result = check_crisis_indicators(
@@ -127,7 +161,7 @@ class TestCrisisTools:
     
     def test_crisis_detection_no_risk(self):
         """Test crisis detection with no risk indicators"""
-        from src.tools.crisis_tools import check_crisis_indicators
+        from tools.crisis_tools import check_crisis_indicators
         
         # Test with good mood score
         result = check_crisis_indicators(
@@ -140,7 +174,7 @@ class TestCrisisTools:
     
     def test_crisis_detection_with_keywords(self):
         """Test crisis detection with crisis keywords in notes"""
-        from src.tools.crisis_tools import check_crisis_indicators
+        from tools.crisis_tools import check_crisis_indicators
         
         # Test with crisis keywords
         result = check_crisis_indicators(
@@ -154,7 +188,7 @@ class TestCrisisTools:
     
     def test_crisis_detection_with_emotions(self):
         """Test crisis detection with crisis emotions"""
-        from src.tools.crisis_tools import check_crisis_indicators
+        from tools.crisis_tools import check_crisis_indicators
         
         # Test with crisis emotions
         result = check_crisis_indicators(
@@ -188,4 +222,200 @@ class TestPatternTools:
         notes = "Feeling stressed because of work deadline"
         triggers = ["work", "deadline"]
         
-        assert any(trigger in notes.lower() for trigger in triggers)
\ No newline at end of file
+        assert any(trigger in notes.lower() for trigger in triggers)
+
+class TestStrategyRanking:
+    """Test suite for personalized strategy ranking"""
+    
+    def _db_with_strategies(self, temp_dir):
+        db = DatabaseManager(db_path=Path(temp_dir) / "test.db")
+        db.create_user("test_user", "Test User")
+        db.upsert_strategies([
+            {"strategy_id": "calm", "name": "Calm", "category": "anxiety",
+             "description": "For anxious moments", "steps": ["Breathe"],
+             "min_intensity": 1, "max_intensity": 5},
+            {"strategy_id": "ground", "name": "Ground", "category": "anxiety",
+             "description": "For anxious moments", "steps": ["Look around"],
+             "min_intensity": 6, "max_intensity": 10},
+        ])
+        return db
+    
+    def test_intensity_fit_orders_candidates(self):
+        """Test that the strategy matching the intensity ranks first"""
+        from utils.strategy_ranking import StrategyRanker
+        
+        temp_dir = tempfile.mkdtemp()
+        db = self._db_with_strategies(temp_dir)
+        ranker = StrategyRanker(db=db)
+        candidates = db.search_strategies("anxious")
+        
+        assert ranker.rank(candidates, "test_user", intensity=9)[0]["strategy_id"] == "ground"
+        assert ranker.rank(candidates, "test_user", intensity=2)[0]["strategy_id"] == "calm"
+        
+        os.remove(db.db_path)
+        os.rmdir(temp_dir)
+    
+    def test_helpful_feedback_personalizes_ranking(self):
+        """Test that per-user helpfulness priors outweigh a small intensity mismatch"""
+        from utils.strategy_ranking import StrategyRanker
+        
+        temp_dir = tempfile.mkdtemp()
+        db = self._db_with_strategies(temp_dir)
+        ranker = StrategyRanker(db=db)
+        candidates = db.search_strategies("anxious")
+        
+        assert ranker.rank(candidates, "test_user", intensity=6)[0]["strategy_id"] == "ground"
+        
+        for i in range(5):
+            db.record_strategy_usage(f"u{i}", "test_user", "calm", helpful=True)
+            db.record_strategy_usage(f"v{i}", "test_user", "ground", helpful=False)
+        ranker.invalidate("test_user")
+        
+        assert ranker.rank(candidates, "test_user", intensity=6)[0]["strategy_id"] == "calm"
+        # Other users keep the unpersonalized order
+        assert ranker.rank(candidates, "other_user", intensity=6)[0]["strategy_id"] == "ground"
+        
+        os.remove(db.db_path)
+        os.rmdir(temp_dir)
+
+
+class TestCrisisLexicon:
+    """Test suite for the precompiled crisis phrase matcher"""
+    
+    def test_find_all_returns_spans(self):
+        """Test that every phrase is returned with its span in the original text"""
+        from utils.crisis_lexicon import crisis_matcher
+        
+        text = "I feel Hopeless and want to   die"
+        matches = crisis_matcher.find_all(text)
+        
+        assert [(m.phrase, m.level) for m in matches] == [("hopeless", "moderate"), ("want to die", "high")]
+        assert text[matches[0].start:matches[0].end] == "Hopeless"
+    
+    def test_word_boundaries(self):
+        """Test that phrases only match as whole words"""
+        from utils.crisis_lexicon import CrisisMatcher
+        
+        matcher = CrisisMatcher({"en": {"high": ["no point", "end it", "end it all"]}})
+        
+        assert matcher.find_all("there is no pointing at it") == []
+        assert [m.phrase for m in matcher.find_all("I want to end it all.")] == ["end it all"]
+        assert [m.phrase for m in matcher.find_all("just end it, please")] == ["end it"]
+    
+    def test_multilingual_and_moderate_levels(self):
+        """Test phrases from several languages and severity levels"""
+        from utils.crisis_lexicon import crisis_matcher
+        
+        assert crisis_matcher.text_level("Me quiero morir") == "high"
+        assert crisis_matcher.text_level("I can't cope with work") == "moderate"
+        assert crisis_matcher.text_level("Had a good day") == "none"
+        assert crisis_matcher.match_emotions(["Trapped", "calm"]) == {"Trapped": "moderate"}
+    
+    def test_large_lexicon(self):
+        """Test a lexicon with hundreds of phrases compiles and matches correctly"""
+        from utils.crisis_lexicon import CrisisMatcher
+        
+        phrases = [f"signal phrase {i}" for i in range(500)]
+        matcher = CrisisMatcher({"en": {"moderate": phrases}})
+        
+        matches = matcher.find_all("nothing here, but signal phrase 42 and signal phrase 499")
+        assert [m.phrase for m in matches] == ["signal phrase 42", "signal phrase 499"]
+
+
+class TestCrisisPrescreen:
+    """Test suite for the local crisis pre-screen"""
+    
+    def test_high_risk_phrase(self):
+        """Test that a crisis phrase is flagged high without a mood score"""
+        from utils.crisis_screen import prescreen_message
+        
+        result = prescreen_message("I think everyone would be better off dead without me")
+        
+        assert result.level == "high"
+        assert result.matches[0].phrase == "better off dead"
+        assert result.mood_score is None
+    
+    def test_mood_score_extraction(self):
+        """Test mood score extraction and the score-based level"""
+        from utils.crisis_screen import extract_mood_score, prescreen_message
+        
+        assert extract_mood_score("honestly about a 2/10 today") == 2
+        assert extract_mood_score("my mood is 7") == 7
+        assert extract_mood_score("I'm 25 years old") is None
+        assert prescreen_message("feeling like a 1 out of 10").level == "high"
+        assert prescreen_message("mood is 4").level == "moderate"
+    
+    def test_numbers_outside_a_mood_context_are_not_scores(self):
+        """Test that counts, units and ordinals are not screened as low mood scores"""
+        from utils.crisis_screen import extract_mood_score, prescreen_message
+        
+        for text in ("I'm 2 hours late for work", "I am 1 of 3 kids", "I feel like 2 days went by",
+                     "I'm 2nd in class", "My mood was 2 days ago the worst", "The appointment is on 1/10/2025"):
+            assert extract_mood_score(text) is None, text
+            assert prescreen_message(text).level == "none", text
+        assert extract_mood_score("My mood was a 2 today, honestly") == 2
+    
+    def test_no_risk(self):
+        """Test that ordinary messages pass the screen"""
+        from utils.crisis_screen import prescreen_message
+        
+        assert prescreen_message("Show me my mood patterns").level == "none"
+    
+    def test_everyday_venting_is_not_high_risk(self):
+        """Test that phrases common in ordinary venting do not trigger the crisis fast path"""
+        from utils.crisis_screen import prescreen_message
+        
+        for text in ("there's no point studying tonight", "this bug is hopeless"):
+            assert prescreen_message(text).level == "moderate", text
+
+
+class TestCrisisCatalog:
+    """Test suite for region-aware crisis response templates"""
+    
+    def test_region_responses(self):
+        """Test that responses are served for the requested region"""
+        from utils.crisis_catalog import crisis_catalog
+        
+        uk = crisis_catalog.get("GB", "high")
+        assert "IMMEDIATE SUPPORT NEEDED" in uk
+        assert "116 123" in uk
+        assert "988" not in uk
+        
+        # Unknown regions fall back to the default (US)
+        assert "988" in crisis_catalog.get("ZZ", "moderate")
+        assert "No immediate crisis" in crisis_catalog.get("GB", "none")
+    
+    def test_tools_share_the_application_catalog(self):
+        """Test that the tools and main.py reload and serve one catalog instance"""
+        from utils.crisis_catalog import crisis_catalog
+        from tools import crisis_tools, mood_tools
+        
+        assert crisis_tools.crisis_catalog is crisis_catalog
+        assert mood_tools.crisis_catalog is crisis_catalog
+    
+    def test_region_for_locale_and_timezone(self):
+        """Test resolving a region from locale or timezone"""
+        from utils.crisis_catalog import crisis_catalog
+        
+        assert crisis_catalog.region_for(locale="en_GB.UTF-8") == "GB"
+        assert crisis_catalog.region_for(timezone="Australia/Sydney") == "AU"
+        assert crisis_catalog.region_for(timezone="America/Toronto") == "CA"
+        assert crisis_catalog.region_for(timezone="UTC") == "US"
+    
+    def test_hot_reload(self):
+        """Test that edits to the resources file are picked up"""
+        import json
+        from utils.crisis_catalog import CrisisResponseCatalog
+        
+        temp_dir = tempfile.mkdtemp()
+        path = Path(temp_dir) / "resources.json"
+        path.write_text(json.dumps({"regions": {"XX": {"name": "Line X", "phone": "111"}}}))
+        catalog = CrisisResponseCatalog(resources_path=path, reload_interval=0)
+        assert "Line X" in catalog.get("XX", "high")
+        
+        path.write_text(json.dumps({"regions": {"XX": {"name": "Line Y", "phone": "222"}}}))
+        os.utime(path, (0, 12345))
+        assert "Line Y" in catalog.get("XX", "high")
+        
+        os.remove(path)
+        os.rmdir(temp_dir)
@@ -4,9 +4,10 @@ Tests for utility modules
 import pytest
 import os
 import json
+import sqlite3
 import tempfile
 from pathlib import Path
-from src.utils.profile_manager import ProfileManager
+from utils.profile_manager import ProfileManager
 
 
 class TestProfileManager:
@@ -122,4 +123,449 @@ class TestDataExport:
         assert "mood_score" in csv_header
         assert "emotions" in csv_header
         assert "timestamp" in csv_header
-        assert "7" in csv_row
\ No newline at end of file
+        assert "7" in csv_row
+
+class TestRiskTracker:
+    """Test suite for incremental conversation risk tracking"""
+    
+    @pytest.fixture
+    def db(self):
+        from utils.database import DatabaseManager
+        temp_dir = tempfile.mkdtemp()
+        db_path = Path(temp_dir) / "test.db"
+        yield DatabaseManager(db_path=db_path)
+        os.remove(db_path)
+        os.rmdir(temp_dir)
+    
+    def test_risk_accumulates_across_messages(self, db):
+        """Test that repeated moderate signals escalate to high risk"""
+        from utils.risk_tracker import RiskTracker
+        from utils.crisis_screen import prescreen_message
+        
+        tracker = RiskTracker(db)
+        levels = [
+            tracker.observe("s1", "u1", prescreen_message(message))['level']
+            for message in ["I can't cope", "mood is 3", "I'm falling apart", "I can't cope",
+                            "nobody cares", "I feel all alone", "giving up", "I can't go on"]
+        ]
+        
+        assert levels[0] == "moderate"
+        assert levels[-1] == "high"
+        assert tracker.get("s1")['signal_counts']["can't cope"] == 2
+    
+    def test_risk_decays_and_persists(self, db):
+        """Test that risk decays on calm messages and survives a restart"""
+        from utils.risk_tracker import RiskTracker
+        from utils.crisis_screen import prescreen_message
+        
+        tracker = RiskTracker(db)
+        tracker.observe("s1", "u1", prescreen_message("I don't want to live anymore"))
+        assert tracker.level("s1") == "high"
+        
+        for _ in range(4):
+            state = tracker.observe("s1", "u1", prescreen_message("thanks, that helps"))
+        assert state['level'] == "none"
+        
+        reloaded = RiskTracker(db)
+        assert reloaded.get("s1")['message_count'] == 5
+        assert reloaded.get("s1")['score'] == pytest.approx(state['score'])
+        assert reloaded.level("other_session") == "none"
+
+
+class TestUsageLedger:
+    """Test suite for token accounting and daily budgets"""
+    
+    @pytest.fixture
+    def db(self):
+        from utils.database import DatabaseManager
+        temp_dir = tempfile.mkdtemp()
+        db_path = Path(temp_dir) / "test.db"
+        yield DatabaseManager(db_path=db_path)
+        os.remove(db_path)
+        os.rmdir(temp_dir)
+    
+    @staticmethod
+    def usage(prompt, output):
+        from google.genai import types
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt, candidates_token_count=output, total_token_count=prompt + output)
+    
+    def test_usage_is_written_in_batches(self, db):
+        """Test that counters reach the table only once a batch is full"""
+        from utils.usage_ledger import UsageLedger
+        
+        ledger = UsageLedger(db, flush_every=3, flush_seconds=3600, input_price=1.0, output_price=2.0)
+        ledger.record("u1", "SupportAgent", self.usage(100, 20))
+        ledger.record("u1", "SupportAgent", self.usage(50, 10))
+        assert db.get_daily_token_total("u1", ledger.today()) == 0
+        assert ledger.used_today("u1") == 180
+        
+        ledger.record("u1", "OrchestratorAgent", self.usage(30, 2))
+        assert db.get_daily_token_total("u1", ledger.today()) == 212
+        assert ledger.stats()["flushes"] == 1 and ledger.stats()["pending_rows"] == 0
+        
+        report = ledger.report("u1")
+        support = report["agents"]["SupportAgent"]
+        assert support["calls"] == 2 and support["prompt_tokens"] == 150 and support["output_tokens"] == 30
+        assert support["cost"] == pytest.approx((150 * 1.0 + 30 * 2.0) / 1_000_000)
+        assert report["daily"][ledger.today()]["total_tokens"] == 212
+        assert report["remaining"] is None
+    
+    def test_budget_survives_restart(self, db):
+        """Test that a spent budget is enforced per user, including after a restart"""
+        from utils.usage_ledger import UsageLedger
+        
+        ledger = UsageLedger(db, daily_budget=100, flush_every=50)
+        ledger.record("u1", "SupportAgent", self.usage(60, 10))
+        assert ledger.remaining("u1") == 30 and not ledger.over_budget("u1")
+        ledger.record("u1", "SupportAgent", self.usage(40, 5))
+        assert ledger.over_budget("u1") and ledger.remaining("u1") == 0
+        assert not ledger.over_budget("u2")
+        ledger.flush()
+        
+        restarted = UsageLedger(db, daily_budget=100)
+        assert restarted.used_today("u1") == 115
+        assert restarted.over_budget("u1")
+
+    
+    def test_failed_write_keeps_counters(self, db, monkeypatch):
+        """Test that a failed flush neither loses the counters nor fails the call recording them"""
+        from utils.usage_ledger import UsageLedger
+        
+        ledger = UsageLedger(db, flush_every=1)
+        write = db.add_token_usage
+        
+        def fail(rows):
+            raise sqlite3.OperationalError("database is locked")
+        monkeypatch.setattr(db, "add_token_usage", fail)
+        assert ledger.record("u1", "SupportAgent", self.usage(60, 10)) == 70
+        assert ledger.stats()["pending_rows"] == 1
+        
+        monkeypatch.setattr(db, "add_token_usage", write)
+        ledger.record("u1", "SupportAgent", self.usage(20, 5))
+        assert db.get_daily_token_total("u1", ledger.today()) == 95
+        assert ledger.report("u1")["agents"]["SupportAgent"]["calls"] == 2
+
+class TestCLIAsync:
+    """Test suite for non-blocking CLI prompts"""
+    
+    def test_read_async_returns_result_without_blocking_loop(self):
+        """Test that a blocking prompt runs off the event loop"""
+        import asyncio
+        import time
+        from ui.cli import CLI
+        
+        async def scenario():
+            ticks = []
+            
+            async def ticker():
+                for _ in range(3):
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+            
+            def slow_prompt():
+                time.sleep(0.1)
+                return "mood"
+            
+            result, _ = await asyncio.gather(CLI.read_async(slow_prompt), ticker())
+            return result, ticks
+        
+        result, ticks = asyncio.run(scenario())
+        assert result == "mood"
+        assert len(ticks) == 3
+    
+    def test_read_async_propagates_errors(self):
+        """Test that prompt exceptions such as EOFError reach the caller"""
+        import asyncio
+        from ui.cli import CLI
+        
+        def closed_stdin():
+            raise EOFError()
+        
+        with pytest.raises(EOFError):
+            asyncio.run(CLI.read_async(closed_stdin))
+
+
+class TestStreamingRenderer:
+    """Test suite for the streaming response renderer"""
+    
+    @staticmethod
+    def _event(text, partial=False):
+        from google.adk.events import Event
+        from google.genai import types
+        return Event(author="SupportAgent", partial=partial,
+                     content=types.Content(role="model", parts=[types.Part(text=text)]))
+    
+    def test_partials_are_printed_once(self):
+        """Test that the aggregated final event is not printed again after its deltas"""
+        import io
+        from ui.streaming import StreamingRenderer
+        
+        out = io.StringIO()
+        renderer = StreamingRenderer("SupportAgent", out=out)
+        renderer.feed(self._event("Try a ", partial=True))
+        renderer.feed(self._event("breathing exercise.", partial=True))
+        renderer.feed(self._event("Try a breathing exercise."))
+        
+        assert renderer.finish() == "Try a breathing exercise."
+        assert out.getvalue().count("breathing") == 1
+        assert out.getvalue().index("🤝") < out.getvalue().index("Try a")
+        latency = renderer.latency()
+        assert 0 <= latency['ttft'] <= latency['total']
+    
+    def test_non_streaming_events_are_printed(self):
+        """Test that final events render when no partials were streamed"""
+        import io
+        from ui.streaming import StreamingRenderer
+        
+        out = io.StringIO()
+        renderer = StreamingRenderer("MoodTrackerAgent", out=out)
+        renderer.feed(self._event("Logged your mood. "))
+        renderer.feed(self._event("Anything else?"))
+        
+        assert renderer.finish() == "Logged your mood. Anything else?"
+        assert "📝" in out.getvalue()
+
+
+class TestChatServer:
+    """Test suite for the HTTP server's concurrency limits"""
+    
+    def test_backpressure_rejects_when_saturated(self):
+        """Test that requests beyond the in-flight and pending limits get 503"""
+        import asyncio
+        from ui.server import ChatServer
+        
+        async def slow_turn(user_id, message):
+            await asyncio.sleep(0.05)
+            return {"text": message}
+        
+        async def scenario():
+            server = ChatServer(slow_turn, max_concurrency=2, max_pending=1)
+            return await asyncio.gather(*[server.chat(f"user{i}", "hi") for i in range(5)]), server
+        
+        results, server = asyncio.run(scenario())
+        statuses = sorted(status for status, _ in results)
+        assert statuses == [200, 200, 200, 503, 503]
+        assert server.rejected == 2
+        assert server.in_flight == server.pending == 0
+        assert server._user_locks == {}
+    
+    def test_turns_for_one_user_are_serialized(self):
+        """Test that a user's turns never overlap while other users run concurrently"""
+        import asyncio
+        from ui.server import ChatServer
+        
+        active = {}
+        overlaps = []
+        
+        async def turn(user_id, message):
+            if active.get(user_id):
+                overlaps.append(user_id)
+            active[user_id] = True
+            await asyncio.sleep(0.01)
+            active[user_id] = False
+            return {"text": message}
+        
+        async def scenario():
+            server = ChatServer(turn, max_concurrency=4, max_pending=10)
+            await asyncio.gather(*[server.chat(f"user{i % 2}", str(i)) for i in range(6)])
+        
+        asyncio.run(scenario())
+        assert overlaps == []
+    
+    def test_http_chat_endpoint(self):
+        """Test a POST /chat round trip and input validation over a real socket"""
+        import asyncio
+        from ui.server import ChatServer
+        
+        async def echo(user_id, message):
+            return {"user_id": user_id, "text": message}
+        
+        async def post(port, body):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            data = json.dumps(body).encode()
+            writer.write(b"POST /chat HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(data) + data)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head, _, payload = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(payload)
+        
+        async def scenario():
+            listener = await ChatServer(echo).start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            async with listener:
+                ok = await post(port, {"user_id": "alice", "message": " hello "})
+                bad = await post(port, {"user_id": "../alice", "message": "hello"})
+            return ok, bad
+        
+        ok, bad = asyncio.run(scenario())
+        assert ok == (200, {"user_id": "alice", "text": "hello"})
+        assert bad[0] == 400
+
+
+class TestBatchRunner:
+    """Test suite for JSONL batch mode"""
+    
+    @staticmethod
+    def _turn(user_id, message):
+        from types import SimpleNamespace
+        return SimpleNamespace(agent="SupportAgent", routed_by="local", cached=False, text=message,
+                               crisis_resources=None, latency={"ttft": 0.001})
+    
+    def test_users_run_in_order_and_bad_records_are_reported(self):
+        """Test per-user ordering, concurrency across users and error results"""
+        import asyncio
+        from ui.batch import BatchRunner
+        
+        seen = {}
+        active = {}
+        overlaps = []
+        
+        async def turn(user_id, message):
+            if active.get(user_id):
+                overlaps.append(user_id)
+            active[user_id] = True
+            # Later messages finish faster, so ordering must come from the runner
+            await asyncio.sleep(0.02 / int(message))
+            active[user_id] = False
+            seen.setdefault(user_id, []).append(message)
+            return self._turn(user_id, message)
+        
+        lines = [json.dumps({"id": i, "user_id": f"user{i % 2}", "message": str(i)}) for i in range(1, 7)]
+        lines += ["", "not json", json.dumps({"user_id": "../x", "message": "hi"}),
+                  json.dumps({"user_id": "user0", "message": "  "})]
+        results = []
+        summary = asyncio.run(BatchRunner(turn, concurrency=4).run(lines, results.append))
+        
+        assert overlaps == []
+        assert seen == {"user1": ["1", "3", "5"], "user0": ["2", "4", "6"]}
+        assert sorted(r["line"] for r in results) == [1, 2, 3, 4, 5, 6, 8, 9, 10]
+        errors = {r["line"]: r["error"] for r in results if r["error"]}
+        assert set(errors) == {8, 9, 10}
+        ok = next(r for r in results if r["line"] == 1)
+        assert ok["id"] == 1 and ok["user_id"] == "user1" and ok["text"] == "1"
+        assert ok["routed_by"] == "local" and ok["latency"]["total"] > 0
+        assert summary["turns"] == 6 and summary["failed"] == 3
+        assert summary["routed_by"] == {"local": 6}
+        assert summary["p50"] <= summary["p95"] <= summary["p99"]
+    
+    def test_failed_turn_does_not_stop_the_batch(self):
+        """Test that an exception in one turn becomes an error result"""
+        import asyncio
+        from ui.batch import BatchRunner
+        
+        async def turn(user_id, message):
+            if message == "boom":
+                raise RuntimeError("model unavailable")
+            return self._turn(user_id, message)
+        
+        lines = [json.dumps({"user_id": "alice", "message": m}) for m in ("hi", "boom", "again")]
+        results = []
+        summary = asyncio.run(BatchRunner(turn).run(lines, results.append))
+        
+        by_line = {r["line"]: r for r in results}
+        assert by_line[2]["error"] == "RuntimeError: model unavailable"
+        assert by_line[3]["text"] == "again"
+        assert summary["turns"] == 2 and summary["failed"] == 1
+
+
+class TestTracer:
+    """Test suite for per-turn tracing spans"""
+    
+    def test_spans_nest_across_tasks_and_db_calls(self, tmp_path):
+        """Test that spans opened in a turn, its tasks and its DB calls share one trace"""
+        import asyncio
+        from utils.tracing import Tracer, waterfall_rows
+        
+        tracer = Tracer(path=tmp_path / "traces.jsonl")
+        
+        @tracer.traced_methods("db", kind="db")
+        class Store:
+            def read(self):
+                return 42
+        
+        async def agent_run():
+            with tracer.span("agent.SupportAgent", "agent"):
+                await asyncio.sleep(0)
+                return Store().read()
+        
+        async def scenario():
+            with tracer.trace("turn", user_id="alice") as root:
+                result = await asyncio.create_task(agent_run())
+                tracer.annotate(agent="SupportAgent")
+            return result, root
+        
+        result, root = asyncio.run(scenario())
+        assert result == 42
+        
+        [spans] = tracer.recent_traces(5)
+        rows = waterfall_rows(spans)
+        assert [(row['name'], row['depth']) for row in rows] == [
+            ("turn", 0), ("agent.SupportAgent", 1), ("db.read", 2)
+        ]
+        assert {span['trace_id'] for span in spans} == {root.trace_id}
+        assert rows[0]['attributes'] == {"user_id": "alice", "agent": "SupportAgent"}
+        assert rows[2]['kind'] == "db"
+        assert all(row['duration_ms'] <= rows[0]['duration_ms'] for row in rows)
+    
+    def test_nothing_recorded_outside_a_turn(self, tmp_path):
+        """Test that spans and traced calls outside a turn are no-ops"""
+        from utils.tracing import Tracer
+        
+        tracer = Tracer(path=tmp_path / "traces.jsonl")
+        with tracer.span("db.get_user", "db") as span:
+            assert span is None
+        assert tracer.traced("helper")(lambda: "ok")() == "ok"
+        assert tracer.recent_traces(5) == []
+    
+    def test_errors_are_recorded(self, tmp_path):
+        """Test that a failing span records the error and still closes the turn"""
+        from utils.tracing import Tracer
+        
+        tracer = Tracer(path=tmp_path / "traces.jsonl")
+        with pytest.raises(RuntimeError):
+            with tracer.trace("turn"):
+                with tracer.span("tool.log_mood", "tool"):
+                    raise RuntimeError("disk full")
+        
+        [spans] = tracer.recent_traces(1)
+        assert [span['error'] for span in spans] == ["RuntimeError: disk full"] * 2
+    
+    def test_tool_callbacks_bracket_the_call(self, tmp_path, monkeypatch):
+        """Test that the before/after tool callbacks open and close a tool span"""
+        from types import SimpleNamespace
+        from utils import tracing
+        
+        tracer = tracing.Tracer(path=tmp_path / "traces.jsonl")
+        monkeypatch.setattr(tracing, "tracer", tracer)
+        tool = SimpleNamespace(name="log_mood")
+        context = SimpleNamespace(function_call_id="call-1", agent_name="MoodTrackerAgent")
+        
+        with tracer.trace("turn"):
+            assert tracing.trace_tool_start(tool, {}, context) is None
+            with tracer.span("db.add_mood_entry", "db"):
+                pass
+            assert tracing.trace_tool_end(tool, {}, context, {"result": "ok"}) is None
+            with tracer.span("agent.reply", "agent"):
+                pass
+        
+        rows = tracing.waterfall_rows(tracer.recent_traces(1)[0])
+        assert [(row['name'], row['depth']) for row in rows] == [
+            ("turn", 0), ("tool.log_mood", 1), ("db.add_mood_entry", 2), ("agent.reply", 1)
+        ]
+        assert rows[1]['attributes'] == {"call_id": "call-1", "agent": "MoodTrackerAgent"}
+    
+    def test_file_rotates_and_recent_traces_span_backups(self, tmp_path):
+        """Test that the JSONL file rotates and old turns are read from backups"""
+        from utils.tracing import Tracer
+        
+        tracer = Tracer(path=tmp_path / "traces.jsonl", max_bytes=2000, backup_count=5)
+        for i in range(20):
+            with tracer.trace("turn", index=i):
+                with tracer.span("db.get_user", "db"):
+                    pass
+        
+        assert (tmp_path / "traces.jsonl.1").exists()
+        recent = tracer.recent_traces(3)
+        assert [spans[0]['attributes']['index'] for spans in recent] == [17, 18, 19]
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Train the local intent classifier from logged orchestrator routing decisions.
+Decisions are only logged while ROUTING_LOG_ENABLED=True.
+
+Usage:
+    python train_router.py [routing_log.jsonl]
+"""
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.intent_router import NaiveBayesIntentClassifier, RoutingLog
+from utils.config import ROUTER_MODEL_PATH
+from ui.cli import CLI
+
+
+def main():
+    log = RoutingLog(sys.argv[1]) if len(sys.argv) > 1 else RoutingLog()
+    examples = log.examples()
+    if not examples:
+        CLI.print_error(f"No routing decisions found in {log.path} (set ROUTING_LOG_ENABLED=True to collect them)")
+        return 1
+    
+    classifier = NaiveBayesIntentClassifier().train(examples)
+    classifier.save()
+    
+    per_agent = ", ".join(f"{agent}: {count}" for agent, count in sorted(classifier.doc_counts.items()))
+    CLI.print_success(f"Trained on {len(examples)} decisions ({per_agent}); saved to {ROUTER_MODEL_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())